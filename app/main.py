@@ -1,5 +1,5 @@
 from fastapi import FastAPI, Request, HTTPException
-from app.routers import roles_features,search,auth,users,visitors,projects,news,logos,faq,statistics,products,survey,manual_guide,project_details,requests,admin,videos ,contact_us ,chatbot,metadata,dashboard,domains,admin_statistics
+from app.routers import roles_features,search,auth,users,visitors,projects,news,logos,faq,statistics,products,survey,manual_guide,project_details,requests,admin,videos ,contact_us ,chatbot,metadata,dashboard,domains,admin_statistics,tiles
 from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 from fastapi.requests import Request
@@ -8,6 +8,12 @@ from app.utils.response import error_response
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from app.utils.paths import STATIC_ROOT
+from app.utils.background import start_periodic_tasks, stop_periodic_tasks
+from app.utils.snapshots import snapshots
+from app.utils.visitor_ingest import visit_ingestor
+from app.utils.vote_ingest import vote_ingestor
+from app.utils.visitor_sketches import visitor_sketches
+from starlette.concurrency import run_in_threadpool
 # for caching on memory
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.inmemory import InMemoryBackend
@@ -22,6 +28,18 @@ app = FastAPI()
 @app.on_event("startup")
 async def on_startup():
     FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+    # Serve the last statistics snapshots right away, then keep them fresh in the background
+    snapshots.load()
+    start_periodic_tasks()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Write queued tracking hits, votes and pending sketches before the worker exits
+    await visit_ingestor.close()
+    await vote_ingestor.close()
+    await stop_periodic_tasks()
+    await run_in_threadpool(visitor_sketches.flush_pending)
     
     
 # Ensure external static directory exists and mount it
@@ -55,6 +73,7 @@ app.include_router(chatbot.router, prefix=API_PREFIX)
 app.include_router(metadata.router, prefix=API_PREFIX)
 app.include_router(dashboard.router, prefix=API_PREFIX)
 app.include_router(admin_statistics.router, prefix=API_PREFIX)
+app.include_router(tiles.router, prefix=API_PREFIX)
 
 app.add_middleware(
     CORSMiddleware,
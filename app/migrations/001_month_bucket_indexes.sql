@@ -0,0 +1,94 @@
+-- ============================================================
+-- 001 - Month bucket columns & date indexes for dashboards
+-- ============================================================
+-- Supports app/utils/date_range.py:
+--   * range filters   ->  <DateCol> >= @start AND <DateCol> < @end   (index on the date column)
+--   * month grouping  ->  DATEFROMPARTS(YEAR(<DateCol>), MONTH(<DateCol>), 1)
+--     The persisted computed columns below use the exact same expression,
+--     so SQL Server matches the query expression to the indexed column.
+-- Safe to run more than once.
+-- ============================================================
+
+SET ANSI_NULLS ON;
+SET QUOTED_IDENTIFIER ON;
+SET ANSI_PADDING ON;
+SET ANSI_WARNINGS ON;
+SET ARITHABORT ON;
+SET CONCAT_NULL_YIELDS_NULL ON;
+SET NUMERIC_ROUNDABORT OFF;
+GO
+
+-- ---------- Website.Visitors (VisitAt) ----------
+IF COL_LENGTH('Website.Visitors', 'VisitMonth') IS NULL
+    ALTER TABLE Website.Visitors
+        ADD VisitMonth AS DATEFROMPARTS(YEAR(VisitAt), MONTH(VisitAt), 1) PERSISTED;
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Visitors_VisitAt' AND object_id = OBJECT_ID('Website.Visitors'))
+    CREATE INDEX IX_Visitors_VisitAt ON Website.Visitors (VisitAt) INCLUDE (CountryID);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Visitors_VisitMonth' AND object_id = OBJECT_ID('Website.Visitors'))
+    CREATE INDEX IX_Visitors_VisitMonth ON Website.Visitors (VisitMonth, CountryID);
+GO
+
+-- ---------- Website.Users (CreatedAt) ----------
+IF COL_LENGTH('Website.Users', 'CreatedMonth') IS NULL
+    ALTER TABLE Website.Users
+        ADD CreatedMonth AS DATEFROMPARTS(YEAR(CreatedAt), MONTH(CreatedAt), 1) PERSISTED;
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Users_CreatedAt' AND object_id = OBJECT_ID('Website.Users'))
+    CREATE INDEX IX_Users_CreatedAt ON Website.Users (CreatedAt) INCLUDE (CountryID, OrganizationTypeID);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Users_CreatedMonth' AND object_id = OBJECT_ID('Website.Users'))
+    CREATE INDEX IX_Users_CreatedMonth ON Website.Users (CreatedMonth);
+GO
+
+-- ---------- dbo.DOWNLOAD_REQUESTS (Date) ----------
+IF COL_LENGTH('dbo.DOWNLOAD_REQUESTS', 'RequestMonth') IS NULL
+    ALTER TABLE dbo.DOWNLOAD_REQUESTS
+        ADD RequestMonth AS DATEFROMPARTS(YEAR([Date]), MONTH([Date]), 1) PERSISTED;
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_DOWNLOAD_REQUESTS_Date' AND object_id = OBJECT_ID('dbo.DOWNLOAD_REQUESTS'))
+    CREATE INDEX IX_DOWNLOAD_REQUESTS_Date ON dbo.DOWNLOAD_REQUESTS ([Date]) INCLUDE (Country, OrgType, UserID);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_DOWNLOAD_REQUESTS_RequestMonth' AND object_id = OBJECT_ID('dbo.DOWNLOAD_REQUESTS'))
+    CREATE INDEX IX_DOWNLOAD_REQUESTS_RequestMonth ON dbo.DOWNLOAD_REQUESTS (RequestMonth);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_DOWNLOAD_ITEMS_ReqNo' AND object_id = OBJECT_ID('dbo.DOWNLOAD_ITEMS'))
+    CREATE INDEX IX_DOWNLOAD_ITEMS_ReqNo ON dbo.DOWNLOAD_ITEMS (ReqNo) INCLUDE (DatasetName);
+GO
+
+-- ---------- Website.ContactUs (CreatedAt) ----------
+IF COL_LENGTH('Website.ContactUs', 'CreatedMonth') IS NULL
+    ALTER TABLE Website.ContactUs
+        ADD CreatedMonth AS DATEFROMPARTS(YEAR(CreatedAt), MONTH(CreatedAt), 1) PERSISTED;
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_ContactUs_CreatedMonth' AND object_id = OBJECT_ID('Website.ContactUs'))
+    CREATE INDEX IX_ContactUs_CreatedMonth ON Website.ContactUs (CreatedMonth);
+GO
+
+-- ---------- Requests.Requests (CreatedAt) ----------
+IF COL_LENGTH('Requests.Requests', 'CreatedMonth') IS NULL
+    ALTER TABLE Requests.Requests
+        ADD CreatedMonth AS DATEFROMPARTS(YEAR(CreatedAt), MONTH(CreatedAt), 1) PERSISTED;
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Requests_CreatedMonth' AND object_id = OBJECT_ID('Requests.Requests'))
+    CREATE INDEX IX_Requests_CreatedMonth ON Requests.Requests (CreatedMonth) INCLUDE (IsDeleted);
+GO
+
+-- ---------- Survey.UsersFeedbackAnswers (CreatedAt) ----------
+IF COL_LENGTH('Survey.UsersFeedbackAnswers', 'CreatedMonth') IS NULL
+    ALTER TABLE Survey.UsersFeedbackAnswers
+        ADD CreatedMonth AS DATEFROMPARTS(YEAR(CreatedAt), MONTH(CreatedAt), 1) PERSISTED;
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_UsersFeedbackAnswers_CreatedMonth' AND object_id = OBJECT_ID('Survey.UsersFeedbackAnswers'))
+    CREATE INDEX IX_UsersFeedbackAnswers_CreatedMonth ON Survey.UsersFeedbackAnswers (CreatedMonth) INCLUDE (IsDeleted);
+GO
+
+-- ---------- Survey.Vote (CreatedAt) ----------
+IF COL_LENGTH('Survey.Vote', 'CreatedMonth') IS NULL
+    ALTER TABLE Survey.Vote
+        ADD CreatedMonth AS DATEFROMPARTS(YEAR(CreatedAt), MONTH(CreatedAt), 1) PERSISTED;
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Vote_CreatedMonth' AND object_id = OBJECT_ID('Survey.Vote'))
+    CREATE INDEX IX_Vote_CreatedMonth ON Survey.Vote (CreatedMonth);
+GO
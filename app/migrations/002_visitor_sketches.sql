@@ -0,0 +1,18 @@
+-- ============================================================
+-- 002 - Unique visitor sketches
+-- ============================================================
+-- One HyperLogLog sketch per (day, country), see app/utils/visitor_sketches.py.
+-- CountryID 0 holds visitors without a country.
+-- Sketch = 1 precision byte + zlib-compressed registers (a few hundred bytes to 4 KB).
+-- Safe to run more than once.
+-- ============================================================
+
+IF OBJECT_ID('Website.VisitorSketches', 'U') IS NULL
+    CREATE TABLE Website.VisitorSketches (
+        Day        DATE           NOT NULL,
+        CountryID  INT            NOT NULL CONSTRAINT DF_VisitorSketches_CountryID DEFAULT 0,
+        Sketch     VARBINARY(MAX) NOT NULL,
+        UpdatedAt  DATETIME       NULL,
+        CONSTRAINT PK_VisitorSketches PRIMARY KEY CLUSTERED (Day, CountryID)
+    );
+GO
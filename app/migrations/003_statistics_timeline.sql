@@ -0,0 +1,17 @@
+-- ============================================================
+-- 003 - Admin statistics timeline
+-- ============================================================
+-- Monthly counts per entity for closed months, see app/utils/timeline_store.py.
+-- Rows are written once when a month closes; the current month is never stored.
+-- Rebuild from scratch with: python -m app.utils.timeline_store rebuild
+-- Safe to run more than once.
+-- ============================================================
+
+IF OBJECT_ID('Website.StatisticsTimeline', 'U') IS NULL
+    CREATE TABLE Website.StatisticsTimeline (
+        Entity  VARCHAR(32) NOT NULL,
+        Month   DATE        NOT NULL,
+        Total   INT         NOT NULL CONSTRAINT DF_StatisticsTimeline_Total DEFAULT 0,
+        CONSTRAINT PK_StatisticsTimeline PRIMARY KEY CLUSTERED (Entity, Month)
+    );
+GO
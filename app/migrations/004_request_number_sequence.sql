@@ -0,0 +1,19 @@
+-- ============================================================
+-- 004 - Request number sequence
+-- ============================================================
+-- Backs the RQ-YYYYMMDD-NNNN request numbers, see app/utils/request_numbers.py.
+-- Each worker reserves a block of values with sp_sequence_get_range, so numbers
+-- are unique but may have gaps (unused values of a block are lost on restart).
+-- Starts after the highest existing request Id, which the old numbers were based on.
+-- Safe to run more than once.
+-- ============================================================
+
+IF OBJECT_ID('Requests.RequestNumberSeq', 'SO') IS NULL
+BEGIN
+    DECLARE @start BIGINT = (SELECT ISNULL(MAX(Id), 0) + 1 FROM Requests.Requests);
+    DECLARE @sql NVARCHAR(400) =
+        N'CREATE SEQUENCE Requests.RequestNumberSeq AS BIGINT START WITH '
+        + CAST(@start AS NVARCHAR(20)) + N' INCREMENT BY 1 NO CYCLE';
+    EXEC sp_executesql @sql;
+END
+GO
@@ -0,0 +1,27 @@
+-- ============================================================
+-- 005 - Admin request inbox indexes
+-- ============================================================
+-- Supports GET /admin/requests (app/routers/admin.py):
+--   * keyset pages  ->  ORDER BY CreatedAt DESC, Id DESC
+--                       WHERE CreatedAt < @c OR (CreatedAt = @c AND Id < @id)
+--   * filters       ->  StatusId / CategoryId / AssignedRoleId = @x, same order
+-- Text search (LIKE '%...%') can't seek; it scans within the other filters.
+-- Safe to run more than once.
+-- ============================================================
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Requests_CreatedAt_Id' AND object_id = OBJECT_ID('Requests.Requests'))
+    CREATE INDEX IX_Requests_CreatedAt_Id ON Requests.Requests (CreatedAt DESC, Id DESC)
+        INCLUDE (StatusId, CategoryId, AssignedRoleId, IsDeleted);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Requests_Status_CreatedAt' AND object_id = OBJECT_ID('Requests.Requests'))
+    CREATE INDEX IX_Requests_Status_CreatedAt ON Requests.Requests (StatusId, CreatedAt DESC, Id DESC)
+        INCLUDE (IsDeleted);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Requests_Category_CreatedAt' AND object_id = OBJECT_ID('Requests.Requests'))
+    CREATE INDEX IX_Requests_Category_CreatedAt ON Requests.Requests (CategoryId, CreatedAt DESC, Id DESC)
+        INCLUDE (IsDeleted);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Requests_AssignedRole_CreatedAt' AND object_id = OBJECT_ID('Requests.Requests'))
+    CREATE INDEX IX_Requests_AssignedRole_CreatedAt ON Requests.Requests (AssignedRoleId, CreatedAt DESC, Id DESC)
+        INCLUDE (IsDeleted);
+GO
@@ -0,0 +1,16 @@
+-- ============================================================
+-- 006 - Vote idempotency key
+-- ============================================================
+-- Votes are written from the local WAL (app/utils/vote_ingest.py); a segment
+-- replayed after a crash between the commit and deleting the segment must not
+-- insert its votes twice. Each vote carries a random key, stored here and
+-- checked before the INSERT. Rows written before this have no key.
+-- Safe to run more than once.
+-- ============================================================
+
+IF COL_LENGTH('Survey.Vote', 'IngestKey') IS NULL
+    ALTER TABLE Survey.Vote ADD IngestKey CHAR(32) NULL;
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_Vote_IngestKey' AND object_id = OBJECT_ID('Survey.Vote'))
+    CREATE UNIQUE INDEX UX_Vote_IngestKey ON Survey.Vote (IngestKey) WHERE IngestKey IS NOT NULL;
+GO
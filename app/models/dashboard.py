@@ -1,5 +1,5 @@
 # models/dashboard.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, Float
 from app.database import Base
 
 class DownloadRequest(Base):
@@ -56,4 +56,14 @@ class BibliographyDownloadRequest(Base):
     Purpose = Column(String(255))
     Date = Column(DateTime)
     FileName = Column(String(255))
-    UserID = Column(String(255))
\ No newline at end of file
+    UserID = Column(String(255))
+
+
+class StatisticsTimeline(Base):
+    """Frozen monthly row counts per entity for closed months (see utils/timeline_store.py)."""
+    __tablename__ = "StatisticsTimeline"
+    __table_args__ = {"schema": "Website"}
+
+    Entity = Column(String(32), primary_key=True)
+    Month = Column(Date, primary_key=True)
+    Total = Column(Integer, nullable=False, default=0)
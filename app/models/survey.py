@@ -85,4 +85,6 @@ class Vote(Base):
 
     CreatedAt = Column(DateTime)
 
+    IngestKey = Column(String(32), nullable=True)  # WAL replay idempotency key (utils/vote_ingest.py)
+
 
@@ -1,5 +1,5 @@
 # models/visitors.py
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, LargeBinary, ForeignKey
 from geoalchemy2 import Geometry
 from datetime import datetime
 from app.database import Base
@@ -16,3 +16,14 @@ class Visitor(Base):
     Geom = Column(Geometry(geometry_type='POINT', srid=4326))
     VisitAt = Column(DateTime, default=datetime.utcnow)
     SessionID = Column(String(100))
+
+
+class VisitorSketch(Base):
+    """HyperLogLog sketch of distinct visitors per (day, country). CountryID 0 = unknown."""
+    __tablename__ = "VisitorSketches"
+    __table_args__ = {"schema": "Website"}
+
+    Day = Column(Date, primary_key=True)
+    CountryID = Column(Integer, primary_key=True, default=0)
+    Sketch = Column(LargeBinary, nullable=False)
+    UpdatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
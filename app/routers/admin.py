@@ -1,7 +1,9 @@
 # routers/admin.py
 from fastapi import APIRouter, Depends, UploadFile, File, BackgroundTasks, HTTPException, status, Query
 from sqlalchemy.orm import Session
+from sqlalchemy import func, or_, and_
 from datetime import datetime
+from typing import Optional
 import os
 import shutil
 
@@ -12,6 +14,7 @@ from app.utils.email import send_reply_email, send_email_with_attachment, ADMIN_
 from app.models.users import User
 from app.models.lookups import Category, Status, ComplaintScreen, RequestInformation, Format, Projection
 from app.models.requests import Request, Reply, Request_RequestInformation, Request_Format
+from app.utils.request_inbox import encode_cursor, decode_cursor, inbox_counts
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -72,24 +75,75 @@ def assign_requests(
 # ------------------------
 # List all requests (Admin only)
 # ------------------------
+def _inbox_filters(status_id, category_id, assigned_role_id, search):
+    """(WHERE clauses, needs the User join) for the request inbox."""
+    filters = [or_(Request.IsDeleted == False, Request.IsDeleted.is_(None))]
+    if status_id is not None:
+        filters.append(Request.StatusId == status_id)
+    if category_id is not None:
+        filters.append(Request.CategoryId == category_id)
+    if assigned_role_id is not None:
+        # 0 = not assigned yet
+        filters.append(Request.AssignedRoleId.is_(None) if assigned_role_id == 0 else Request.AssignedRoleId == assigned_role_id)
+    if search:
+        like_term = f"%{search.strip()}%"
+        filters.append(or_(
+            Request.RequestNumber.ilike(like_term),
+            Request.Subject.ilike(like_term),
+            User.Email.ilike(like_term),
+        ))
+    return filters, bool(search)
+
+
 @router.get("/requests")
 def list_requests(
-    page: int = Query(1, ge=1, description="Page number"),
+    page: int = Query(1, ge=1, description="Page number (ignored when a cursor is given)"),
     limit: int = Query(25, ge=1, le=200, description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    status_id: Optional[int] = Query(None),
+    category_id: Optional[int] = Query(None),
+    assigned_role_id: Optional[int] = Query(None, description="0 for requests not assigned yet"),
+    search: Optional[str] = Query(None, description="Request number, subject or user email"),
     db: Session = Depends(get_db),
     admin: User = Depends(require_admin)
 ):
-    skip = (page - 1) * limit
+    filters, needs_user = _inbox_filters(status_id, category_id, assigned_role_id, search)
+
     base_query = (
         db.query(Request, Status, Category, User)
         .join(Status, Request.StatusId == Status.Id, isouter=True)
         .join(Category, Request.CategoryId == Category.Id, isouter=True)
         .join(User, Request.UserId == User.UserID, isouter=True)
-        .order_by(Request.CreatedAt.desc())
+        .filter(*filters)
+        .order_by(Request.CreatedAt.desc(), Request.Id.desc())
     )
 
-    paged_requests = base_query.offset(skip).limit(limit).all()
-    total_requests = db.query(Request).count()
+    # Keyset pagination: rows strictly after the last one of the previous page
+    if cursor:
+        try:
+            last_created_at, last_id = decode_cursor(cursor)
+        except ValueError:
+            return error_response("Invalid cursor", "مؤشر الصفحة غير صالح", error_code="INVALID_CURSOR")
+        base_query = base_query.filter(or_(
+            Request.CreatedAt < last_created_at,
+            and_(Request.CreatedAt == last_created_at, Request.Id < last_id),
+        ))
+    elif page > 1:
+        # Kept for old clients; cursors don't slow down on deep pages
+        base_query = base_query.offset((page - 1) * limit)
+
+    # One extra row tells whether there is a next page
+    paged_requests = base_query.limit(limit + 1).all()
+    has_more = len(paged_requests) > limit
+    paged_requests = paged_requests[:limit]
+
+    def count_requests():
+        count_query = db.query(func.count(Request.Id))
+        if needs_user:
+            count_query = count_query.join(User, Request.UserId == User.UserID, isouter=True)
+        return count_query.filter(*filters).scalar()
+
+    total_requests = inbox_counts.get((status_id, category_id, assigned_role_id, (search or "").strip().lower()), count_requests)
 
     results = []
     for req, status, category, user in paged_requests:
@@ -112,6 +166,7 @@ def list_requests(
         "limit": limit,
         "count": len(results),
         "total": total_requests,
+        "next_cursor": encode_cursor(paged_requests[-1][0].CreatedAt, paged_requests[-1][0].Id) if has_more else None,
         "requests": results
     }
 
@@ -1,9 +1,13 @@
 # app/routers/admin_statistics.py
 
-from fastapi import APIRouter, Depends
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func, case
-from app.database import get_db
+from app.database import get_db, SessionLocal
 
 # MODELS
 from app.models.users import User
@@ -22,7 +26,10 @@ from app.models.lookups import Category, Status
 from sqlalchemy import extract
 
 # RESPONSE
-from app.utils.response import success_response
+from app.utils.response import success_response, error_response
+from app.utils.response_cache import cached_response
+from app.utils.timeline_store import timeline_store, TIMELINE_ENTITIES
+from app.utils.snapshots import snapshots, serve_snapshot, SNAPSHOT_ADMIN_SECONDS
 
 router = APIRouter(prefix="/admin", tags=["Admin Statistics"])
 
@@ -30,21 +37,20 @@ router = APIRouter(prefix="/admin", tags=["Admin Statistics"])
 # -----------------------------------------------------------
 # ⭐ ONE MASTER ENDPOINT FOR ALL ADMIN STATISTICS
 # -----------------------------------------------------------
-@router.get("/statistics/all")
-def all_statistics(db: Session = Depends(get_db)):
-    """
-    Return all admin statistics in one clean endpoint:
-    - Countries (users + visitors)
-    - Contact form
-    - News statistics
-    - Products statistics
-    - Requests statistics
-    - Survey statistics
-    """
+# Each section scans its tables once (conditional aggregation with SUM(CASE ...))
+# and runs on its own pooled connection, so sections execute concurrently.
+ADMIN_STATISTICS_WORKERS = int(os.getenv("ADMIN_STATISTICS_WORKERS", 6))
+_section_executor = ThreadPoolExecutor(max_workers=ADMIN_STATISTICS_WORKERS, thread_name_prefix="admin-stats")
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
 
-    # -------------------------------------------------------
-    # 1️⃣ COUNTRY STATISTICS
-    # -------------------------------------------------------
+# -------------------------------------------------------
+# 1️⃣ COUNTRY STATISTICS
+# -------------------------------------------------------
+def countries_section(db: Session):
     users_per_country = (
         db.query(
             Country.CountryCode,
@@ -73,7 +79,7 @@ def all_statistics(db: Session = Depends(get_db)):
 
     visitors_map = {v[0]: v[1] for v in visitors_per_country}
 
-    countries_data = [
+    return [
         {
             "country_code": c[0],
             "country_name": c[1],
@@ -84,88 +90,86 @@ def all_statistics(db: Session = Depends(get_db)):
         for c in users_per_country
     ]
 
-    # -------------------------------------------------------
-    # 2️⃣ CONTACT FORM STATISTICS
-    # -------------------------------------------------------
-    total_contacts = db.query(func.count(ContactUs.ContactID)).scalar() or 0
-    total_responded = db.query(func.count(ContactUs.ContactID)) \
-        .filter(ContactUs.ReplyStatus == True).scalar() or 0
-    total_not_responded = total_contacts - total_responded
-
-    contact_data = {
-        "total_contact_forms": total_contacts,
-        "total_responded": total_responded,
-        "total_not_responded": total_not_responded
-    }
-
-    # -------------------------------------------------------
-    # 3️⃣ NEWS STATISTICS
-    # -------------------------------------------------------
-    total_news = db.query(func.count(News.NewsID)) \
-        .filter(News.Is_delete != True).scalar() or 0
 
-    total_news_deleted = db.query(func.count(News.NewsID)) \
-        .filter(News.Is_delete == True).scalar() or 0
+# -------------------------------------------------------
+# 2️⃣ CONTACT FORM STATISTICS
+# -------------------------------------------------------
+def contact_section(db: Session):
+    row = db.query(
+        func.count(ContactUs.ContactID).label("total"),
+        _count_if(ContactUs.ReplyStatus == True).label("responded"),
+    ).one()
 
-    total_slides = db.query(func.count(News.NewsID)) \
-        .filter(News.Is_slide == True, News.Is_delete != True).scalar() or 0
+    return {
+        "total_contact_forms": row.total,
+        "total_responded": row.responded,
+        "total_not_responded": row.total - row.responded
+    }
 
-    total_reads = db.query(func.sum(News.Read_count)).scalar() or 0
 
-    news_data = {
-        "total_news": total_news,
-        "total_deleted": total_news_deleted,
-        "total_slides": total_slides,
-        "total_reads": total_reads
+# -------------------------------------------------------
+# 3️⃣ NEWS STATISTICS
+# -------------------------------------------------------
+def news_section(db: Session):
+    row = db.query(
+        _count_if(News.Is_delete != True).label("total"),
+        _count_if(News.Is_delete == True).label("deleted"),
+        _count_if((News.Is_slide == True) & (News.Is_delete != True)).label("slides"),
+        func.sum(News.Read_count).label("reads"),
+    ).one()
+
+    return {
+        "total_news": row.total,
+        "total_deleted": row.deleted,
+        "total_slides": row.slides,
+        "total_reads": row.reads or 0
     }
 
-    # -------------------------------------------------------
-    # 4️⃣ PRODUCTS STATISTICS
-    # -------------------------------------------------------
-    total_products = db.query(func.count(Product.ProductID)) \
-        .filter(Product.IsDeleted != True).scalar() or 0
-
-    total_products_deleted = db.query(func.count(Product.ProductID)) \
-        .filter(Product.IsDeleted == True).scalar() or 0
 
+# -------------------------------------------------------
+# 4️⃣ PRODUCTS STATISTICS
+# -------------------------------------------------------
+def products_section(db: Session):
+    # Totals are summed from the per-creator groups, one scan of Product
     products_by_creator = (
         db.query(
             Product.CreatedByUserID,
-            func.count(Product.ProductID)
+            func.count(Product.ProductID).label("total"),
+            _count_if(Product.IsDeleted != True).label("active"),
+            _count_if(Product.IsDeleted == True).label("deleted"),
         )
         .group_by(Product.CreatedByUserID)
         .all()
     )
 
-    products_data = {
-        "total_products": total_products,
-        "total_deleted": total_products_deleted,
+    return {
+        "total_products": sum(row.active for row in products_by_creator),
+        "total_deleted": sum(row.deleted for row in products_by_creator),
         "products_by_creator": [
-            {"created_by": row[0], "total": row[1]}
+            {"created_by": row[0], "total": row.total}
             for row in products_by_creator
         ]
     }
 
-    # -------------------------------------------------------
-    # 5️⃣ REQUESTS STATISTICS (Enhanced)
-    # -------------------------------------------------------
 
-    # Total requests
-    total_requests = db.query(func.count(Request.Id)).filter(Request.IsDeleted != True).scalar() or 0
-    total_requests_deleted = db.query(func.count(Request.Id)).filter(Request.IsDeleted == True).scalar() or 0
-
-    # Requests by Status with names
+# -------------------------------------------------------
+# 5️⃣ REQUESTS STATISTICS (Enhanced)
+# -------------------------------------------------------
+def requests_section(db: Session):
+    # Totals and per-status counts in one scan of Requests
     requests_by_status = (
         db.query(
             Status.Id.label("status_id"),
             Status.Name.label("status_name"),
-            func.count(Request.Id).label("total")
+            _count_if(Request.IsDeleted != True).label("total"),
+            _count_if(Request.IsDeleted == True).label("deleted"),
         )
-        .join(Request, Request.StatusId == Status.Id)
-        .filter(Request.IsDeleted != True)
-        .group_by(Status.Id, Status.Name)
+        .outerjoin(Status, Request.StatusId == Status.Id)
+        .group_by(Request.StatusId, Status.Id, Status.Name)
         .all()
     )
+    total_requests = sum(r.total for r in requests_by_status)
+    total_requests_deleted = sum(r.deleted for r in requests_by_status)
 
     # Requests by Category with names AND responses per category
     requests_by_category = (
@@ -173,22 +177,8 @@ def all_statistics(db: Session = Depends(get_db)):
             Category.Id.label("category_id"),
             Category.Name.label("category_name"),
             func.count(Request.Id).label("total"),
-            func.coalesce(
-                func.sum(
-                    case(
-                        (Reply.Id != None, 1),
-                        else_=0
-                    )
-                ), 0
-            ).label("total_responded"),
-            func.coalesce(
-                func.sum(
-                    case(
-                        (Reply.Id == None, 1),
-                        else_=0
-                    )
-                ), 0
-            ).label("total_not_responded")
+            _count_if(Reply.Id != None).label("total_responded"),
+            _count_if(Reply.Id == None).label("total_not_responded")
         )
         .outerjoin(Request, Request.CategoryId == Category.Id)
         .outerjoin(Reply, (Reply.RequestId == Request.Id) & (Reply.IsDeleted != True))
@@ -200,12 +190,13 @@ def all_statistics(db: Session = Depends(get_db)):
     total_replied_requests = db.query(func.count(func.distinct(Reply.RequestId))) \
         .filter(Reply.IsDeleted != True).scalar() or 0
 
-    requests_data = {
+    return {
         "total_requests": total_requests,
         "total_deleted": total_requests_deleted,
         "requests_by_status": [
             {"status_id": r.status_id, "status_name": r.status_name, "total": r.total}
             for r in requests_by_status
+            if r.status_id is not None and r.total
         ],
         "requests_by_category": [
             {
@@ -221,15 +212,15 @@ def all_statistics(db: Session = Depends(get_db)):
         "total_responded_requests": total_replied_requests,
         "total_not_responded_requests": total_requests - total_replied_requests
     }
-    # -------------------------------------------------------
-    # 6️⃣ SURVEY STATISTICS
-    # -------------------------------------------------------
+
+
+# -------------------------------------------------------
+# 6️⃣ SURVEY STATISTICS
+# -------------------------------------------------------
+def survey_section(db: Session):
     total_questions = db.query(func.count(UsersFeedbackQuestion.Id)) \
         .filter(UsersFeedbackQuestion.IsDeleted != True).scalar() or 0
 
-    total_answers = db.query(func.count(UsersFeedbackAnswer.Id)) \
-        .filter(UsersFeedbackAnswer.IsDeleted != True).scalar() or 0
-
     answers_per_question = (
         db.query(
             UsersFeedbackAnswer.QuestionId,
@@ -240,99 +231,132 @@ def all_statistics(db: Session = Depends(get_db)):
         .all()
     )
 
-    total_votes = db.query(func.count(Vote.Id)).scalar() or 0
-
-    yes_votes = db.query(func.count(Vote.Id)) \
-        .filter(Vote.Answer == "Yes").scalar() or 0
-
-    no_votes = db.query(func.count(Vote.Id)) \
-        .filter(Vote.Answer == "No").scalar() or 0
-
-    no_reasons = (
-        db.query(Vote.SubAnswer, func.count(Vote.Id))
-        .filter(Vote.Answer == "No")
+    # Totals, yes/no and the "No" reasons in one scan of Vote
+    votes_by_reason = (
+        db.query(
+            Vote.SubAnswer,
+            func.count(Vote.Id).label("total"),
+            _count_if(Vote.Answer == "Yes").label("yes"),
+            _count_if(Vote.Answer == "No").label("no"),
+        )
         .group_by(Vote.SubAnswer)
         .all()
     )
 
-    survey_data = {
+    return {
         "feedback": {
             "total_questions": total_questions,
-            "total_answers": total_answers,
+            "total_answers": sum(row[1] for row in answers_per_question),
             "answers_per_question": [
                 {"question_id": row[0], "total": row[1]}
                 for row in answers_per_question
             ],
         },
         "vote": {
-            "total_votes": total_votes,
-            "yes_votes": yes_votes,
-            "no_votes": no_votes,
+            "total_votes": sum(row.total for row in votes_by_reason),
+            "yes_votes": sum(row.yes for row in votes_by_reason),
+            "no_votes": sum(row.no for row in votes_by_reason),
             "no_reasons": [
-                {"reason": row[0], "total": row[1]}
-                for row in no_reasons
+                {"reason": row.SubAnswer, "total": row.no}
+                for row in votes_by_reason
+                if row.no
             ]
         }
     }
 
-    # -------------------------------------------------------
-    # FINAL RESPONSE
-    # -------------------------------------------------------
-    full_data = {
-        "countries": countries_data,
-        "contact": contact_data,
-        "news": news_data,
-        "products": products_data,
-        "requests": requests_data,
-        "survey": survey_data
-    }
 
-    return success_response("All statistics retrieved successfully", data=full_data)
+STATISTICS_SECTIONS = {
+    "countries": countries_section,
+    "contact": contact_section,
+    "news": news_section,
+    "products": products_section,
+    "requests": requests_section,
+    "survey": survey_section,
+}
 
 
+def _run_section(section):
+    db = SessionLocal()
+    try:
+        return section(db)
+    finally:
+        db.close()
 
 
+def compute_sections(names):
+    # Independent sections run in parallel, each on its own connection
+    futures = {name: _section_executor.submit(_run_section, STATISTICS_SECTIONS[name]) for name in dict.fromkeys(names)}
+    return {name: future.result() for name, future in futures.items()}
 
 
-def build_timeline(query, date_column):
+@router.get("/statistics/all")
+@serve_snapshot("admin_statistics_all")
+@cached_response()
+def all_statistics(
+    sections: Optional[str] = Query(None, description="Comma separated subset of: " + ",".join(STATISTICS_SECTIONS)),
+):
     """
-    Returns a dict like {year: {month: count}}
-    Works for SQL Server using func.year / func.month.
+    Return all admin statistics in one clean endpoint:
+    - Countries (users + visitors)
+    - Contact form
+    - News statistics
+    - Products statistics
+    - Requests statistics
+    - Survey statistics
+    `sections` limits the response to the listed sections.
     """
-    year_expr = func.year(date_column).label("year")
-    month_expr = func.month(date_column).label("month")
-
-    results = (
-        query
-        .with_entities(
-            year_expr,
-            month_expr,
-            func.count().label("total")
+    names = [s.strip() for s in sections.split(",") if s.strip()] if sections else list(STATISTICS_SECTIONS)
+    unknown = [name for name in names if name not in STATISTICS_SECTIONS]
+    if unknown:
+        return error_response(
+            f"Unknown statistics section(s): {', '.join(unknown)}",
+            "قسم إحصائيات غير معروف",
+            "INVALID_SECTION"
         )
-        .group_by(year_expr, month_expr)
-        .order_by(year_expr, month_expr)
-        .all()
-    )
 
-    timeline = {}
-    for r in results:
-        y, m, total = int(r.year), int(r.month), r.total
-        if y not in timeline:
-            timeline[y] = {i: 0 for i in range(1, 13)}
-        timeline[y][m] = total
+    snapshot = snapshots.get("admin_statistics_all")
+    if snapshot is not None:
+        full_data = {name: snapshot.payload["data"][name] for name in dict.fromkeys(names)}
+    else:
+        full_data = compute_sections(names)
+
+    return success_response("All statistics retrieved successfully", data=full_data)
+
+
+snapshots.register(
+    "admin_statistics_all",
+    lambda db: success_response("All statistics retrieved successfully", data=compute_sections(STATISTICS_SECTIONS)),
+    SNAPSHOT_ADMIN_SECONDS,
+)
+
+
+
 
-    return timeline
 
 
 @router.get("/statistics/timeline")
-def timeline_statistics(db: Session = Depends(get_db)):
-    data = {
-        "users": build_timeline(db.query(User), User.CreatedAt),
-        "visitors": build_timeline(db.query(Visitor), Visitor.VisitAt),
-        "contact": build_timeline(db.query(ContactUs), ContactUs.CreatedAt),
-        "requests": build_timeline(db.query(Request).filter(Request.IsDeleted != True), Request.CreatedAt),
-        "survey_answers": build_timeline(db.query(UsersFeedbackAnswer).filter(UsersFeedbackAnswer.IsDeleted != True), UsersFeedbackAnswer.CreatedAt),
-        "votes": build_timeline(db.query(Vote), Vote.CreatedAt),
-    }
+@serve_snapshot("admin_statistics_timeline", only_if=lambda: not timeline_store.loaded)
+def timeline_statistics(
+    response: Response,
+    year: Optional[int] = Query(None, description="Only this year; past years are immutable and cached by clients"),
+):
+    """
+    Monthly counts per entity as {year: {month: count}}.
+    Served from the timeline store (closed months are frozen, only the current month is live);
+    until the store has loaded, unfiltered calls get the last snapshot.
+    """
+    if year is not None and year < timeline_store.current_year:
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+
+    return build_timeline_response(year)
+
 
+def build_timeline_response(year: Optional[int] = None):
+    if not timeline_store.loaded:
+        timeline_store.ensure_loaded()
+
+    data = {entity: timeline_store.timeline(entity, year) for entity in TIMELINE_ENTITIES}
     return success_response("Timeline statistics retrieved successfully", data=data)
+
+
+snapshots.register("admin_statistics_timeline", lambda db: build_timeline_response(), SNAPSHOT_ADMIN_SECONDS)
@@ -15,6 +15,8 @@ import jwt
 from app.models.lookups import  UserTitle, OrganizationType, Country, City
 from datetime import datetime
 from app.utils.utils import get_optional_user, extract_email_domain
+from app.utils.home_counters import home_counters, TOTAL_USERS
+from app.utils.timeline_store import timeline_store
 from app.models.role_feature import Role
 import os
 from dotenv import load_dotenv
@@ -193,6 +195,8 @@ def register(
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    home_counters.increment(TOTAL_USERS)
+    timeline_store.record("users", new_user.CreatedAt)
 
     # Generate email verification link
     token = create_verification_token(user.Email, expires_minutes=None)
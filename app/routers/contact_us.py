@@ -12,6 +12,7 @@ from app.utils.email import send_email, send_email_with_attachment , CONTACT_DIR
 from app.utils.response import success_response, error_response
 from app.utils.utils import get_optional_user, require_admin
 from app.utils.paths import static_path
+from app.utils.timeline_store import timeline_store
 
 router = APIRouter(prefix="/contact-us", tags=["ContactUs"])
 
@@ -78,6 +79,7 @@ def create_contact(
     db.add(new_contact)
     db.commit()
     db.refresh(new_contact)
+    timeline_store.record("contact", new_contact.CreatedAt)
 
     # 4️⃣ Notify admin
     admin_subject = f"New ContactUs: {Subject or 'No subject'}"
@@ -1,25 +1,85 @@
 # app/routers/dashboard.py
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func,and_, extract ,literal_column ,text , distinct ,or_
 from datetime import datetime
 from typing import Optional, List
-from app.database import get_db
+import inspect
+from app.database import get_db, SessionLocal
 from app.models.visitors import Visitor
 from app.models.users import User
 from app.models.lookups import Country, OrganizationType
 from app.models.dashboard import DownloadRequest, DownloadItem
-from app.utils.response import success_response
+from app.utils.response import success_response, error_response
+from app.utils.utils import require_admin
+from app.utils.export import iter_export, export_media, EXPORT_FETCH_SIZE
+from app.utils.response_cache import cached_response, response_cache, build_cache_key, month_aligned_ttl, encode_json, json_bytes_response
+from app.utils.date_range import date_range_filters, month_bucket, month_key, month_bounds, parse_month
+from app.utils.visitor_grid import visitor_grid, bbox_to_tile_range, serialize_cells, HEATMAP_MAX_ZOOM
+from app.utils.visitor_sketches import visitor_sketches, to_date_range
+from app.utils.snapshots import snapshots, serve_snapshot, SNAPSHOT_DASHBOARD_SECONDS
 from datetime import datetime
 
 router = APIRouter(prefix="/dashboard", tags=["Visitors Dashboard"])
 
+
+# ---------------------------------------------------------
+# Shared filter builders (used by the filter and export endpoints)
+# ---------------------------------------------------------
+def build_visitor_filters(start_date: Optional[str] = None, end_date: Optional[str] = None, country_id: Optional[int] = None):
+    """
+    Returns the WHERE clauses for visitor queries.
+    Raises ValueError with a user-facing message on bad dates.
+    """
+    filters = []
+    try:
+        filters.extend(date_range_filters(Visitor.VisitAt, start_date=start_date))
+    except ValueError:
+        raise ValueError("Invalid start_date format. Use YYYY-MM")
+    try:
+        filters.extend(date_range_filters(Visitor.VisitAt, end_date=end_date))
+    except ValueError:
+        raise ValueError("Invalid end_date format. Use YYYY-MM")
+    if country_id:
+        filters.append(Visitor.CountryID == country_id)
+    return filters
+
+
+def build_user_filters(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    country: Optional[str] = None,
+    orgtype: Optional[List[str]] = None,
+):
+    """
+    Returns (filters_users, filters_requests) for registered users and download requests.
+    Raises ValueError with a user-facing message on bad dates.
+    """
+    filters_users = []
+    filters_requests = []
+
+    try:
+        filters_users.extend(date_range_filters(User.CreatedAt, start_date, end_date))
+        filters_requests.extend(date_range_filters(DownloadRequest.Date, start_date, end_date))
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM")
+    if country:
+        filters_users.append(User.country.has(Country.CountryCode == country))
+        filters_requests.append(DownloadRequest.Country == country)
+    if orgtype:
+        filters_users.append(User.organization_type.has(OrganizationType.NameEn.in_(orgtype)))
+        filters_requests.append(DownloadRequest.OrgType.in_(orgtype))
+
+    return filters_users, filters_requests
+
 # ---------------------------------------------------------
 # 0 Visitors filter Options
 # ---------------------------------------------------------
 
 
 @router.get("/visitors/filter-options")
+@cached_response()
 def get_visitor_filter_options(db: Session = Depends(get_db)):
     """
     Returns all countries that have visitor data.
@@ -67,27 +127,35 @@ def get_visitor_filter_options(db: Session = Depends(get_db)):
 
 
 
+def _unique_visitors(db: Session, start_day=None, end_day=None, country_ids=None):
+    """(total, per month) unique visitor estimates; 503 while the sketches are still being backfilled."""
+    if not visitor_sketches.ready:
+        # Raised (not returned) so neither the response cache nor the snapshot keeps it
+        raise HTTPException(status_code=503, detail="Unique visitor counts are warming up, try again shortly")
+    return visitor_sketches.estimate(db, start_day, end_day, country_ids)
+
+
 # ---------------------------------------------------------
 # 1️⃣ Visitors Summary Endpoint
 # ---------------------------------------------------------
 @router.get("/visitors/summary")
+@serve_snapshot("visitors_summary")
+@cached_response()
 def visitors_summary(db: Session = Depends(get_db)):
     """
     Returns total visitors, per-month counts, and per-country counts.
     """
 
-    year_expr = func.year(Visitor.VisitAt)
-    month_expr = func.month(Visitor.VisitAt)
+    month_expr = month_bucket(Visitor.VisitAt)
 
     # --- Visitors per month ---
     per_month = (
         db.query(
-            year_expr.label("year"),
             month_expr.label("month"),
             func.count(Visitor.VisitorID).label("count"),
         )
-        .group_by(year_expr, month_expr)
-        .order_by(year_expr, month_expr)
+        .group_by(month_expr)
+        .order_by(month_expr)
         .all()
     )
 
@@ -108,10 +176,20 @@ def visitors_summary(db: Session = Depends(get_db)):
     # --- Total visitors ---
     total_visitors = db.query(func.count(Visitor.VisitorID)).scalar()
 
+    # --- Approximate unique visitors (HyperLogLog sketches) ---
+    unique_visitors, unique_per_month = _unique_visitors(db)
+
     data = {
         "total": total_visitors,
+        "unique_visitors": unique_visitors,
         "per_month": [
-            {"year": r.year, "month": r.month, "count": r.count} for r in per_month
+            {
+                "year": r.month.year if r.month else None,
+                "month": r.month.month if r.month else None,
+                "count": r.count,
+                "unique": unique_per_month.get(month_key(r.month), 0),
+            }
+            for r in per_month
         ],
         "per_country": [
             {
@@ -127,7 +205,11 @@ def visitors_summary(db: Session = Depends(get_db)):
     return success_response("Visitors summary retrieved successfully", data=data)
 
 
+snapshots.register("visitors_summary", lambda db: inspect.unwrap(visitors_summary)(db=db), SNAPSHOT_DASHBOARD_SECONDS)
+
+
 @router.get("/visitors/filter")
+@cached_response()
 def visitors_filter(
     start_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
     end_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
@@ -143,23 +225,10 @@ def visitors_filter(
     """
 
     # --- Prepare date filters ---
-    filters = []
-    if start_date:
-        try:
-            start = datetime.strptime(start_date, "%Y-%m")
-            filters.append((extract("year", Visitor.VisitAt) * 100 + extract("month", Visitor.VisitAt)) 
-                           >= start.year * 100 + start.month)
-        except ValueError:
-            return {"error": "Invalid start_date format. Use YYYY-MM"}
-    if end_date:
-        try:
-            end = datetime.strptime(end_date, "%Y-%m")
-            filters.append((extract("year", Visitor.VisitAt) * 100 + extract("month", Visitor.VisitAt)) 
-                           <= end.year * 100 + end.month)
-        except ValueError:
-            return {"error": "Invalid end_date format. Use YYYY-MM"}
-    if country_id:
-        filters.append(Visitor.CountryID == country_id)
+    try:
+        filters = build_visitor_filters(start_date, end_date, country_id)
+    except ValueError as exc:
+        return {"error": str(exc)}
 
     # --- Aggregate total visitors per country ---
     per_country_query = (
@@ -178,27 +247,32 @@ def visitors_filter(
     total_visitors = sum(r.count for r in per_country)
 
     # --- Time series per month ---
-    year_expr_visitors = extract("year", Visitor.VisitAt).label("year")
-    month_expr_visitors = extract("month", Visitor.VisitAt).label("month")
+    month_expr_visitors = month_bucket(Visitor.VisitAt)
 
     time_series_query = (
         db.query(
-            year_expr_visitors,
-            month_expr_visitors,
+            month_expr_visitors.label("month"),
             func.count(Visitor.VisitorID).label("count")
         )
         .filter(*filters)
-        .group_by(year_expr_visitors, month_expr_visitors)
-        .order_by(year_expr_visitors, month_expr_visitors)
+        .group_by(month_expr_visitors)
+        .order_by(month_expr_visitors)
     )
     time_series = time_series_query.all()
 
+    # --- Approximate unique visitors (HyperLogLog sketches) ---
+    start_day, end_day = to_date_range(*month_bounds(start_date, end_date))
+    country_ids = [country_id] if country_id else None
+    unique_visitors, unique_per_month = _unique_visitors(db, start_day, end_day, country_ids)
+
     formatted_series = [
-        {"month": f"{int(r.year)}-{int(r.month):02d}", "count": r.count} for r in time_series
+        {"month": month_key(r.month), "count": r.count, "unique": unique_per_month.get(month_key(r.month), 0)}
+        for r in time_series
     ]
 
     data = {
         "total": total_visitors,
+        "unique_visitors": unique_visitors,
         "countries": [
             {"country_code": r.country_code, "country_name": r.country_name, "country_name_ar": r.country_name_ar, "count": r.count}
             for r in per_country
@@ -209,6 +283,89 @@ def visitors_filter(
     return success_response("Visitors filtered successfully", data=data)
 
 
+# ---------------------------------------------------------
+# Unique visitors (merged HyperLogLog sketches)
+# ---------------------------------------------------------
+@router.get("/visitors/uniques")
+@cached_response()
+def visitors_uniques(
+    start_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
+    end_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
+    country_ids: Optional[List[int]] = Query(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Returns approximate distinct visitors (by session) for a month range and a set of countries,
+    as a total and per month. Estimates have a standard error of about 1.6%.
+    """
+    try:
+        start_day, end_day = to_date_range(*month_bounds(start_date, end_date))
+    except ValueError:
+        return {"error": "Invalid date format. Use YYYY-MM"}
+
+    unique_visitors, per_month = _unique_visitors(db, start_day, end_day, country_ids)
+    data = {
+        "unique_visitors": unique_visitors,
+        "per_month": [{"month": month, "unique": count} for month, count in per_month.items()],
+    }
+    return success_response("Unique visitors retrieved successfully", data=data)
+
+
+# ---------------------------------------------------------
+# Visitors heatmap (aggregated grid cells)
+# ---------------------------------------------------------
+@router.get("/visitors/heatmap")
+def visitors_heatmap(
+    z: int = Query(..., ge=0, le=HEATMAP_MAX_ZOOM, description="Map zoom level"),
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    start_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
+    end_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
+    db: Session = Depends(get_db),
+):
+    """
+    Returns visitor counts aggregated into web-mercator tiles (quadkeys) of zoom `z`,
+    optionally limited to a bounding box and a month range.
+    """
+    try:
+        if start_date:
+            parse_month(start_date)
+        if end_date:
+            parse_month(end_date)
+    except ValueError:
+        return {"error": "Invalid date format. Use YYYY-MM"}
+
+    tile_range = None
+    if bbox:
+        try:
+            min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+        except ValueError:
+            return {"error": "Invalid bbox. Use min_lon,min_lat,max_lon,max_lat"}
+        tile_range = bbox_to_tile_range((min_lon, min_lat, max_lon, max_lat), z)
+
+    # Cache per (zoom, cell range, month range): small pans inside the same cells share an entry
+    key = build_cache_key("visitors_heatmap", {
+        "z": z,
+        "tiles": list(tile_range) if tile_range else None,
+        "start_date": start_date,
+        "end_date": end_date,
+    })
+    body = response_cache.get(key)
+    if body is not None:
+        return json_bytes_response(body)
+
+    visitor_grid.ensure_loaded(db)
+    cells = visitor_grid.cells(z, tile_range, start_date, end_date)
+
+    data = {
+        "z": z,
+        "total": sum(cells.values()),
+        "cells": serialize_cells(cells, z),
+    }
+    body = encode_json(success_response("Visitors heatmap retrieved successfully", data=data))
+    response_cache.set(key, body, month_aligned_ttl(end_date))
+    return json_bytes_response(body)
+
+
 
 
 
@@ -223,6 +380,7 @@ def visitors_filter(
 # ----------------------------
 
 @router.get("/users/filter-options")
+@cached_response()
 def get_user_filter_options(db: Session = Depends(get_db)):
     """
     Returns available filter options for users/downloads dashboard:
@@ -289,6 +447,8 @@ def get_user_filter_options(db: Session = Depends(get_db)):
 # 3️⃣ Users & Downloads Summary Endpoint
 # ----------------------------
 @router.get("/users/summary")
+@serve_snapshot("users_summary")
+@cached_response()
 def users_summary(db: Session = Depends(get_db)):
     """
     Returns total users, total download requests, download items,
@@ -302,13 +462,12 @@ def users_summary(db: Session = Depends(get_db)):
     # ----------------------------------------
     # Users per month
     # ----------------------------------------
-    user_year_expr = func.year(User.CreatedAt).label("year")
-    user_month_expr = func.month(User.CreatedAt).label("month")
+    user_month_expr = month_bucket(User.CreatedAt)
 
     users_per_month = (
-        db.query(user_year_expr, user_month_expr, func.count(User.UserID).label("count"))
-        .group_by(user_year_expr, user_month_expr)
-        .order_by(user_year_expr, user_month_expr)
+        db.query(user_month_expr.label("month"), func.count(User.UserID).label("count"))
+        .group_by(user_month_expr)
+        .order_by(user_month_expr)
         .all()
     )
 
@@ -346,13 +505,12 @@ def users_summary(db: Session = Depends(get_db)):
     # ----------------------------------------
     # Requests per month
     # ----------------------------------------
-    req_year_expr = func.year(DownloadRequest.Date).label("year")
-    req_month_expr = func.month(DownloadRequest.Date).label("month")
+    req_month_expr = month_bucket(DownloadRequest.Date)
 
     requests_per_month = (
-        db.query(req_year_expr, req_month_expr, func.count(DownloadRequest.ReqNo).label("count"))
-        .group_by(req_year_expr, req_month_expr)
-        .order_by(req_year_expr, req_month_expr)
+        db.query(req_month_expr.label("month"), func.count(DownloadRequest.ReqNo).label("count"))
+        .group_by(req_month_expr)
+        .order_by(req_month_expr)
         .all()
     )
 
@@ -360,10 +518,10 @@ def users_summary(db: Session = Depends(get_db)):
     # Downloads per month
     # ----------------------------------------
     downloads_per_month = (
-        db.query(req_year_expr, req_month_expr, func.count(DownloadItem.ID).label("count"))
+        db.query(req_month_expr.label("month"), func.count(DownloadItem.ID).label("count"))
         .join(DownloadItem, DownloadItem.ReqNo == DownloadRequest.ReqNo)
-        .group_by(req_year_expr, req_month_expr)
-        .order_by(req_year_expr, req_month_expr)
+        .group_by(req_month_expr)
+        .order_by(req_month_expr)
         .all()
     )
 
@@ -392,12 +550,6 @@ def users_summary(db: Session = Depends(get_db)):
         .all()
     )
 
-    # Helper to format YYYY-MM
-    def format_year_month(year_val, month_val):
-        if year_val is None or month_val is None:
-            return None
-        return f"{int(year_val)}-{int(month_val):02d}"
-
     data = {
         "total_users": total_users,
         "total_requests": total_requests,
@@ -405,7 +557,7 @@ def users_summary(db: Session = Depends(get_db)):
 
         # ✅ NEW: Users per month
         "users_per_month": [
-            {"month": format_year_month(r.year, r.month), "count": r.count}
+            {"month": month_key(r.month), "count": r.count}
             for r in users_per_month
         ],
 
@@ -418,11 +570,11 @@ def users_summary(db: Session = Depends(get_db)):
             for r in downloads_per_country
         ],
         "requests_per_month": [
-            {"month": format_year_month(r.year, r.month), "count": r.count}
+            {"month": month_key(r.month), "count": r.count}
             for r in requests_per_month
         ],
         "downloads_per_month": [
-            {"month": format_year_month(r.year, r.month), "count": r.count}
+            {"month": month_key(r.month), "count": r.count}
             for r in downloads_per_month
         ],
         "downloads_per_orgtype": [
@@ -435,10 +587,14 @@ def users_summary(db: Session = Depends(get_db)):
 
     return success_response("Users & downloads summary retrieved successfully", data=data)
 
+
+snapshots.register("users_summary", lambda db: inspect.unwrap(users_summary)(db=db), SNAPSHOT_DASHBOARD_SECONDS)
+
 # ----------------------------
 # 2️⃣ Users & Downloads Filter Endpoint
 # ----------------------------
 @router.get("/users/filter")
+@cached_response()
 def users_filter(
     start_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
     end_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
@@ -458,23 +614,10 @@ def users_filter(
     # -----------------------------
     # 1️⃣ APPLY FILTERS
     # -----------------------------
-    filters_users = []
-    filters_requests = []
-
-    if start_date:
-        s = datetime.strptime(start_date, "%Y-%m")
-        filters_users.append(User.CreatedAt >= s)
-        filters_requests.append(DownloadRequest.Date >= s)
-    if end_date:
-        e = datetime.strptime(end_date, "%Y-%m")
-        filters_users.append(User.CreatedAt <= e)
-        filters_requests.append(DownloadRequest.Date <= e)
-    if country:
-        filters_users.append(User.country.has(Country.CountryCode == country))
-        filters_requests.append(DownloadRequest.Country == country)
-    if orgtype:
-        filters_users.append(User.organization_type.has(OrganizationType.NameEn.in_(orgtype)))
-        filters_requests.append(DownloadRequest.OrgType.in_(orgtype))
+    try:
+        filters_users, filters_requests = build_user_filters(start_date, end_date, country, orgtype)
+    except ValueError as exc:
+        return {"error": str(exc)}
 
     # -----------------------------
     # 2️⃣ FILTERED DOWNLOAD REQUESTS
@@ -567,45 +710,33 @@ def users_filter(
     # -----------------------------
     # 6️⃣ DATA PER MONTH
     # -----------------------------
+    request_month_expr = month_bucket(request_subq.c.Date)
     requests_per_month = (
         db.query(
-            extract("year", request_subq.c.Date).label("year"),
-            extract("month", request_subq.c.Date).label("month"),
+            request_month_expr.label("month"),
             func.count(distinct(request_subq.c.ReqNo)).label("requests"),
             func.count(distinct(request_subq.c.UserID)).label("request_users"),
             func.count(request_subq.c.DatasetName).label("downloads")
         )
-        .group_by(
-            extract("year", request_subq.c.Date),
-            extract("month", request_subq.c.Date)
-        )
-        .order_by(
-            extract("year", request_subq.c.Date),
-            extract("month", request_subq.c.Date)
-        )
+        .group_by(request_month_expr)
+        .order_by(request_month_expr)
         .all()
     )
 
+    user_month_expr = month_bucket(filtered_users_subq.c.CreatedAt)
     users_per_month = (
         db.query(
-            extract("year", filtered_users_subq.c.CreatedAt).label("year"),
-            extract("month", filtered_users_subq.c.CreatedAt).label("month"),
+            user_month_expr.label("month"),
             func.count(filtered_users_subq.c.UserID).label("register_users")
         )
-        .group_by(
-            extract("year", filtered_users_subq.c.CreatedAt),
-            extract("month", filtered_users_subq.c.CreatedAt)
-        )
-        .order_by(
-            extract("year", filtered_users_subq.c.CreatedAt),
-            extract("month", filtered_users_subq.c.CreatedAt)
-        )
+        .group_by(user_month_expr)
+        .order_by(user_month_expr)
         .all()
     )
 
     month_data = {}
     for r in requests_per_month:
-        key = f"{int(r.year)}-{int(r.month):02d}"
+        key = month_key(r.month)
         month_data[key] = {
             "month": key,
             "requests": r.requests,
@@ -614,7 +745,7 @@ def users_filter(
             "register_users": 0
         }
     for u in users_per_month:
-        key = f"{int(u.year)}-{int(u.month):02d}"
+        key = month_key(u.month)
         if key not in month_data:
             month_data[key] = {
                 "month": key,
@@ -681,3 +812,220 @@ def users_filter(
     }
 
     return success_response("Filtered user downloads successfully", data=response)  
+
+
+
+
+#-------------------------------------------------------------------------------
+#--------------------------Exports----------------------------------------------
+#-------------------------------------------------------------------------------
+
+EXPORT_FORMAT_PATTERN = "^(csv|parquet)$"
+
+
+def _stream_query_rows(build_query):
+    """
+    Yields plain tuples from a query built on a dedicated session.
+    The request-scoped session is already closed while the response streams,
+    and yield_per keeps only one fetch batch in memory.
+    """
+    db = SessionLocal()
+    try:
+        for row in build_query(db).yield_per(EXPORT_FETCH_SIZE):
+            yield tuple(row)
+    finally:
+        db.close()
+
+
+def _export_response(name: str, file_format: str, compress: bool, columns, build_query):
+    media_type, extension = export_media(file_format, compress)
+    filename = f"{name}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{extension}"
+    return StreamingResponse(
+        iter_export(file_format, columns, _stream_query_rows(build_query), compress=compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# ----------------------------
+# Export visitors
+# ----------------------------
+@router.get("/export/visitors")
+def export_visitors(
+    start_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
+    end_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
+    country_id: Optional[int] = Query(None),
+    file_format: str = Query("csv", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    compress: bool = Query(True, description="Gzip CSV output"),
+    admin: User = Depends(require_admin),
+):
+    """
+    Streams visitor rows (same filters as /visitors/filter) as CSV or Parquet.
+    """
+    try:
+        filters = build_visitor_filters(start_date, end_date, country_id)
+    except ValueError as exc:
+        return error_response(str(exc), error_code="INVALID_DATE")
+
+    columns = [
+        ("VisitorID", "int"),
+        ("VisitAt", "datetime"),
+        ("CountryCode", "str"),
+        ("CountryName", "str"),
+        ("IPAddress", "str"),
+        ("SessionID", "str"),
+        ("X", "float"),
+        ("Y", "float"),
+    ]
+
+    def build_query(db: Session):
+        return (
+            db.query(
+                Visitor.VisitorID,
+                Visitor.VisitAt,
+                Country.CountryCode,
+                Country.CountryName,
+                Visitor.IPAddress,
+                Visitor.SessionID,
+                Visitor.X,
+                Visitor.Y,
+            )
+            .outerjoin(Country, Visitor.CountryID == Country.OBJECTID)
+            .filter(*filters)
+            .order_by(Visitor.VisitorID)
+        )
+
+    return _export_response("visitors", file_format, compress, columns, build_query)
+
+
+# ----------------------------
+# Export download requests & items (one row per downloaded item)
+# ----------------------------
+@router.get("/export/downloads")
+def export_downloads(
+    start_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
+    end_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
+    country: Optional[str] = Query(None, description="Filter with CountryCode"),
+    orgtype: Optional[List[str]] = Query(None),
+    dataset_name: Optional[List[str]] = Query(None),
+    file_format: str = Query("csv", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    compress: bool = Query(True, description="Gzip CSV output"),
+    admin: User = Depends(require_admin),
+):
+    """
+    Streams download requests joined with their items (same filters as /users/filter).
+    """
+    try:
+        _, filters_requests = build_user_filters(start_date, end_date, country, orgtype)
+    except ValueError as exc:
+        return error_response(str(exc), error_code="INVALID_DATE")
+    if dataset_name:
+        filters_requests.append(DownloadItem.DatasetName.in_(dataset_name))
+
+    columns = [
+        ("ReqNo", "int"),
+        ("Date", "datetime"),
+        ("UserID", "int"),
+        ("Country", "str"),
+        ("OrgType", "str"),
+        ("OrgName", "str"),
+        ("Purpose", "str"),
+        ("ItemID", "int"),
+        ("DatasetName", "str"),
+        ("GridCode", "str"),
+        ("EnglishName", "str"),
+        ("AreaType", "str"),
+        ("Cost", "str"),
+    ]
+
+    def build_query(db: Session):
+        return (
+            db.query(
+                DownloadRequest.ReqNo,
+                DownloadRequest.Date,
+                DownloadRequest.UserID,
+                DownloadRequest.Country,
+                DownloadRequest.OrgType,
+                DownloadRequest.OrgName,
+                DownloadRequest.Purpose,
+                DownloadItem.ID,
+                DownloadItem.DatasetName,
+                DownloadItem.GridCode,
+                DownloadItem.EnglishName,
+                DownloadItem.AreaType,
+                DownloadItem.Cost,
+            )
+            .join(DownloadItem, DownloadItem.ReqNo == DownloadRequest.ReqNo)
+            .filter(*filters_requests)
+            .order_by(DownloadRequest.ReqNo, DownloadItem.ID)
+        )
+
+    return _export_response("downloads", file_format, compress, columns, build_query)
+
+
+# ----------------------------
+# Export registered users
+# ----------------------------
+@router.get("/export/users")
+def export_users(
+    start_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
+    end_date: Optional[str] = Query(None, description="Format: YYYY-MM"),
+    country: Optional[str] = Query(None, description="Filter with CountryCode"),
+    orgtype: Optional[List[str]] = Query(None),
+    dataset_name: Optional[List[str]] = Query(None),
+    file_format: str = Query("csv", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    compress: bool = Query(True, description="Gzip CSV output"),
+    admin: User = Depends(require_admin),
+):
+    """
+    Streams registered users (same filters as /users/filter).
+    With dataset_name, only users who requested those datasets are exported.
+    """
+    try:
+        filters_users, filters_requests = build_user_filters(start_date, end_date, country, orgtype)
+    except ValueError as exc:
+        return error_response(str(exc), error_code="INVALID_DATE")
+
+    columns = [
+        ("UserID", "int"),
+        ("FirstName", "str"),
+        ("LastName", "str"),
+        ("Email", "str"),
+        ("OrganizationType", "str"),
+        ("OrganizationName", "str"),
+        ("JobTitle", "str"),
+        ("CountryCode", "str"),
+        ("CreatedAt", "datetime"),
+        ("IsApproved", "bool"),
+        ("IsActive", "bool"),
+    ]
+
+    def build_query(db: Session):
+        query = (
+            db.query(
+                User.UserID,
+                User.FirstName,
+                User.LastName,
+                User.Email,
+                OrganizationType.NameEn,
+                User.OrganizationName,
+                User.JobTitle,
+                Country.CountryCode,
+                User.CreatedAt,
+                User.IsApproved,
+                User.IsActive,
+            )
+            .outerjoin(OrganizationType, User.OrganizationTypeID == OrganizationType.OrganizationTypeID)
+            .outerjoin(Country, User.CountryID == Country.OBJECTID)
+            .filter(*filters_users)
+        )
+        if dataset_name:
+            requested_by = (
+                db.query(DownloadRequest.UserID)
+                .join(DownloadItem, DownloadItem.ReqNo == DownloadRequest.ReqNo)
+                .filter(*filters_requests, DownloadItem.DatasetName.in_(dataset_name))
+            )
+            query = query.filter(User.UserID.in_(requested_by))
+        return query.order_by(User.UserID)
+
+    return _export_response("users", file_format, compress, columns, build_query)
@@ -15,6 +15,7 @@ from app.schemas.metadata import (
 from app.utils.response import success_response, error_response
 from app.utils.utils import require_admin
 from app.utils.paths import static_path
+from app.utils.tile_layers import bump_layer
 from sqlalchemy import or_, func
 from fastapi import Query
 
@@ -469,6 +470,7 @@ def create_metadata(
     db.add(new_metadata)
     db.commit()
     db.refresh(new_metadata)
+    bump_layer("metadata")
 
     # Handle file
     if file:
@@ -542,6 +544,7 @@ def update_metadata(
 
     db.commit()
     db.refresh(metadata)
+    bump_layer("metadata")
 
     return success_response(
         "Metadata updated successfully",
@@ -557,6 +560,7 @@ def delete_metadata(metadata_id: int, db: Session = Depends(get_db), user=Depend
         return error_response("Metadata not found", "لم يتم العثور على البيانات الوصفية")
     metadata.IsDeleted = True
     db.commit()
+    bump_layer("metadata")
     return success_response(
         "Metadata soft deleted successfully",
         "تم حذف البيانات الوصفية بنجاح",
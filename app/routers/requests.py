@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, BackgroundTasks, File, UploadFile, Form,
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.lookups import Category, Format, Projection, RequestInformation, Status, ComplaintScreen
-from app.models.requests import Request
+from app.models.requests import Request, RequestData, Request_RequestInformation, Request_Format
 from app.models.users import User
 from app.schemas.lookups import (
     CategorySchema, FormatSchema, ProjectionSchema,
@@ -16,7 +16,10 @@ import os
 import shutil
 from typing import Optional, List
 from app.utils.utils import get_current_user
-from sqlalchemy import text
+from app.utils.timeline_store import timeline_store
+from app.utils.request_numbers import request_numbers
+from app.utils.request_lookups import request_lookups
+from sqlalchemy import insert
 
 router = APIRouter(prefix="/requests", tags=["Requests"])
 
@@ -67,8 +70,30 @@ def create_request(
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
-    # ---------------- 1) Save attachment ----------------
+    # ---------------- 1) Validate against the cached lookups ----------------
+    def parse_list(v):
+        # Unique ids (the link tables are keyed on them)
+        return list(dict.fromkeys(int(x.strip()) for x in v.split(",") if x.strip().isdigit())) if v else []
+
+    if ProjectionId in (0, "0", "", None):
+        ProjectionId = None
+    info_ids = parse_list(RequestInformationIds)
+    format_ids = parse_list(FormatIds)
+
+    if request_lookups.unknown(db, "category", [CategoryId]):
+        return error_response("Invalid CategoryId", "معرف الفئة غير صالح")
+    if ComplaintScreenId is not None and request_lookups.unknown(db, "complaint_screen", [ComplaintScreenId]):
+        return error_response("Invalid ComplaintScreenId", "معرف الشاشة غير صالح")
+    if ProjectionId is not None and request_lookups.unknown(db, "projection", [ProjectionId]):
+        return error_response("Invalid ProjectionId", "معرف الإسقاط غير صالح")
+    if request_lookups.unknown(db, "request_information", info_ids):
+        return error_response("Invalid RequestInformationIds", "معرفات معلومات الطلب غير صالحة")
+    if request_lookups.unknown(db, "format", format_ids):
+        return error_response("Invalid FormatIds", "معرفات الصيغ غير صالحة")
+
+    # ---------------- 2) Save attachment ----------------
     attach_rel = None
+    save_path = None
     if attach:
         safe_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{attach.filename.replace(' ', '_')}"
         save_path = os.path.join(REQUEST_DIR, safe_name)
@@ -76,78 +101,73 @@ def create_request(
             shutil.copyfileobj(attach.file, buffer)
         attach_rel = f"requests/{safe_name}"
 
-    # ---------------- 2) Generate Request Number ----------------
-    last_request = db.query(Request).order_by(Request.Id.desc()).first()
-    next_number = 1 if not last_request else last_request.Id + 1
-    request_number = f"RQ-{datetime.now().strftime('%Y%m%d')}-{str(next_number).zfill(4)}"
-
-    # ---------------- 3) Validate Projection ----------------
-    if ProjectionId in (0, "0", "", None):
-        ProjectionId = None
-    elif ProjectionId and not db.query(Projection).filter(Projection.Id == ProjectionId).first():
-        return error_response("Invalid ProjectionId", "معرف الإسقاط غير صالح")
-
-    # ---------------- 4) Create main request ----------------
-    new_request = Request(
-        UserId=user.UserID,
-        CategoryId=CategoryId,
-        ComplaintScreenId=ComplaintScreenId,
-        Subject=Subject,
-        Body=Body,
-        AssignedRoleId=None,
-        RequestNumber=request_number,
-        StatusId=7,
-        CreatedAt=datetime.utcnow(),
-        AttachPath=attach_rel
-    )
-    db.add(new_request)
-    db.commit()
-    db.refresh(new_request)
-
-    # ---------------- 5) Create RequestData (Category = 8) ----------------
-    if CategoryId == 8:
-        from app.models.requests import RequestData
-        data = RequestData(
-            RequestId=new_request.Id,
-            ProspectiveName=ProspectiveName,
-            Coordinate_TopLeft=Coordinate_TopLeft,
-            Coordinate_BottomRight=Coordinate_BottomRight,
-            ProjectionId=ProjectionId,
-            OtherSpecification=OtherSpecification,
-            OtherFormat=OtherFormat,
-            IntendedPurpose=IntendedPurpose,
-            RequirementsDetails=RequirementsDetails,
-            CreatedAt=datetime.utcnow()
+    # ---------------- 3) Generate Request Number ----------------
+    # From a block reserved in memory (utils/request_numbers.py); unique, may have gaps
+    request_number = request_numbers.next_number()
+
+    # ---------------- 4) Write everything in one transaction ----------------
+    # Read before the commit expires `user` (it shares this session)
+    user_name, user_email = user.FirstName, user.Email
+    created_at = datetime.utcnow()
+    try:
+        new_request = Request(
+            UserId=user.UserID,
+            CategoryId=CategoryId,
+            ComplaintScreenId=ComplaintScreenId,
+            Subject=Subject,
+            Body=Body,
+            AssignedRoleId=None,
+            RequestNumber=request_number,
+            StatusId=7,
+            CreatedAt=created_at,
+            AttachPath=attach_rel
         )
-        db.add(data)
+        db.add(new_request)
+        # The INSERT returns the new Id (OUTPUT INSERTED) for the child rows
+        db.flush()
+        request_id = new_request.Id
+
+        # RequestData (Category = 8)
+        if CategoryId == 8:
+            db.add(RequestData(
+                RequestId=request_id,
+                ProspectiveName=ProspectiveName,
+                Coordinate_TopLeft=Coordinate_TopLeft,
+                Coordinate_BottomRight=Coordinate_BottomRight,
+                ProjectionId=ProjectionId,
+                OtherSpecification=OtherSpecification,
+                OtherFormat=OtherFormat,
+                IntendedPurpose=IntendedPurpose,
+                RequirementsDetails=RequirementsDetails,
+                CreatedAt=created_at
+            ))
+
+        # M2M relationships, one executemany each
+        if info_ids:
+            db.execute(insert(Request_RequestInformation), [
+                {"RequestId": request_id, "RequestInformationId": info_id} for info_id in info_ids
+            ])
+        if format_ids:
+            db.execute(insert(Request_Format), [
+                {"RequestId": request_id, "FormatId": format_id} for format_id in format_ids
+            ])
         db.commit()
+    except Exception:
+        db.rollback()
+        if save_path and os.path.exists(save_path):
+            os.remove(save_path)
+        raise
+    timeline_store.record("requests", created_at)
 
-    # ---------------- 6) Insert M2M relationships ----------------
-    def parse_list(v):
-        return [int(x.strip()) for x in v.split(",") if x.strip().isdigit()] if v else []
-
-    for info_id in parse_list(RequestInformationIds):
-        db.execute(
-            text("INSERT INTO [Requests].[Request_RequestInformation] (RequestId, RequestInformationId) VALUES (:r, :i)"),
-            {"r": new_request.Id, "i": info_id}
-        )
-    for fmt in parse_list(FormatIds):
-        db.execute(
-            text("INSERT INTO [Requests].[Request_Format] (RequestId, FormatId) VALUES (:r, :f)"),
-            {"r": new_request.Id, "f": fmt}
-        )
-    db.commit()
-
-    # ---------------- 7) Prepare Emails ----------------
-    category = db.query(Category).filter(Category.Id == CategoryId).first()
-    category_name = category.Name if category else "Unknown Category"
+    # ---------------- 5) Prepare Emails ----------------
+    category_name = request_lookups.category_names.get(CategoryId, "Unknown Category")
 
     admin_body = f"""
     <div style='font-family:Arial,sans-serif;color:#1f2937;max-width:620px;margin:auto;'>
         <h2 style='color:#2563eb;'>New Request Received</h2>
         <p>A new request has been submitted.</p>
         <div style='background:#f3f4f6;padding:16px;border-radius:8px;'>
-            <p><strong>User:</strong> {user.FirstName} ({user.Email})</p>
+            <p><strong>User:</strong> {user_name} ({user_email})</p>
             <p><strong>Category:</strong> {category_name}</p>
             <p><strong>Request Number:</strong> {request_number}</p>
             <p><strong>Subject:</strong> {Subject or 'N/A'}</p>
@@ -164,21 +184,21 @@ def create_request(
     user_body = f"""
     <div style='font-family:Arial,sans-serif;color:#1f2937;max-width:520px;margin:auto;'>
         <h2 style='color:#2563eb;'>Your request has been received</h2>
-        <p>Hello {user.FirstName}, we received your request and our team will contact you soon.</p>
+        <p>Hello {user_name}, we received your request and our team will contact you soon.</p>
         <div style='background:#f3f4f6;padding:16px;border-radius:8px;'>
             <p><strong>Request Number:</strong> {request_number}</p>
             <p><strong>Category:</strong> {category_name}</p>
         </div>
     </div>
     """
-    background_tasks.add_task(send_email, f"NGD - Request {request_number} received", user_body, user.Email)
+    background_tasks.add_task(send_email, f"NGD - Request {request_number} received", user_body, user_email)
 
-    # ---------------- 8) Response ----------------
+    # ---------------- 6) Response ----------------
     return success_response(
         "Request created successfully",
         "تم إنشاء الطلب بنجاح",
         {
-            "request_id": new_request.Id,
+            "request_id": request_id,
             "request_number": request_number,
             "AttachPath": attach_rel
         }
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Body
-from sqlalchemy import func , or_
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Body, Query, BackgroundTasks
+from fastapi.responses import StreamingResponse, FileResponse, Response
+from sqlalchemy import func , or_, insert
 from datetime import datetime
 from typing import Optional, List
 from app.models.users import User
@@ -11,6 +12,15 @@ from sqlalchemy.orm import Session, joinedload
 from app.database import get_db
 from app.utils.utils import clean_text , _resolve_identity  
 from app.utils.utils import get_current_user ,require_admin
+from app.utils.timeline_store import timeline_store
+from app.utils.vote_ingest import vote_ingestor, VoteHit
+from app.utils.vote_counters import vote_counters, summarize as summarize_votes
+from app.utils.survey_cache import survey_catalogue, survey_stats, survey_questionnaire
+from app.utils.export import iter_export, export_media
+from app.utils.survey_report import (
+    iter_respondent_answers, answer_text, report_columns, report_row, iter_report_rows, report_filename,
+    create_job, run_job, get_job, job_file,
+)
 
 
 
@@ -43,17 +53,18 @@ def _resolve_identity(request: Request, token_payload: dict):
 
 
 @router.post("/vote")
-def submit_vote(
+async def submit_vote(
     Answer: str = Body(..., embed=True),
     SubAnswer: str = Body(None, embed=True),
     request: Request = None,
-    db: Session = Depends(get_db),
     token_payload: dict = Depends(JWTBearer(auto_error=False))
 ):
     """
     Submit a user or visitor vote.
     - Prevents duplicate voting.
     - Stores "No" votes with optional SubAnswer.
+    - Acknowledged once durable in the local WAL; the row is inserted with
+      the next batch (utils/vote_ingest.py), so `Id` is not returned.
     """
     user_id, visitor_id = _resolve_identity(request, token_payload)
 
@@ -83,49 +94,31 @@ def submit_vote(
     #         "CreatedAt": existing_vote.CreatedAt,
     #     })
 
-    # ✅ Create new vote
-    vote = Vote(
-        UserId=user_id if user_id else None,
-        VisitorId=visitor_id if visitor_id else None,
-        Answer=Answer,
-        SubAnswer=SubAnswer if Answer == "No" else None,
-        CreatedAt=datetime.utcnow()
-    )
+    try:
+        visitor_id = int(visitor_id) if visitor_id else None
+    except ValueError:
+        visitor_id = None
 
-    db.add(vote)
-    db.commit()
-    db.refresh(vote)
+    # ✅ Queue new vote
+    data = await vote_ingestor.submit(VoteHit(
+        user_id=user_id if user_id else None,
+        visitor_id=visitor_id,
+        answer=Answer,
+        sub_answer=SubAnswer if Answer == "No" else None,
+        created_at=datetime.utcnow(),
+    ))
 
-    return success_response("Vote submitted successfully.","تم التصويت بنجاح", data={
-        "AlreadyVoted": False,
-        "Id": vote.Id,
-        "Answer": vote.Answer,
-        "SubAnswer": vote.SubAnswer,
-        "UserId": vote.UserId,
-        "VisitorId": vote.VisitorId,
-        "CreatedAt": vote.CreatedAt,
-    })
+    return success_response("Vote submitted successfully.","تم التصويت بنجاح", data=data)
 
 
 # -------------------------------
 # 2) Get All Statistics for Vote Question on Home Page 
 # -------------------------------
 @router.get("/vote/stats")
-def get_vote_stats(db: Session = Depends(get_db)):
-    total = db.query(func.count(Vote.Id)).scalar() or 0
-    yes_count = db.query(func.count(Vote.Id)).filter(Vote.Answer == "Yes").scalar() or 0
-    no_count = db.query(func.count(Vote.Id)).filter(Vote.Answer == "No").scalar() or 0
-
-    percentage_yes = round((yes_count / total) * 100, 2) if total > 0 else 0
-    percentage_no = round((no_count / total) * 100, 2) if total > 0 else 0
-
-    return success_response("Vote statistics", data={
-        "total_votes": total,
-        "yes_votes": yes_count,
-        "no_votes": no_count,
-        "yes_percentage": percentage_yes,
-        "no_percentage": percentage_no
-    })
+def get_vote_stats():
+    # In-memory (or shared Redis) counters, see utils/vote_counters.py
+    vote_counters.ensure_loaded()
+    return success_response("Vote statistics", data=summarize_votes(vote_counters.snapshot()))
 
 
 
@@ -136,8 +129,8 @@ def get_vote_stats(db: Session = Depends(get_db)):
 # -------------------------------
 # 3) GET all survey questions - Grouped by Category
 # -------------------------------
-@router.get("/questions")
-def get_questions(db: Session = Depends(get_db)):
+def _build_questionnaire(db: Session) -> dict:
+    """The full /questions response (built once per catalogue version, so cleaning here is free per request)."""
     questions = (
         db.query(UsersFeedbackQuestion)
         .filter(or_(UsersFeedbackQuestion.IsDeleted == False, UsersFeedbackQuestion.IsDeleted == None))
@@ -146,6 +139,7 @@ def get_questions(db: Session = Depends(get_db)):
             joinedload(UsersFeedbackQuestion.type),
             joinedload(UsersFeedbackQuestion.choices),
         )
+        .order_by(UsersFeedbackQuestion.Id)
         .all()
     )
 
@@ -180,7 +174,7 @@ def get_questions(db: Session = Depends(get_db)):
                 "Choice_en": clean_text(c.Choice),
                 "Choice_ar": clean_text(c.Choice_Ar),
             }
-            for c in (q.choices or []) if c.IsDeleted in [False, None]
+            for c in sorted(q.choices or [], key=lambda c: c.Id) if c.IsDeleted in [False, None]
         ]
 
         if choices:
@@ -191,6 +185,16 @@ def get_questions(db: Session = Depends(get_db)):
     return success_response("Survey questions grouped by category", data={"categories": list(categories_dict.values())})
 
 
+@router.get("/questions")
+def get_questions(request: Request, db: Session = Depends(get_db)):
+    # Compiled once per catalogue version; the session only connects when it's rebuilt
+    body, etag = survey_questionnaire.get(lambda: _build_questionnaire(db))
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 
 
 # -------------------------------
@@ -212,7 +216,10 @@ def submit_bulk_answers(
     if not payload.answers:
         raise HTTPException(status_code=400, detail="No answers provided.")
 
-    db_answers = []
+    # Questions/choices come from the in-memory catalogue (utils/survey_cache.py)
+    survey_catalogue.ensure_loaded(db)
+    now = datetime.utcnow()
+    rows = []
 
     for item in payload.answers:
         # Validate: either ChoiceId or TextAnswer must be provided
@@ -223,11 +230,7 @@ def submit_bulk_answers(
             )
 
         # Validate QuestionId exists
-        question_exists = db.query(UsersFeedbackQuestion).filter(
-            UsersFeedbackQuestion.Id == item.QuestionId,
-            UsersFeedbackQuestion.IsDeleted == False
-        ).first()
-        if not question_exists:
+        if not survey_catalogue.has_question(item.QuestionId):
             raise HTTPException(status_code=400, detail=f"Invalid QuestionId: {item.QuestionId}")
 
         # Normalize ChoiceId into a list
@@ -235,62 +238,46 @@ def submit_bulk_answers(
 
         # Validate all choices exist for this question
         if choices:
-            valid_choices = db.query(QuestionChoice.Id).filter(
-                QuestionChoice.QuestionId == item.QuestionId,
-                QuestionChoice.Id.in_(choices)
-            ).all()
-            valid_choice_ids = {c.Id for c in valid_choices}
-            invalid = set(choices) - valid_choice_ids
+            invalid = set(choices) - survey_catalogue.choice_ids(item.QuestionId)
             if invalid:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Invalid ChoiceId(s) {list(invalid)} for QuestionId {item.QuestionId}"
                 )
 
-        # Insert one record per choice
-        for choice_id in choices:
-            answer = UsersFeedbackAnswer(
-                VisitorId=visitor_id,
-                QuestionId=item.QuestionId,
-                ChoiceId=choice_id,
-                please_specify=item.TextAnswer if item.TextAnswer else None,
-                CreatedAt=datetime.utcnow(),
-                CreatedByUserID=user_id if user_id else None,
-            )
-            db_answers.append(answer)
-
-        # If no ChoiceId but there is TextAnswer → insert text-only record
-        if not choices and item.TextAnswer:
-            answer = UsersFeedbackAnswer(
-                VisitorId=visitor_id,
-                QuestionId=item.QuestionId,
-                ChoiceId=None,
-                please_specify=item.TextAnswer,
-                CreatedAt=datetime.utcnow(),
-                CreatedByUserID=user_id if user_id else None,
-            )
-            db_answers.append(answer)
+        # One record per choice, or a text-only record
+        for choice_id in choices or ([None] if item.TextAnswer else []):
+            rows.append({
+                "VisitorId": visitor_id,
+                "QuestionId": item.QuestionId,
+                "ChoiceId": choice_id,
+                "please_specify": item.TextAnswer if item.TextAnswer else None,
+                "CreatedAt": now,
+                "CreatedByUserID": user_id if user_id else None,
+            })
 
-    # Save to DB
-    db.add_all(db_answers)
+    # Save to DB: one multi-row INSERT ... OUTPUT inserted.Id, ids in row order
+    result = db.execute(
+        insert(UsersFeedbackAnswer).returning(UsersFeedbackAnswer.Id, sort_by_parameter_order=True),
+        rows,
+    )
+    answer_ids = result.scalars().all()
     db.commit()
-
-    # Refresh IDs
-    for answer in db_answers:
-        db.refresh(answer)
+    timeline_store.record("survey_answers", by=len(rows))
+    survey_stats.bump()
 
     return success_response(
         "Bulk answers submitted",data=
         [
             {
-                "Id": a.Id,
-                "QuestionId": a.QuestionId,
-                "ChoiceId": a.ChoiceId,
-                "TextAnswer": a.please_specify,
-                "VisitorId": a.VisitorId,
-                "UserId": a.CreatedByUserID,
+                "Id": answer_id,
+                "QuestionId": row["QuestionId"],
+                "ChoiceId": row["ChoiceId"],
+                "TextAnswer": row["please_specify"],
+                "VisitorId": row["VisitorId"],
+                "UserId": row["CreatedByUserID"],
             }
-            for a in db_answers
+            for answer_id, row in zip(answer_ids, rows)
         ]
     )
 
@@ -301,117 +288,116 @@ def submit_bulk_answers(
 #                               ADMIN SURVEY ENDPOINTS
 # ========================================================================================
 
-@router.get("/admin/stats")
-def get_survey_statistics(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Admin: summary of full survey statistics"""
-    require_admin(current_user)
+def _build_survey_statistics(db: Session) -> dict:
+    """Two queries whatever the number of questions; labels come from the cached catalogue."""
+    survey_catalogue.ensure_loaded(db)
 
-    # Total answers submitted
-    total_answers = db.query(func.count(UsersFeedbackAnswer.Id)).scalar() or 0
+    # Answers per (question, choice)
+    per_choice = {}
+    per_question = {}
+    for question_id, choice_id, count in (
+        db.query(UsersFeedbackAnswer.QuestionId, UsersFeedbackAnswer.ChoiceId, func.count(UsersFeedbackAnswer.Id))
+        .group_by(UsersFeedbackAnswer.QuestionId, UsersFeedbackAnswer.ChoiceId)
+        .all()
+    ):
+        per_question[question_id] = per_question.get(question_id, 0) + count
+        if choice_id is not None:
+            per_choice[choice_id] = per_choice.get(choice_id, 0) + count
 
     # Distinct respondents
-    distinct_users = (
-        db.query(UsersFeedbackAnswer.CreatedByUserID)
-        .filter(UsersFeedbackAnswer.CreatedByUserID.isnot(None))
-        .distinct()
-        .count()
-    )
-
-    distinct_visitors = (
-        db.query(UsersFeedbackAnswer.VisitorId)
-        .filter(UsersFeedbackAnswer.VisitorId.isnot(None))
-        .distinct()
-        .count()
-    )
+    distinct_users, distinct_visitors = db.query(
+        func.count(func.distinct(UsersFeedbackAnswer.CreatedByUserID)),
+        func.count(func.distinct(UsersFeedbackAnswer.VisitorId)),
+    ).one()
 
-    total_respondents = distinct_users + distinct_visitors
-
-    # Question-level statistics
+    # Question-level statistics (choices with the same text are merged)
     question_stats = []
-    questions = db.query(UsersFeedbackQuestion).all()
-
-    for q in questions:
-        answer_count = (
-            db.query(func.count(UsersFeedbackAnswer.Id))
-            .filter(UsersFeedbackAnswer.QuestionId == q.Id)
-            .scalar()
-        )
-
-        # Count choices per question
-        choice_counts = (
-            db.query(
-                QuestionChoice.Choice,
-                func.count(UsersFeedbackAnswer.Id).label("count")
-            )
-            .join(
-                UsersFeedbackAnswer,
-                UsersFeedbackAnswer.ChoiceId == QuestionChoice.Id,
-                isouter=True
-            )
-            .filter(QuestionChoice.QuestionId == q.Id)
-            .group_by(QuestionChoice.Choice)
-            .all()
-        )
+    for q in survey_catalogue.questions:
+        choice_counts = {}
+        for c in survey_catalogue.choices_by_question.get(q.Id, []):
+            choice_counts[c.Choice] = choice_counts.get(c.Choice, 0) + per_choice.get(c.Id, 0)
 
         question_stats.append({
             "QuestionId": q.Id,
             "Question_en": q.MainQuestion,
             "Question_ar": q.MainQuestion_Ar,
-            "TotalAnswers": answer_count,
-            "Choices": [{"choice": c[0], "count": c[1]} for c in choice_counts]
+            "TotalAnswers": per_question.get(q.Id, 0),
+            "Choices": [{"choice": choice, "count": count} for choice, count in choice_counts.items()]
         })
 
-    return success_response("Survey statistics loaded successfully", data={
-        "total_answers": total_answers,
-        "total_respondents": total_respondents,
+    return {
+        "total_answers": sum(per_question.values()),
+        "total_respondents": distinct_users + distinct_visitors,
         "users_count": distinct_users,
         "visitors_count": distinct_visitors,
         "questions": question_stats
-    })
+    }
+
+
+@router.get("/admin/stats")
+def get_survey_statistics(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Admin: summary of full survey statistics"""
+    require_admin(current_user)
+
+    # Cached until answers are submitted or questions/choices change (utils/survey_cache.py)
+    data = survey_stats.get(lambda: _build_survey_statistics(db))
+    return success_response("Survey statistics loaded successfully", data=data)
 
 
 
+def _respondent_ids(db: Session, email: Optional[str], page: int, limit: Optional[int]):
+    """
+    (UserIDs of one page of respondents, total respondents), ordered by UserID.
+    Without a limit every respondent is returned and no ids are needed.
+    """
+    if limit is None:
+        return None, None
+    query = (
+        db.query(User.UserID)
+        .join(UsersFeedbackAnswer, UsersFeedbackAnswer.CreatedByUserID == User.UserID)
+        .distinct()
+    )
+    if email:
+        query = query.filter(User.Email == email)
+    total = query.count()
+    ids = [row[0] for row in query.order_by(User.UserID).offset((page - 1) * limit).limit(limit)]
+    return ids, total
+
+
+def _paged(rows: list, page: int, limit: Optional[int], total: Optional[int], key: str):
+    """The plain list without a limit (unchanged response), a page envelope with one."""
+    if limit is None:
+        return rows
+    return {"page": page, "limit": limit, "count": len(rows), "total": total, key: rows}
+
+
 # ----------------------------
 #  ADMIN – GET ALL USER RESPONSES (ONE ROW PER USER, NO VISITORS)
 # ----------------------------
 @router.get("/admin/responses")
 def get_all_user_responses(
+    email: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Respondents per page (all when omitted)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     require_admin(current_user)
 
-    # Get DISTINCT real users only
-    user_ids = (
-        db.query(UsersFeedbackAnswer.CreatedByUserID)
-        .filter(UsersFeedbackAnswer.CreatedByUserID.isnot(None))
-        .distinct()
-        .all()
-    )
-    user_ids = [u[0] for u in user_ids]
+    user_ids, total = _respondent_ids(db, email, page, limit)
 
     rows = []
-
-    for uid in user_ids:
-        user = db.query(User).filter(User.UserID == uid).first()
-        if not user:
-            continue
-
-        answers = (
-            db.query(UsersFeedbackAnswer)
-            .join(UsersFeedbackQuestion, UsersFeedbackAnswer.QuestionId == UsersFeedbackQuestion.Id)
-            .filter(UsersFeedbackAnswer.CreatedByUserID == uid)
-            .all()
-        )
-
+    for user, answers in iter_respondent_answers(db, email, user_ids):
         structured = {}
         for a in answers:
-            text_val = a.please_specify or (a.choice.Choice if a.choice else None)
+            if a.QuestionRowId is None:
+                continue
+            text_val = answer_text(a)
             if text_val:
-                structured[a.question.MainQuestion] = text_val
+                structured[a.MainQuestion] = text_val
 
         rows.append({
             "user_email": user.Email,
@@ -419,7 +405,7 @@ def get_all_user_responses(
             "answers": structured
         })
 
-    return success_response("Responses loaded successfully",data= rows)
+    return success_response("Responses loaded successfully",data= _paged(rows, page, limit, total, "responses"))
 
 
 # ----------------------------
@@ -428,36 +414,25 @@ def get_all_user_responses(
 @router.get("/admin/response-details")
 def get_response_details(
     email: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Respondents per page (all when omitted)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     require_admin(current_user)
 
-    query = db.query(User).join(UsersFeedbackAnswer, UsersFeedbackAnswer.CreatedByUserID == User.UserID).distinct()
-
-    if email:
-        query = query.filter(User.Email == email)
-
-    users = query.all()
+    user_ids, total = _respondent_ids(db, email, page, limit)
 
     output = []
-
-    for user in users:
-        answers = (
-            db.query(UsersFeedbackAnswer)
-            .join(UsersFeedbackQuestion, UsersFeedbackAnswer.QuestionId == UsersFeedbackQuestion.Id)
-            .filter(UsersFeedbackAnswer.CreatedByUserID == user.UserID)
-            .all()
-        )
-
+    for user, answers in iter_respondent_answers(db, email, user_ids):
         detailed = []
         for a in answers:
-            text_val = a.please_specify or (a.choice.Choice if a.choice else None)
-            if not text_val:
+            text_val = answer_text(a)
+            if a.QuestionRowId is None or not text_val:
                 continue
 
             detailed.append({
-                "question": a.question.MainQuestion,
+                "question": a.MainQuestion,
                 "answer": text_val,
                 "created_at": a.CreatedAt
             })
@@ -468,63 +443,105 @@ def get_response_details(
             "answers": detailed
         })
 
-    return success_response("User response details loaded",data= output)
+    return success_response("User response details loaded",data= _paged(output, page, limit, total, "responses"))
 
 
 # ----------------------------
 # 3) ADMIN – SURVEY REPORT (EXCEL STRUCTURE FORMAT)
 # ----------------------------
+EXPORT_FORMAT_PATTERN = "^(json|csv|xlsx)$"
+EXPORT_FILE_FORMAT_PATTERN = "^(csv|xlsx)$"
+
+
 @router.get("/admin/export")
 def export_survey_report(
+    file_format: str = Query("json", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    compress: bool = Query(False, description="Gzip CSV output"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Admin: export full survey dataset (users only)"""
+    """
+    Admin: export full survey dataset (users only).
+    `format=json` returns the rows in the usual envelope; `csv`/`xlsx` stream
+    a file attachment written row by row.
+    """
     require_admin(current_user)
 
-    # Get all users who have submitted survey answers
-    users = (
-        db.query(User)
-        .join(UsersFeedbackAnswer, UsersFeedbackAnswer.CreatedByUserID == User.UserID)
-        .distinct()
-        .all()
-    )
+    # All questions in order (from the cached catalogue)
+    survey_catalogue.ensure_loaded(db)
+    questions = survey_catalogue.questions
 
-    # Get all questions in order
-    questions = db.query(UsersFeedbackQuestion).order_by(UsersFeedbackQuestion.Id.asc()).all()
+    if file_format != "json":
+        media_type, extension = export_media(file_format, compress)
+        return StreamingResponse(
+            iter_export(file_format, report_columns(questions), iter_report_rows(questions), compress=compress),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{report_filename(extension)}"'},
+        )
 
     report_rows = []
 
-    for user in users:
+    for user, answers in iter_respondent_answers(db):
+        answer_time, user_email, user_name, *values = report_row(user, answers, questions)
         row = {
-            "Answer time": None,
+            "Answer time": answer_time,
             # "Language": getattr(user, "Language", None),
-            "User Email": user.Email,
-            "User Name": f"{user.FirstName} {user.LastName}" if hasattr(user, "LastName") else user.FirstName,
+            "User Email": user_email,
+            "User Name": user_name,
         }
+        for q, value in zip(questions, values):
+            row[q.MainQuestion] = value
 
-        # Get all answers for this user
-        answers = (
-            db.query(UsersFeedbackAnswer)
-            .filter(UsersFeedbackAnswer.CreatedByUserID == user.UserID)
-            .all()
-        )
+        report_rows.append(row)
 
-        # Map answers by question id
-        answer_map = {a.QuestionId: a for a in answers if a.please_specify or a.ChoiceId}
+    return success_response("Export generated", "تم التصدير بنجاح",data=report_rows)
 
-        for q in questions:
-            if q.Id in answer_map:
-                a = answer_map[q.Id]
-                if row["Answer time"] is None:
-                    row["Answer time"] = a.CreatedAt
-                row[q.MainQuestion] = a.please_specify or (a.choice.Choice if a.choice else None)
-            else:
-                row[q.MainQuestion] = None
 
-        report_rows.append(row)
+# ----------------------------
+# 4) ADMIN – SURVEY REPORT AS A BACKGROUND JOB (VERY LARGE EXPORTS)
+# ----------------------------
+def _job_view(job: dict) -> dict:
+    return {k: job[k] for k in ("job_id", "status", "format", "filename", "rows", "error")}
 
-    return success_response("Export generated", "تم التصدير بنجاح",data=report_rows)
+
+@router.post("/admin/export/jobs")
+def start_survey_export_job(
+    background_tasks: BackgroundTasks,
+    file_format: str = Query("xlsx", alias="format", pattern=EXPORT_FILE_FORMAT_PATTERN),
+    compress: bool = Query(False, description="Gzip CSV output"),
+    current_user: User = Depends(get_current_user)
+):
+    """Admin: write the report file in the background; poll the job, then download it."""
+    require_admin(current_user)
+
+    job = create_job(file_format, compress)
+    background_tasks.add_task(run_job, job)
+    return success_response("Export started", "بدأ التصدير", data=_job_view(job))
+
+
+@router.get("/admin/export/jobs/{job_id}")
+def get_survey_export_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    require_admin(current_user)
+
+    job = get_job(job_id)
+    if not job:
+        return error_response("Export job not found", "مهمة التصدير غير موجودة", error_code="NOT_FOUND")
+    return success_response("Export job status", data=_job_view(job))
 
 
+@router.get("/admin/export/jobs/{job_id}/download")
+def download_survey_export_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    require_admin(current_user)
 
+    job = get_job(job_id)
+    if not job:
+        return error_response("Export job not found", "مهمة التصدير غير موجودة", error_code="NOT_FOUND")
+    if job["status"] != "done":
+        return error_response("Export is not ready", "التصدير غير جاهز بعد", error_code="EXPORT_NOT_READY")
+    return FileResponse(job_file(job), media_type=job["media_type"], filename=job["filename"])
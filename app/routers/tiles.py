@@ -0,0 +1,38 @@
+# routers/tiles.py
+from fastapi import APIRouter, Depends, HTTPException, Path, Request
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.utils.tile_layers import LAYERS, MAX_TILE_ZOOM, render_tile
+
+router = APIRouter(prefix="/tiles", tags=["Map Tiles"])
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+
+# ---------------------------------------------------------
+# Mapbox Vector Tiles for the admin map
+# - visitors: clustered visitor points (property `count`)
+# - metadata: dataset coverage polygons from MetadataInfo bounds
+# ---------------------------------------------------------
+@router.get("/{layer}/{z}/{x}/{y}.mvt")
+def get_tile(
+    request: Request,
+    layer: str,
+    z: int = Path(..., ge=0, le=MAX_TILE_ZOOM),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    db: Session = Depends(get_db),
+):
+    if layer not in LAYERS:
+        raise HTTPException(status_code=404, detail=f"Unknown layer '{layer}'")
+    if x >= (1 << z) or y >= (1 << z):
+        raise HTTPException(status_code=400, detail="Tile coordinates out of range")
+
+    tile, version = render_tile(db, layer, z, x, y)
+    etag = f'"{layer}-{version}-{z}-{x}-{y}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=tile, media_type=MVT_MEDIA_TYPE, headers=headers)
@@ -27,6 +27,8 @@ from app.utils.utils import get_current_user, extract_email_domain
 from app.auth.tokens import create_verification_token
 from app.utils.email import send_email, send_domain_refused_email
 from app.utils.paths import static_path
+from app.utils.home_counters import home_counters, TOTAL_USERS
+from app.utils.timeline_store import timeline_store
 from app.models.dashboard import DownloadRequest, DownloadItem, BibliographyDownloadRequest
 
 load_dotenv()
@@ -310,6 +312,8 @@ def admin_create_user(
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    home_counters.increment(TOTAL_USERS)
+    timeline_store.record("users", new_user.CreatedAt)
 
     token = create_verification_token(user.Email, expires_minutes=None)
     base_frontend = FRONTEND_BASE_URL or str(request.base_url).rstrip("/")
@@ -1,85 +1,89 @@
 # routers/visitors.py
 from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 import uuid
-from app.database import get_db
-from app.models.visitors import Visitor
+from app.models.users import User
 from app.schemas.visitors import VisitorCreate
+from app.utils.utils import require_admin
 from app.utils.response import success_response, error_response
+from app.utils.geoip import geoip, client_ip
+from app.utils.visit_filter import visit_filter
+from app.utils.visitor_ingest import visit_ingestor, session_cache, VisitHit
+from app.utils.visitor_sketches import visitor_sketches, unique_key
 
 router = APIRouter(prefix="/track", tags=["Visitors"])
 
 # --- 1️⃣ Endpoint to get visitor IP ---
 @router.get("/ip")
 def get_client_ip(request: Request):
-    ip_address = request.headers.get("x-forwarded-for")
-    if ip_address:
-        ip_address = ip_address.split(",")[0]  # first IP if multiple
-    else:
-        ip_address = request.client.host
+    ip_address = client_ip(request)
 
-    return success_response("Visitor IP retrieved successfully", data= {"IPAddress": ip_address})
+    return success_response("Visitor IP retrieved successfully", data= {
+        "IPAddress": ip_address,
+        "CountryID": geoip.lookup(ip_address),
+    })
 
 
 # --- 2️⃣ Endpoint to track visitor ---
 @router.post("/auto")
-async def auto_track(visitor: VisitorCreate, request: Request, db: Session = Depends(get_db)):
+async def auto_track(visitor: VisitorCreate, request: Request):
     """
     Tracks a visitor based on session ID, IP, and country ID.
     Frontend provides:
         - SessionID (optional)
-        - IPAddress
-        - CountryID (from COUNTRIES_LIST)
+        - IPAddress (optional, the request IP is used when available)
+        - CountryID (optional, resolved from the IP when the GeoIP table knows it)
         - X, Y coordinates (optional)
+    Bots and repeat hits are dropped first (utils/visit_filter.py); the rest
+    are written in batches (utils/visitor_ingest.py).
     """
     now = datetime.utcnow()
-    session_id = visitor.SessionID or str(uuid.uuid4())
+    ip_address = client_ip(request) or visitor.IPAddress
 
-    ip_address = visitor.IPAddress or request.client.host
+    # --- Bots, blocked networks and duplicate hits never reach the DB ---
+    if visit_filter.check(request.headers.get("user-agent"), ip_address, visitor.SessionID, now):
+        cached = session_cache.get(visitor.SessionID) if visitor.SessionID else None
+        return success_response("Visitor tracked successfully", data={
+            "VisitorID": cached[0] if cached else None,
+            "IPAddress": ip_address,
+            "SessionID": visitor.SessionID,
+            "CountryID": visitor.CountryID,
+            "VisitAt": now.isoformat()
+        })
 
-    # --- Check if session already exists ---
-    existing_session = db.query(
-        Visitor.VisitorID,
-        Visitor.VisitAt
-    ).filter(
-        Visitor.SessionID == session_id
-    ).order_by(Visitor.VisitAt.desc()).first()
+    session_id = visitor.SessionID or str(uuid.uuid4())
+    country_id = geoip.lookup(ip_address) or visitor.CountryID
 
-    if existing_session:
-        # Update VisitAt timestamp
-        db.execute(
-            text("UPDATE Website.Visitors SET VisitAt = :visit WHERE VisitorID = :vid"),
-            {"visit": now, "vid": existing_session.VisitorID}
-        )
-        db.commit()
-        visitor_id = existing_session.VisitorID
-    else:
-        # Insert new visitor
-        geom_wkt = f"POINT({visitor.X} {visitor.Y})" if visitor.X is not None and visitor.Y is not None else None
-        stmt = text("""
-            INSERT INTO Website.Visitors (IPAddress, CountryID, X, Y, Geom, VisitAt, SessionID)
-            OUTPUT inserted.VisitorID
-            VALUES (:ip, :country, :x, :y, geometry::STGeomFromText(:geom, 4326), :visit, :sess)
-        """)
-        params = {
-            "ip": ip_address,
-            "country": visitor.CountryID,
-            "x": visitor.X,
-            "y": visitor.Y,
-            "geom": geom_wkt or "",
-            "visit": now,
-            "sess": session_id
-        }
-        result = db.execute(stmt, params)
-        visitor_id = result.fetchone()[0]
-        db.commit()
+    # --- Unique visitor sketches (flushed to the DB periodically) ---
+    visitor_sketches.add(now, country_id, unique_key(session_id, ip_address))
+
+    # --- Same session seen moments ago: answer from memory, nothing to write ---
+    visitor_id = session_cache.debounced(session_id, now)
+    if visitor_id is None:
+        try:
+            visitor_id = await visit_ingestor.submit(VisitHit(
+                session_id=session_id,
+                ip_address=ip_address,
+                country_id=country_id,
+                x=visitor.X,
+                y=visitor.Y,
+                visit_at=now,
+            ))
+        except SQLAlchemyError:
+            return error_response("Could not track visitor", "تعذر تسجيل الزائر", "TRACKING_FAILED")
 
     return success_response("Visitor tracked successfully", data={
         "VisitorID": visitor_id,
         "IPAddress": ip_address,
         "SessionID": session_id,
-        "CountryID": visitor.CountryID,
+        "CountryID": country_id,
         "VisitAt": now.isoformat()
     })
+
+
+# --- 3️⃣ Tracking filter counters (admin) ---
+@router.get("/filter-stats")
+def tracking_filter_stats(admin: User = Depends(require_admin)):
+    """Hits dropped per reason (and accepted) by this worker since it started."""
+    return success_response("Tracking filter statistics", data=visit_filter.stats())
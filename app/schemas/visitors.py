@@ -1,11 +1,22 @@
-from pydantic import BaseModel
+import ipaddress
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 
 class VisitorCreate(BaseModel):
     Location: Optional[str] = None
     X: Optional[float] = None
     Y: Optional[float] = None
-    SessionID: Optional[str] = None
+    # Column sizes of Website.Visitors: an oversized value would fail the whole tracking batch
+    SessionID: Optional[str] = Field(None, max_length=100)
     CountryID: Optional[int] = None
-    IPAddress: Optional[str] = None
-    
\ No newline at end of file
+    IPAddress: Optional[str] = Field(None, max_length=50)
+
+    @field_validator("IPAddress")
+    @classmethod
+    def _valid_ip(cls, value: Optional[str]) -> Optional[str]:
+        if not value:
+            return None
+        try:
+            return str(ipaddress.ip_address(value.strip()))
+        except ValueError:
+            raise ValueError("IPAddress is not a valid IP address")
@@ -0,0 +1,77 @@
+# utils/background.py
+"""
+Periodic in-process jobs (cache reconciliation, snapshots, ...).
+
+Modules register a job with `register_periodic_task`; main.py starts every
+registered job on startup and cancels them on shutdown. Jobs are plain sync
+callables and run in a worker thread so they never block the event loop.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PeriodicTask:
+    name: str
+    interval: float
+    func: Callable[[], None]
+    run_on_start: bool = True
+    # Seconds to wait before the first run, evaluated at start (overrides run_on_start)
+    initial_delay: Optional[Callable[[], float]] = None
+    _task: Optional[asyncio.Task] = None
+
+    async def _loop(self):
+        if self.initial_delay is not None:
+            await asyncio.sleep(max(self.initial_delay(), 0))
+        elif not self.run_on_start:
+            await asyncio.sleep(self.interval)
+        while True:
+            try:
+                await run_in_threadpool(self.func)
+            except Exception:
+                logger.exception("Periodic task %s failed", self.name)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop(), name=self.name)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_tasks: List[PeriodicTask] = []
+
+
+def register_periodic_task(
+    name: str,
+    interval: float,
+    func: Callable[[], None],
+    run_on_start: bool = True,
+    initial_delay: Optional[Callable[[], float]] = None,
+) -> PeriodicTask:
+    task = PeriodicTask(name=name, interval=interval, func=func, run_on_start=run_on_start, initial_delay=initial_delay)
+    _tasks.append(task)
+    return task
+
+
+def start_periodic_tasks():
+    for task in _tasks:
+        task.start()
+
+
+async def stop_periodic_tasks():
+    for task in _tasks:
+        await task.stop()
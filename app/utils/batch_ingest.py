@@ -0,0 +1,208 @@
+# utils/batch_ingest.py
+"""
+Group commit for the high-volume write endpoints (tracking, votes).
+
+Requests `submit()` an item and await a future. A background flusher takes
+whatever is queued every `flush_ms` (or once `batch_size` items wait) and:
+
+1. writes the batch to the local WAL as one fsynced segment (utils/wal.py),
+2. resolves the items whose response doesn't need the DB (`early_result`),
+3. applies the batch in one transaction on a worker thread,
+4. deletes the segment and resolves the remaining items.
+
+Calls to `apply` are serialized (flush and the replay job never write at the
+same time), and `apply` must be idempotent: a crash between its commit and
+deleting the segment applies the same items again on replay.
+
+If the batch is rejected (a bad row, not a lost connection), its items are
+applied one at a time so a single bad row can't sink the rest; only the
+rows that still fail stay in the WAL.
+
+Segments left behind by a failed apply or a crashed worker are replayed by a
+periodic job, so an acknowledged item is never lost. While the DB is down
+replay just waits; only records the DB rejects count as failed attempts, and
+those end up in the WAL's failed/ directory after WAL_MAX_ATTEMPTS.
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.background import register_periodic_task
+from app.utils.wal import RetryLater, SegmentLog
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# WAL Configuration
+# -------------------------
+WAL_ENABLED = os.getenv("WAL_ENABLED", "true").lower() in ("1", "true", "yes")
+WAL_REPLAY_SECONDS = int(os.getenv("WAL_REPLAY_SECONDS", 60))
+# Failed applies of a record before it is moved to the WAL's failed/ directory
+WAL_MAX_ATTEMPTS = int(os.getenv("WAL_MAX_ATTEMPTS", 5))
+
+T = TypeVar("T")
+
+
+def _is_transient(exc: Exception) -> bool:
+    """DB unreachable or connection dropped: retrying row by row would not help."""
+    if isinstance(exc, (OperationalError, InterfaceError)):
+        return True
+    return isinstance(exc, DBAPIError) and exc.connection_invalidated
+
+
+class BatchIngestor(Generic[T]):
+    def __init__(
+        self,
+        name: str,
+        apply: Callable[[Sequence[T]], List[Any]],
+        encode: Callable[[T], dict],
+        decode: Callable[[dict], T],
+        flush_ms: int,
+        batch_size: int,
+        early_result: Optional[Callable[[T], Any]] = None,
+    ):
+        """
+        `apply(items)` writes a batch in one transaction and returns one result per item.
+        `early_result(item)` may return the response value once the item is durable on disk.
+        """
+        self.name = name
+        self.apply = apply
+        self.encode = encode
+        self.decode = decode
+        self.early_result = early_result
+        self.flush_interval = flush_ms / 1000.0
+        self.batch_size = batch_size
+        self.log = SegmentLog(name, max_attempts=WAL_MAX_ATTEMPTS) if WAL_ENABLED else None
+        self._buffer: List[Tuple[T, asyncio.Future]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._apply_lock = threading.Lock()
+        if self.log is not None:
+            register_periodic_task(f"wal:{name}", WAL_REPLAY_SECONDS, self.replay)
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name=f"ingest:{self.name}")
+
+    async def submit(self, item: T) -> Any:
+        """Queue an item and wait for its result (see `early_result` and `apply`)."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append((item, future))
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _apply(self, items: Sequence[T]) -> List[Any]:
+        with self._apply_lock:
+            return self.apply(items)
+
+    def _apply_each(self, items: Sequence[T]) -> Tuple[List[Any], Dict[int, Exception]]:
+        """
+        Apply `items` as one batch, falling back to one item at a time when the batch
+        is rejected. Returns (results, errors by item index); raises if nothing was written.
+        """
+        try:
+            return self._apply(items), {}
+        except Exception as exc:
+            if len(items) == 1 or _is_transient(exc):
+                raise
+            logger.warning("Writing %d %s items as one batch failed (%s), retrying one by one", len(items), self.name, exc)
+
+        results: List[Any] = [None] * len(items)
+        errors: Dict[int, Exception] = {}
+        for i, item in enumerate(items):
+            try:
+                results[i] = self._apply([item])[0]
+            except Exception as exc:
+                if _is_transient(exc):
+                    raise
+                errors[i] = exc
+        if len(errors) == len(items):
+            raise errors[0]
+        for i, exc in errors.items():
+            logger.error("Writing %s item failed: %r (%s)", self.name, items[i], exc)
+        return results, errors
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        items = [item for item, _ in batch]
+
+        segment = None
+        if self.log is not None:
+            try:
+                segment = await run_in_threadpool(self.log.write, [self.encode(item) for item in items])
+            except OSError:
+                logger.exception("Could not write %s WAL segment, applying the batch without it", self.name)
+            else:
+                if self.early_result is not None:
+                    for item, future in batch:
+                        result = self.early_result(item)
+                        if result is not None and not future.done():
+                            future.set_result(result)
+
+        try:
+            results, errors = await run_in_threadpool(self._apply_each, items)
+        except Exception as exc:
+            logger.exception("Writing %d %s items failed", len(items), self.name)
+            if segment is not None:
+                self.log.release(segment)  # replayed later
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        if segment is not None:
+            if errors:
+                # Only the rows that failed stay in the WAL
+                await run_in_threadpool(self.log.retry, segment, [self.encode(items[i]) for i in sorted(errors)])
+            else:
+                await run_in_threadpool(self.log.done, segment)
+        for i, ((_, future), result) in enumerate(zip(batch, results)):
+            if future.done():
+                continue
+            if i in errors:
+                future.set_exception(errors[i])
+            else:
+                future.set_result(result)
+
+    def _replay_records(self, records: List[dict]) -> List[dict]:
+        try:
+            _, errors = self._apply_each([self.decode(record) for record in records])
+        except Exception as exc:
+            if _is_transient(exc):
+                raise RetryLater(str(exc)) from exc
+            raise
+        return [records[i] for i in sorted(errors)]
+
+    def replay(self):
+        """Periodic job: apply WAL segments left by failed batches or dead workers."""
+        self.log.replay(self._replay_records)
+
+    async def close(self):
+        """Stop the flusher and write whatever is still queued (called on shutdown)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
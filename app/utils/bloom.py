@@ -0,0 +1,71 @@
+# utils/bloom.py
+"""
+Bloom filters for bounded-memory "seen recently?" checks.
+
+`BloomFilter` sizes its bit array for an expected number of items and a
+false-positive rate; positions come from one blake2b digest via double
+hashing. `RotatingBloomFilter` keeps one filter per time window and drops
+old windows, so memory stays fixed however long the process runs.
+"""
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _hash_pair(value) -> tuple:
+    if not isinstance(value, bytes):
+        value = str(value).encode("utf-8")
+    digest = hashlib.blake2b(value, digest_size=16).digest()
+    return int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate in (0, 1)")
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self._bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, value):
+        h1, h2 = _hash_pair(value)
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, value) -> bool:
+        return all(self._bits[p >> 3] & (1 << (p & 7)) for p in self._positions(value))
+
+    def add(self, value) -> bool:
+        """Add `value`; returns True if it was (probably) already present."""
+        present = True
+        for p in self._positions(value):
+            byte, bit = p >> 3, 1 << (p & 7)
+            if not self._bits[byte] & bit:
+                present = False
+                self._bits[byte] |= bit
+        return present
+
+
+class RotatingBloomFilter:
+    """One BloomFilter per window id, keeping the `keep` most recent windows."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001, keep: int = 2):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.keep = keep
+        self._windows: "OrderedDict[int, BloomFilter]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, window: int, value) -> bool:
+        """Add `value` to `window`; returns True if it was (probably) already seen in that window."""
+        with self._lock:
+            bloom = self._windows.get(window)
+            if bloom is None:
+                if self._windows and window < next(iter(self._windows)):
+                    return False  # window already rotated out
+                bloom = self._windows[window] = BloomFilter(self.capacity, self.error_rate)
+                while len(self._windows) > self.keep:
+                    self._windows.popitem(last=False)
+            return bloom.add(value)
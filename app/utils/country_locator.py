@@ -0,0 +1,161 @@
+# utils/country_locator.py
+"""
+Point -> country (COUNTRIES_LIST.OBJECTID) lookups from the stored country
+polygons.
+
+Polygons are read once (as WKB), simplified by COUNTRY_SIMPLIFY_TOLERANCE
+degrees, prepared and indexed in a shapely STRtree; `locate_many` resolves a
+whole batch of points with one vectorized bounding-box query on the tree and
+one vectorized `contains` test against the prepared polygons. Used by the
+tracking batch writer and by the backfill for historic visitors without a
+country:
+
+    python -m app.utils.country_locator backfill
+"""
+import logging
+import os
+import sys
+import threading
+from typing import Optional, Sequence
+
+import numpy as np
+import shapely
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Locator Configuration
+# -------------------------
+# Degrees; 0 keeps the stored polygons as they are
+COUNTRY_SIMPLIFY_TOLERANCE = float(os.getenv("COUNTRY_SIMPLIFY_TOLERANCE", 0.01))
+COUNTRY_BACKFILL_BATCH = int(os.getenv("COUNTRY_BACKFILL_BATCH", 5000))
+
+_UPDATE_CHUNK = 1000
+
+
+class CountryLocator:
+    def __init__(self, tolerance: float = COUNTRY_SIMPLIFY_TOLERANCE):
+        self.tolerance = tolerance
+        self._tree: Optional[shapely.STRtree] = None
+        self._geometries: Optional[np.ndarray] = None
+        self._ids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._ids is not None
+
+    def ensure_loaded(self, db: Optional[Session] = None):
+        """Load the polygons once (on their own session unless `db` is given)."""
+        if self._ids is not None:
+            return
+        with self._lock:
+            if self._ids is not None:
+                return
+            session = db or SessionLocal()
+            try:
+                rows = session.execute(text(
+                    "SELECT OBJECTID, Geom.STAsBinary() AS wkb FROM dbo.COUNTRIES_LIST WHERE Geom IS NOT NULL"
+                )).all()
+            except SQLAlchemyError:
+                if db is not None:
+                    raise
+                # Tracking keeps working, just without coordinate lookups, until the next restart
+                logger.exception("Could not load country polygons, coordinates won't be matched to countries")
+                rows = []
+            finally:
+                if db is None:
+                    session.close()
+            ids, geometries = [], []
+            for object_id, wkb in rows:
+                try:
+                    geometry = shapely.make_valid(shapely.from_wkb(bytes(wkb)))
+                except (shapely.errors.GEOSException, TypeError, ValueError):
+                    logger.warning("Skipping unreadable geometry of country %s", object_id)
+                    continue
+                if self.tolerance:
+                    geometry = shapely.simplify(geometry, self.tolerance, preserve_topology=True)
+                if geometry.is_empty:
+                    continue
+                ids.append(object_id)
+                geometries.append(geometry)
+            geometries = np.array(geometries, dtype=object)
+            shapely.prepare(geometries)
+            self._tree = shapely.STRtree(geometries) if len(geometries) else None
+            self._geometries = geometries
+            self._ids = np.array(ids, dtype=np.int64)
+            logger.info("Indexed %d country polygons", len(ids))
+
+    def locate_many(self, xs: Sequence[float], ys: Sequence[float]) -> np.ndarray:
+        """OBJECTID per (x=lon, y=lat) point, 0 where no country contains it."""
+        result = np.zeros(len(xs), dtype=np.int64)
+        if self._tree is None or not len(xs):
+            return result
+        points = shapely.points(np.asarray(xs, dtype=float), np.asarray(ys, dtype=float))
+        # Bounding-box candidates only: the tree's own predicate test doesn't use the prepared polygons
+        point_index, tree_index = self._tree.query(points)
+        inside = shapely.contains(self._geometries[tree_index], points[point_index])
+        point_index, tree_index = point_index[inside], tree_index[inside]
+        # Simplified neighbours can overlap; keep the first
+        first = np.unique(point_index, return_index=True)[1]
+        result[point_index[first]] = self._ids[tree_index[first]]
+        return result
+
+    def locate(self, x: Optional[float], y: Optional[float]) -> Optional[int]:
+        if x is None or y is None:
+            return None
+        return int(self.locate_many([x], [y])[0]) or None
+
+
+country_locator = CountryLocator()
+
+
+def backfill_countries(db: Session, batch_size: int = COUNTRY_BACKFILL_BATCH) -> int:
+    """Set CountryID on visitors that have coordinates but no country. Returns the rows updated."""
+    country_locator.ensure_loaded(db)
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.execute(text("""
+            SELECT TOP (:n) VisitorID, X, Y FROM Website.Visitors
+            WHERE CountryID IS NULL AND X IS NOT NULL AND Y IS NOT NULL AND VisitorID > :last
+            ORDER BY VisitorID
+        """), {"n": batch_size, "last": last_id}).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        found = country_locator.locate_many([r[1] for r in rows], [r[2] for r in rows])
+        matches = [(row[0], int(country_id)) for row, country_id in zip(rows, found) if country_id]
+        for i in range(0, len(matches), _UPDATE_CHUNK):
+            chunk = matches[i:i + _UPDATE_CHUNK]
+            values = ", ".join(f"(:id{j}, :c{j})" for j in range(len(chunk)))
+            params = {}
+            for j, (visitor_id, country_id) in enumerate(chunk):
+                params[f"id{j}"] = visitor_id
+                params[f"c{j}"] = country_id
+            db.execute(text(f"""
+                UPDATE v SET CountryID = x.CountryID
+                FROM Website.Visitors AS v
+                JOIN (VALUES {values}) AS x (VisitorID, CountryID) ON v.VisitorID = x.VisitorID
+            """), params)
+        db.commit()
+        updated += len(matches)
+        logger.info("Backfilled countries up to VisitorID %s (%d rows so far)", last_id, updated)
+    return updated
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        sys.exit("usage: python -m app.utils.country_locator backfill")
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        total = backfill_countries(session)
+    finally:
+        session.close()
+    logger.info("Country backfill done: %d visitors updated", total)
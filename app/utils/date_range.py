@@ -0,0 +1,68 @@
+# utils/date_range.py
+"""
+Shared helpers for month-based dashboard/statistics queries.
+
+Filters are compiled to half-open ranges on the raw date column
+(`col >= start AND col < end`) so SQL Server can seek an index on it, instead
+of wrapping the column in YEAR()/MONTH()/EXTRACT().
+
+Grouping uses a single month-bucket expression, DATEFROMPARTS(YEAR(col), MONTH(col), 1).
+The migration `app/migrations/001_month_bucket_indexes.sql` adds persisted computed
+columns with the exact same expression, so the optimizer matches them (and
+their indexes) automatically.
+"""
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Date, func, literal_column
+
+MONTH_FORMAT = "%Y-%m"
+
+
+def parse_month(value: str) -> datetime:
+    """Parse a `YYYY-MM` string into the first instant of that month (raises ValueError)."""
+    return datetime.strptime(value, MONTH_FORMAT)
+
+
+def next_month(value: datetime) -> datetime:
+    if value.month == 12:
+        return value.replace(year=value.year + 1, month=1, day=1)
+    return value.replace(month=value.month + 1, day=1)
+
+
+def month_bounds(start_date: Optional[str] = None, end_date: Optional[str] = None) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Turn `YYYY-MM` inputs into a half-open `[start, end)` datetime range.
+    `end_date` is inclusive as a month, so the range ends at the start of the following month.
+    """
+    start = parse_month(start_date) if start_date else None
+    end = next_month(parse_month(end_date)) if end_date else None
+    return start, end
+
+
+def date_range_filters(column, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List:
+    """Return sargable range predicates for `column` (empty list when no bounds are given)."""
+    start, end = month_bounds(start_date, end_date)
+    filters = []
+    if start is not None:
+        filters.append(column >= start)
+    if end is not None:
+        filters.append(column < end)
+    return filters
+
+
+def month_bucket(column):
+    """
+    First day of the month of `column`; matches the persisted `*Month` computed columns.
+    The day is rendered inline (not as a bind param) so SELECT and GROUP BY stay identical.
+    """
+    return func.datefromparts(func.year(column), func.month(column), literal_column("1"), type_=Date)
+
+
+def month_key(value) -> Optional[str]:
+    """Format a month bucket value as `YYYY-MM`."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.strftime(MONTH_FORMAT)
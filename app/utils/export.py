@@ -0,0 +1,185 @@
+# utils/export.py
+import csv
+import io
+import os
+import tempfile
+import zlib
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+
+# -------------------------
+# Export Configuration
+# -------------------------
+# Rows pulled from the DB cursor per round trip
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", 2000))
+# Rows per Parquet row group (one row group is the only thing held in memory)
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", 20000))
+EXPORT_PARQUET_COMPRESSION = os.getenv("EXPORT_PARQUET_COMPRESSION", "zstd")
+# Bytes per chunk when streaming a finished file
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Column kinds -> Arrow types
+_ARROW_TYPES = {
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "str": pa.string(),
+    "bool": pa.bool_(),
+    "datetime": pa.timestamp("ms"),
+    "date": pa.date32(),
+}
+
+# (column name, kind)
+ExportColumns = Sequence[Tuple[str, str]]
+
+
+def _batched(rows: Iterable[Sequence], size: int) -> Iterator[List[Sequence]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Leading characters that make spreadsheet apps read a CSV cell as a formula
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value):
+    """Text cells that would be read as formulas get a leading apostrophe."""
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(columns: ExportColumns, rows: Iterable[Sequence], compress: bool = True) -> Iterator[bytes]:
+    """
+    Encode rows as UTF-8 CSV (with BOM so Excel detects Arabic text),
+    optionally gzip-compressed on the fly. Text is escaped against formula
+    injection (`_csv_cell`).
+    """
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(chunk: bytes) -> bytes:
+        return gzip.compress(chunk) if gzip else chunk
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([_csv_cell(name) for name, _ in columns])
+    header = emit(("\ufeff" + buffer.getvalue()).encode("utf-8"))
+    if header:
+        yield header
+
+    for batch in _batched(rows, EXPORT_FETCH_SIZE):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_cell(value) for value in row] for row in batch)
+        chunk = emit(buffer.getvalue().encode("utf-8"))
+        if chunk:
+            yield chunk
+
+    if gzip:
+        yield gzip.flush()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the caller."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_parquet(columns: ExportColumns, rows: Iterable[Sequence]) -> Iterator[bytes]:
+    """
+    Encode rows as a Parquet file, one row group at a time.
+    Each row group is compressed and streamed before the next one is read.
+    """
+    schema = pa.schema([(name, _ARROW_TYPES[kind]) for name, kind in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression=EXPORT_PARQUET_COMPRESSION)
+    try:
+        for batch in _batched(rows, EXPORT_ROW_GROUP_SIZE):
+            arrays = [
+                pa.array([row[i] for row in batch], type=schema.field(i).type)
+                for i in range(len(columns))
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_xlsx(columns: ExportColumns, rows: Iterable[Sequence], sheet_name: str = "Export") -> Iterator[bytes]:
+    """
+    Encode rows as an Excel workbook.
+    xlsxwriter's constant_memory mode flushes every row to a temp file as it is
+    written; the zip is assembled on close into a temp file that is then
+    streamed, so memory stays flat whatever the row count.
+    """
+    with tempfile.TemporaryFile() as out:
+        workbook = xlsxwriter.Workbook(out, {
+            "constant_memory": True,
+            "default_date_format": "yyyy-mm-dd hh:mm:ss",
+            "remove_timezone": True,
+            # Cell text is data, never formulas or links
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        })
+        sheet = workbook.add_worksheet(sheet_name)
+        sheet.write_row(0, 0, [name for name, _ in columns], workbook.add_format({"bold": True}))
+        for row_index, row in enumerate(rows, start=1):
+            sheet.write_row(row_index, 0, row)
+        workbook.close()
+
+        out.seek(0)
+        while True:
+            chunk = out.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def export_media(fmt: str, compress: bool) -> Tuple[str, str]:
+    """Return (media type, file extension) for an export format."""
+    if fmt == "parquet":
+        return "application/vnd.apache.parquet", "parquet"
+    if fmt == "xlsx":
+        return "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"
+    if compress:
+        return "application/gzip", "csv.gz"
+    return "text/csv; charset=utf-8", "csv"
+
+
+def iter_export(fmt: str, columns: ExportColumns, rows: Iterable[Sequence], compress: bool = True) -> Iterator[bytes]:
+    if fmt == "parquet":
+        return iter_parquet(columns, rows)
+    if fmt == "xlsx":
+        return iter_xlsx(columns, rows)
+    return iter_csv(columns, rows, compress=compress)
@@ -0,0 +1,193 @@
+# utils/geoip.py
+"""
+Server-side IP lookups for visitor tracking (country, ASN).
+
+Reads IP range CSVs (DB-IP / IP2Location lite layout, no header needed):
+
+    first_ip,last_ip,value[,...]
+
+where the IPs are either dotted/colon notation or integers and `value` is a
+country code (mapped to `COUNTRIES_LIST.OBJECTID` by `CountryCode` when the
+file is loaded) or an AS number. Ranges are kept in sorted NumPy arrays and
+looked up with `searchsorted`. IPv6 ranges are indexed on their upper 64
+bits (allocations are /64 or coarser).
+
+Files are re-read when their mtime changes (checked every
+GEOIP_RELOAD_SECONDS), so they can be replaced without a restart.
+"""
+import csv
+import ipaddress
+import logging
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+import numpy as np
+from fastapi import Request
+
+from app.database import SessionLocal
+from app.models.lookups import Country
+from app.utils.background import register_periodic_task
+from app.utils.paths import cache_path
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# GeoIP Configuration
+# -------------------------
+GEOIP_DB_PATH = os.getenv("GEOIP_DB_PATH") or cache_path("geoip", "ip_ranges.csv")
+# first_ip,last_ip,asn (optional, used by the tracking bot filter)
+GEOIP_ASN_DB_PATH = os.getenv("GEOIP_ASN_DB_PATH") or cache_path("geoip", "ip_asn.csv")
+GEOIP_RELOAD_SECONDS = int(os.getenv("GEOIP_RELOAD_SECONDS", 300))
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """First address in X-Forwarded-For, else the socket peer (only ever a valid IP, or None)."""
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        # Client-controlled: anything that doesn't parse is ignored
+        try:
+            return str(ipaddress.ip_address(forwarded.split(",")[0].strip()))
+        except ValueError:
+            pass
+    if request.client:
+        try:
+            return str(ipaddress.ip_address(request.client.host))
+        except ValueError:
+            return None
+    return None
+
+
+class _RangeTable:
+    """Sorted, non-overlapping ranges: starts[i] <= ip <= ends[i] -> values[i] (0 = unknown)."""
+
+    def __init__(self, starts, ends, values):
+        order = np.argsort(starts, kind="stable")
+        self.starts = np.asarray(starts, dtype=np.uint64)[order]
+        self.ends = np.asarray(ends, dtype=np.uint64)[order]
+        self.values = np.asarray(values, dtype=np.int64)[order]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def find(self, value: int) -> Optional[int]:
+        i = int(np.searchsorted(self.starts, np.uint64(value), side="right")) - 1
+        if i < 0 or value > int(self.ends[i]):
+            return None
+        return int(self.values[i]) or None
+
+
+class IPRangeTable:
+    def __init__(self, v4: _RangeTable, v6: _RangeTable, mtime: float):
+        self.v4 = v4
+        self.v6 = v6
+        self.mtime = mtime
+
+    def lookup(self, ip: str) -> Optional[int]:
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            return None
+        if address.version == 4:
+            return self.v4.find(int(address))
+        return self.v6.find(int(address) >> 64)
+
+
+def _parse_ip(value: str) -> ipaddress._BaseAddress:
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return ipaddress.IPv4Address(number) if number <= 0xFFFFFFFF else ipaddress.IPv6Address(number)
+    return ipaddress.ip_address(value)
+
+
+def load_table(path: str, parse_value: Callable[[str], int]) -> IPRangeTable:
+    v4 = ([], [], [])
+    v6 = ([], [], [])
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 3:
+                continue
+            try:
+                first, last = _parse_ip(row[0]), _parse_ip(row[1])
+            except ValueError:
+                continue  # header or malformed line
+            value = parse_value(row[2].strip())
+            if first.version == 4:
+                target, start, end = v4, int(first), int(last)
+            else:
+                target, start, end = v6, int(first) >> 64, int(last) >> 64
+            target[0].append(start)
+            target[1].append(end)
+            target[2].append(value)
+    return IPRangeTable(_RangeTable(*v4), _RangeTable(*v6), os.path.getmtime(path))
+
+
+def parse_asn(value: str) -> int:
+    value = value.upper().removeprefix("AS")
+    return int(value) if value.isdigit() else 0
+
+
+def country_code_parser() -> Callable[[str], int]:
+    """CountryCode -> COUNTRIES_LIST.OBJECTID, read from the DB at load time."""
+    db = SessionLocal()
+    try:
+        country_codes: Dict[str, int] = {
+            code.strip().upper(): object_id
+            for object_id, code in db.query(Country.OBJECTID, Country.CountryCode)
+            if code
+        }
+    finally:
+        db.close()
+    return lambda value: country_codes.get(value.upper(), 0)
+
+
+class IPRangeLookup:
+    def __init__(self, path: str, value_parser: Callable[[], Callable[[str], int]]):
+        self.path = path
+        self.value_parser = value_parser
+        self._table: Optional[IPRangeTable] = None
+        self._reload_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._table is not None
+
+    def lookup(self, ip: Optional[str]) -> Optional[int]:
+        """The value for `ip`, or None if unknown (or no table is loaded)."""
+        table = self._table
+        if table is None or not ip:
+            return None
+        return table.lookup(ip)
+
+    def reload_if_changed(self):
+        """Periodic job: (re)load the CSV when it appears or its mtime changes."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if self._table is not None and self._table.mtime == mtime:
+            return
+        with self._reload_lock:
+            table = load_table(self.path, self.value_parser())
+            # Swap in one assignment; lookups in flight keep using the old table
+            self._table = table
+            logger.info("Loaded IP ranges from %s (%d IPv4, %d IPv6)", self.path, len(table.v4), len(table.v6))
+
+
+# COUNTRIES_LIST.OBJECTID per IP
+geoip = IPRangeLookup(GEOIP_DB_PATH, country_code_parser)
+# Autonomous system number per IP
+asn_lookup = IPRangeLookup(GEOIP_ASN_DB_PATH, lambda: parse_asn)
+
+
+def reload_ip_tables():
+    asn_lookup.reload_if_changed()  # file only; still loads when the DB is down
+    geoip.reload_if_changed()
+
+
+register_periodic_task("geoip", GEOIP_RELOAD_SECONDS, reload_ip_tables)
@@ -0,0 +1,87 @@
+# utils/hll.py
+"""
+HyperLogLog cardinality sketch.
+
+A sketch of precision p keeps 2^p one-byte registers and estimates the number
+of distinct values added to it with a standard error of about 1.04 / sqrt(2^p).
+Sketches of the same precision merge losslessly (register-wise max), so
+per-bucket sketches can be combined into any range after the fact.
+"""
+import hashlib
+import math
+import zlib
+from typing import Optional
+
+import numpy as np
+
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+
+def _hash64(value) -> int:
+    if not isinstance(value, bytes):
+        value = str(value).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), "big")
+
+
+def _alpha(m: int) -> float:
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = 12, registers: Optional[np.ndarray] = None):
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(f"precision must be between {MIN_PRECISION} and {MAX_PRECISION}")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    def add(self, value):
+        h = _hash64(value)
+        index = h >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        rest = h & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Merge `other` into this sketch in place."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        registers = self.registers
+        estimate = _alpha(self.m) * self.m * self.m / float(np.sum(np.ldexp(1.0, -registers.astype(np.int32))))
+        if estimate <= 2.5 * self.m:
+            zeros = int(np.count_nonzero(registers == 0))
+            if zeros:
+                # Linear counting is more accurate for small cardinalities
+                estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def is_empty(self) -> bool:
+        return not self.registers.any()
+
+    def copy(self) -> "HyperLogLog":
+        return HyperLogLog(self.precision, self.registers.copy())
+
+    def to_bytes(self) -> bytes:
+        """Compact form: precision byte + zlib-compressed registers (sparse sketches shrink a lot)."""
+        return bytes([self.precision]) + zlib.compress(self.registers.tobytes(), 6)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        precision = data[0]
+        registers = np.frombuffer(zlib.decompress(data[1:]), dtype=np.uint8).copy()
+        if registers.size != 1 << precision:
+            raise ValueError("Corrupt HyperLogLog sketch")
+        return cls(precision, registers)
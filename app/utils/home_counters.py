@@ -0,0 +1,100 @@
+# utils/home_counters.py
+"""
+In-memory totals for the home page (`GET /statistics`).
+
+Write paths call `home_counters.increment(...)` after their commit; a
+periodic job re-reads the real counts from the DB so the values never drift
+for long (other workers, direct DB edits, tables without write paths here).
+"""
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Dict
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.dashboard import BibliographyDownloadRequest, DownloadItem, DownloadRequest, NGDModsBiblio
+from app.models.users import User
+from app.models.visitors import Visitor
+from app.utils.background import register_periodic_task
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Counter Configuration
+# -------------------------
+HOME_COUNTERS_RECONCILE_SECONDS = int(os.getenv("HOME_COUNTERS_RECONCILE_SECONDS", 300))
+
+TOTAL_USERS = "total_users"
+TOTAL_VISITORS = "total_visitors"
+TOTAL_REQUESTS = "total_requests"
+TOTAL_DOWNLOADS = "total_downloads"
+TOTAL_TECHNICAL_REQUESTS = "total_technical_requests"
+TOTAL_DOWNLOAD_REPORTS = "total_download_reports"
+
+
+def count_totals(db: Session) -> Dict[str, int]:
+    """The exact totals, straight from the DB."""
+    return {
+        TOTAL_USERS: db.query(func.count(User.UserID)).scalar(),
+        TOTAL_VISITORS: db.query(func.count(Visitor.VisitorID)).scalar(),
+        TOTAL_REQUESTS: db.query(func.count(DownloadRequest.ReqNo)).scalar(),
+        TOTAL_DOWNLOADS: db.query(func.count(DownloadItem.ID)).scalar(),
+        # Distinct requests in BIBLIOGRAPHY_DOWNLOAD_REQUESTS
+        TOTAL_TECHNICAL_REQUESTS: db.query(func.count(func.distinct(BibliographyDownloadRequest.ReqNo))).scalar(),
+        # Distinct report files in NGD_MODS_BIBLIO linked to those requests (by MODS)
+        TOTAL_DOWNLOAD_REPORTS: (
+            db.query(func.count(func.distinct(NGDModsBiblio.ReportID)))
+            .join(BibliographyDownloadRequest, NGDModsBiblio.MODS == BibliographyDownloadRequest.MODS)
+            .scalar()
+        ),
+    }
+
+
+class HomeCounters:
+    def __init__(self):
+        self._values: Dict[str, int] = {}
+        # Increments ever applied in this process; lets reconcile keep the ones that land mid-query
+        self._increments: Counter = Counter()
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._values)
+
+    def increment(self, name: str, by: int = 1):
+        with self._lock:
+            self._increments[name] += by
+            if name in self._values:
+                self._values[name] += by
+
+    def reconcile(self):
+        """Replace the in-memory totals with fresh DB counts."""
+        with self._reconcile_lock:
+            with self._lock:
+                before = Counter(self._increments)
+            db = SessionLocal()
+            try:
+                totals = count_totals(db)
+            finally:
+                db.close()
+            with self._lock:
+                for name, value in totals.items():
+                    self._values[name] = (value or 0) + self._increments[name] - before[name]
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.reconcile()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._values)
+
+
+home_counters = HomeCounters()
+
+register_periodic_task("home_counters", HOME_COUNTERS_RECONCILE_SECONDS, home_counters.reconcile)
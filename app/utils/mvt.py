@@ -0,0 +1,172 @@
+# utils/mvt.py
+"""
+Minimal Mapbox Vector Tile (v2.1) encoder for points and polygons.
+Geometries are expected in tile-local pixel coordinates (0..extent, y down).
+"""
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from shapely.geometry import MultiPolygon, Point, Polygon
+from shapely.geometry.polygon import orient
+
+DEFAULT_EXTENT = 4096
+
+_POINT, _POLYGON = 1, 3
+_MOVE_TO, _LINE_TO, _CLOSE_PATH = 1, 2, 7
+
+
+# -------------------------
+# Protobuf wire helpers
+# -------------------------
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _len_field(field: int, payload: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _uint_field(field: int, value: int) -> bytes:
+    return _key(field, 0) + _varint(value)
+
+
+def _packed(field: int, values: Iterable[int]) -> bytes:
+    return _len_field(field, b"".join(_varint(v) for v in values))
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _command(command: int, count: int) -> int:
+    return (command & 0x7) | (count << 3)
+
+
+def _encode_value(value) -> bytes:
+    if isinstance(value, bool):
+        return _uint_field(7, int(value))
+    if isinstance(value, int):
+        return _uint_field(6, _zigzag(value)) if value < 0 else _uint_field(5, value)
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack("<d", value)
+    return _len_field(1, str(value).encode("utf-8"))
+
+
+# -------------------------
+# Geometry encoding
+# -------------------------
+class _Cursor:
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+
+    def delta(self, x: int, y: int) -> List[int]:
+        dx, dy = x - self.x, y - self.y
+        self.x, self.y = x, y
+        return [_zigzag(dx), _zigzag(dy)]
+
+
+def _encode_ring(coords, cursor: _Cursor) -> List[int]:
+    points = [(int(round(x)), int(round(y))) for x, y in coords[:-1]]
+    # Drop repeated vertices created by rounding
+    deduped = [p for i, p in enumerate(points) if i == 0 or p != points[i - 1]]
+    if len(deduped) < 3:
+        return []
+    out = [_command(_MOVE_TO, 1)] + cursor.delta(*deduped[0])
+    out.append(_command(_LINE_TO, len(deduped) - 1))
+    for x, y in deduped[1:]:
+        out.extend(cursor.delta(x, y))
+    out.append(_command(_CLOSE_PATH, 1))
+    return out
+
+
+def _encode_polygon(polygon: Polygon, cursor: _Cursor) -> List[int]:
+    # MVT exterior rings have positive (surveyor's formula) area in tile coordinates
+    polygon = orient(polygon, sign=1.0)
+    exterior = _encode_ring(list(polygon.exterior.coords), cursor)
+    if not exterior:
+        return []
+    out = exterior
+    for interior in polygon.interiors:
+        out.extend(_encode_ring(list(interior.coords), cursor))
+    return out
+
+
+def _encode_geometry(geometry) -> Tuple[Optional[int], List[int]]:
+    cursor = _Cursor()
+    if isinstance(geometry, Point):
+        return _POINT, [_command(_MOVE_TO, 1)] + cursor.delta(int(round(geometry.x)), int(round(geometry.y)))
+    if isinstance(geometry, Polygon):
+        return _POLYGON, _encode_polygon(geometry, cursor)
+    if isinstance(geometry, MultiPolygon):
+        out = []
+        for part in geometry.geoms:
+            out.extend(_encode_polygon(part, cursor))
+        return _POLYGON, out
+    return None, []
+
+
+# -------------------------
+# Layer / tile encoding
+# -------------------------
+def encode_layer(name: str, features: Iterable[Tuple[Optional[int], object, Dict]], extent: int = DEFAULT_EXTENT) -> bytes:
+    """
+    Encode one layer. `features` yields (id, geometry, properties) with
+    geometries already in tile pixel coordinates.
+    """
+    keys: Dict[str, int] = {}
+    values: Dict[Tuple[type, object], int] = {}
+    encoded_values: List[bytes] = []
+    body = bytearray()
+
+    for feature_id, geometry, properties in features:
+        geom_type, commands = _encode_geometry(geometry)
+        if geom_type is None or not commands:
+            continue
+        tags = []
+        for key, value in (properties or {}).items():
+            if value is None:
+                continue
+            key_index = keys.setdefault(key, len(keys))
+            value_key = (type(value), value)
+            if value_key not in values:
+                values[value_key] = len(encoded_values)
+                encoded_values.append(_encode_value(value))
+            tags.extend((key_index, values[value_key]))
+
+        feature = bytearray()
+        if feature_id is not None:
+            feature += _uint_field(1, feature_id)
+        if tags:
+            feature += _packed(2, tags)
+        feature += _uint_field(3, geom_type)
+        feature += _packed(4, commands)
+        body += _len_field(2, bytes(feature))
+
+    layer = bytearray()
+    layer += _uint_field(15, 2)
+    layer += _len_field(1, name.encode("utf-8"))
+    layer += body
+    for key in keys:
+        layer += _len_field(3, key.encode("utf-8"))
+    for value in encoded_values:
+        layer += _len_field(4, value)
+    layer += _uint_field(5, extent)
+    return bytes(layer)
+
+
+def encode_tile(layers: Dict[str, bytes]) -> bytes:
+    """Wrap pre-encoded layers into a tile."""
+    return b"".join(_len_field(3, layer) for layer in layers.values())
@@ -14,6 +14,9 @@ STATIC_ROOT = os.getenv("APP_STATIC_ROOT")
 if not STATIC_ROOT:
     STATIC_ROOT = "/app/static"
 
+# Private runtime state (snapshots, logs...). Kept outside STATIC_ROOT, which is publicly mounted.
+CACHE_ROOT = os.getenv("APP_CACHE_DIR") or "/app/cache"
+
 def _normalize_parts(parts):
     for raw in parts:
         if not raw:
@@ -40,6 +43,20 @@ def static_path(*parts: str, ensure: bool = False) -> str:
     return path
 
 
+def cache_path(*parts: str, ensure: bool = False) -> str:
+    """
+    Build an absolute path inside the cache directory.
+
+    Args:
+        *parts: Path segments inside the cache directory.
+        ensure: Create the directory if it does not exist.
+    """
+    path = os.path.join(CACHE_ROOT, *_normalize_parts(parts))
+    if ensure:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
 def static_file_path(filename: str, *parts: str) -> str:
     """
     Build an absolute file path inside the static root, ensuring the parent
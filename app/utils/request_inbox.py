@@ -0,0 +1,61 @@
+# utils/request_inbox.py
+"""
+Helpers for the admin request inbox (`GET /admin/requests`).
+
+Pages are addressed by an opaque keyset cursor on (CreatedAt, Id) instead of
+OFFSET, so page 50 costs the same index seek as page 1
+(migrations/005_request_inbox_indexes.sql). Totals are counted once per
+filter combination and cached for REQUEST_INBOX_COUNT_SECONDS.
+"""
+import base64
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Hashable, Tuple
+
+import orjson
+from cachetools import TTLCache
+
+# -------------------------
+# Request Inbox Configuration
+# -------------------------
+REQUEST_INBOX_COUNT_SECONDS = int(os.getenv("REQUEST_INBOX_COUNT_SECONDS", 60))
+REQUEST_INBOX_COUNT_ENTRIES = 256
+
+
+def encode_cursor(created_at: datetime, request_id: int) -> str:
+    raw = orjson.dumps([created_at.isoformat(), request_id])
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(CreatedAt, Id) of the last row of the previous page; ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, request_id = orjson.loads(raw)
+        return datetime.fromisoformat(created_at), int(request_id)
+    except (ValueError, TypeError, orjson.JSONDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+class InboxCounts:
+    def __init__(self, ttl: int = REQUEST_INBOX_COUNT_SECONDS, maxsize: int = REQUEST_INBOX_COUNT_ENTRIES):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, count: Callable[[], int]) -> int:
+        """Cached total for `key`, computed with `count()` when missing or expired."""
+        with self._lock:
+            total = self._cache.get(key)
+        if total is None:
+            total = count()
+            with self._lock:
+                self._cache[key] = total
+        return total
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+inbox_counts = InboxCounts()
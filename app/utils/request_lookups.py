@@ -0,0 +1,71 @@
+# utils/request_lookups.py
+"""
+In-memory copies of the request lookup tables (categories, complaint screens,
+projections, request information, formats) used to validate
+`POST /requests/` without a query per id.
+
+The tables are only edited in the DB, so the copy is reloaded every
+REQUEST_LOOKUPS_REFRESH_SECONDS, and once more on demand when a request
+names an id the copy doesn't know yet (a row added since the last load).
+"""
+import os
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.lookups import Category, ComplaintScreen, Format, Projection, RequestInformation
+
+# -------------------------
+# Request Lookups Configuration
+# -------------------------
+REQUEST_LOOKUPS_REFRESH_SECONDS = int(os.getenv("REQUEST_LOOKUPS_REFRESH_SECONDS", 300))
+# On-demand reloads happen at most this often (bad ids must not turn into a reload each)
+_MIN_RELOAD_SECONDS = 5
+
+
+class RequestLookups:
+    def __init__(self, max_age: int = REQUEST_LOOKUPS_REFRESH_SECONDS):
+        self.max_age = max_age
+        self._loaded_at: Optional[float] = None
+        # Every id the foreign keys accept, deleted rows included
+        self.category_names: Dict[int, str] = {}
+        self.complaint_screen_ids: FrozenSet[int] = frozenset()
+        self.projection_ids: FrozenSet[int] = frozenset()
+        self.request_information_ids: FrozenSet[int] = frozenset()
+        self.format_ids: FrozenSet[int] = frozenset()
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session):
+        self.category_names = dict(db.query(Category.Id, Category.Name).all())
+        self.complaint_screen_ids = frozenset(row[0] for row in db.query(ComplaintScreen.Id))
+        self.projection_ids = frozenset(row[0] for row in db.query(Projection.Id))
+        self.request_information_ids = frozenset(row[0] for row in db.query(RequestInformation.Id))
+        self.format_ids = frozenset(row[0] for row in db.query(Format.Id))
+        self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, db: Session, force: bool = False):
+        max_age = _MIN_RELOAD_SECONDS if force else self.max_age
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < max_age:
+            return
+        with self._lock:
+            self._load(db)
+
+    def unknown(self, db: Session, field: str, ids: Iterable[int]) -> FrozenSet[int]:
+        """Ids missing from `field` (reloading once before giving up on them)."""
+        ids = frozenset(ids)
+        self.ensure_loaded(db)
+        missing = ids - self._ids(field)
+        if missing:
+            self.ensure_loaded(db, force=True)
+            missing = ids - self._ids(field)
+        return missing
+
+    def _ids(self, field: str) -> FrozenSet[int]:
+        if field == "category":
+            return frozenset(self.category_names)
+        return getattr(self, f"{field}_ids")
+
+
+request_lookups = RequestLookups()
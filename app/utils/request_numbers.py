@@ -0,0 +1,103 @@
+# utils/request_numbers.py
+"""
+Request numbers (`RQ-YYYYMMDD-NNNN`) without a query per request.
+
+Each worker reserves REQUEST_NUMBER_BLOCK values at a time from the
+`Requests.RequestNumberSeq` SEQUENCE (migrations/004_request_number_sequence.sql)
+and hands them out from memory. Numbers are unique across workers; they are
+not gap-free (a restart drops the rest of a block) and only roughly follow
+submission order between workers.
+
+Other dialects (SQLite in tests) use a one-row counter table instead of the
+sequence. If the sequence is missing (migration not applied yet), numbers fall
+back to the old MAX(Id) + 1 scheme, which is not race-free.
+"""
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Request Number Configuration
+# -------------------------
+# Values reserved per round trip to the sequence
+REQUEST_NUMBER_BLOCK = int(os.getenv("REQUEST_NUMBER_BLOCK", 20))
+
+SEQUENCE_NAME = "Requests.RequestNumberSeq"
+_STAND_IN_TABLE = "request_number_sequence"
+
+
+def _reserve_mssql(db, size: int) -> int:
+    return db.execute(text(f"""
+        SET NOCOUNT ON;
+        DECLARE @first SQL_VARIANT;
+        EXEC sys.sp_sequence_get_range
+            @sequence_name = N'{SEQUENCE_NAME}',
+            @range_size = :size,
+            @range_first_value = @first OUTPUT;
+        SELECT CAST(@first AS BIGINT);
+    """), {"size": size}).scalar_one()
+
+
+def _reserve_stand_in(db, size: int) -> int:
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {_STAND_IN_TABLE} (next_value INTEGER NOT NULL)"))
+    if db.execute(text(f"UPDATE {_STAND_IN_TABLE} SET next_value = next_value + :size"), {"size": size}).rowcount == 0:
+        db.execute(text(f"""
+            INSERT INTO {_STAND_IN_TABLE} (next_value)
+            SELECT COALESCE(MAX(Id), 0) + 1 + :size FROM Requests.Requests
+        """), {"size": size})
+    return db.execute(text(f"SELECT next_value - :size FROM {_STAND_IN_TABLE}"), {"size": size}).scalar_one()
+
+
+def _legacy_next(db) -> int:
+    return db.execute(text("SELECT ISNULL(MAX(Id), 0) + 1 FROM Requests.Requests")).scalar_one()
+
+
+class RequestNumberAllocator:
+    def __init__(self, block_size: int = REQUEST_NUMBER_BLOCK):
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0  # exclusive
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> Tuple[int, int]:
+        """(first, end) of a new block, on its own transaction."""
+        db = SessionLocal()
+        try:
+            if db.get_bind().dialect.name != "mssql":
+                first = _reserve_stand_in(db, self.block_size)
+                db.commit()
+                return first, first + self.block_size
+            try:
+                first = _reserve_mssql(db, self.block_size)
+                db.commit()
+                return first, first + self.block_size
+            except DBAPIError:
+                db.rollback()
+                logger.exception("Could not reserve request numbers from %s, falling back to MAX(Id) + 1", SEQUENCE_NAME)
+                first = _legacy_next(db)
+                return first, first + 1
+        finally:
+            db.close()
+
+    def next_value(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self._reserve()
+            value = self._next
+            self._next += 1
+            return value
+
+    def next_number(self) -> str:
+        return f"RQ-{datetime.now().strftime('%Y%m%d')}-{str(self.next_value()).zfill(4)}"
+
+
+request_numbers = RequestNumberAllocator()
@@ -0,0 +1,173 @@
+# utils/response_cache.py
+import functools
+import inspect
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+import orjson
+from cachetools import TLRUCache
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+# -------------------------
+# Cache Configuration
+# -------------------------
+# Max number of distinct (endpoint + filters) entries kept in memory
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 512))
+# TTL for responses that include the current (still changing) month
+RESPONSE_CACHE_LIVE_TTL = int(os.getenv("RESPONSE_CACHE_LIVE_TTL", 60))
+# Lower bound for closed-period TTLs (avoids near-zero TTLs right before a month boundary)
+RESPONSE_CACHE_MIN_TTL = int(os.getenv("RESPONSE_CACHE_MIN_TTL", 5))
+
+
+def _month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(value: datetime) -> datetime:
+    start = _month_start(value)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def month_aligned_ttl(end_date: Optional[str] = None, now: Optional[datetime] = None) -> int:
+    """
+    Return the cache TTL (seconds) for a response covering a period that ends
+    at `end_date` (format: YYYY-MM).
+
+    - Closed periods (ending before the current month) stay valid until the
+      next month boundary.
+    - Open periods (no end date, or ending in/after the current month) get a
+      short TTL, never crossing the month boundary.
+    """
+    now = now or datetime.utcnow()
+    until_boundary = max(int((_next_month(now) - now).total_seconds()), RESPONSE_CACHE_MIN_TTL)
+
+    closed = False
+    if end_date:
+        try:
+            closed = datetime.strptime(end_date, "%Y-%m") < _month_start(now)
+        except ValueError:
+            closed = False
+
+    if closed:
+        return until_boundary
+    return max(min(RESPONSE_CACHE_LIVE_TTL, until_boundary), 1)
+
+
+def _normalize_value(value):
+    if isinstance(value, (list, tuple, set)):
+        return tuple(sorted(str(v) for v in value))
+    return value
+
+
+def build_cache_key(endpoint: str, params: dict) -> tuple:
+    """
+    Build a cache key from the endpoint name and its filter params.
+    Empty params are dropped and list params are sorted, so
+    `?orgtype=b&orgtype=a` and `?orgtype=a&orgtype=b` share one entry.
+    """
+    items = []
+    for name, value in params.items():
+        if value is None or value == [] or value == "":
+            continue
+        if not isinstance(value, (str, int, float, bool, list, tuple, set)):
+            # Sessions, users, requests ... are not part of the filter
+            continue
+        items.append((name, _normalize_value(value)))
+    return (endpoint, tuple(sorted(items)))
+
+
+class ResponseCache:
+    """
+    In-memory cache of pre-encoded JSON response bodies.
+    Each entry carries its own expiry, so TTLs can follow the requested period.
+    """
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self._entries = TLRUCache(maxsize=maxsize, ttu=lambda _key, value, _now: value[1], timer=time.monotonic)
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def set(self, key, body: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (body, time.monotonic() + ttl)
+
+    def invalidate(self, endpoint: Optional[str] = None):
+        """Drop every entry, or only the entries of one endpoint."""
+        with self._lock:
+            if endpoint is None:
+                self._entries.clear()
+                return
+            for key in [k for k in list(self._entries.keys()) if k[0] == endpoint]:
+                self._entries.pop(key, None)
+
+
+response_cache = ResponseCache()
+
+
+def encode_json(payload) -> bytes:
+    # Non-str keys: timelines are keyed by year/month numbers
+    return orjson.dumps(jsonable_encoder(payload), option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_bytes_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+def cached_response(endpoint: Optional[str] = None, ttl: Callable[..., int] = None):
+    """
+    Decorator for read-only endpoints: caches the encoded JSON body per
+    endpoint + normalized query params. Put it *under* the @router decorator.
+
+    Args:
+        endpoint: Cache namespace (defaults to the function name).
+        ttl: Callable receiving the endpoint kwargs dict and returning a TTL in
+             seconds (defaults to a month-aligned TTL based on the `end_date` param).
+    """
+
+    def decorator(func):
+        name = endpoint or func.__name__
+
+        def _ttl(kwargs) -> int:
+            if ttl:
+                return ttl(kwargs)
+            return month_aligned_ttl(kwargs.get("end_date"))
+
+        def _store(key, kwargs, result):
+            if isinstance(result, Response):
+                return result
+            body = encode_json(result)
+            response_cache.set(key, body, _ttl(kwargs))
+            return json_bytes_response(body)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = build_cache_key(name, kwargs)
+                body = response_cache.get(key)
+                if body is not None:
+                    return json_bytes_response(body)
+                return _store(key, kwargs, await func(*args, **kwargs))
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = build_cache_key(name, kwargs)
+            body = response_cache.get(key)
+            if body is not None:
+                return json_bytes_response(body)
+            return _store(key, kwargs, func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,155 @@
+# utils/snapshots.py
+"""
+Precomputed responses for the expensive statistics endpoints.
+
+Each snapshot is rebuilt in the background on its own interval and written
+atomically to `<APP_CACHE_DIR>/snapshots/<name>.json`. On startup the files
+are loaded back, so a restarted worker serves the last snapshot immediately
+instead of running the aggregations on the first request.
+"""
+import functools
+import inspect
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import orjson
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.utils.background import register_periodic_task
+from app.utils.paths import cache_path
+from app.utils.response_cache import build_cache_key, encode_json, json_bytes_response
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Snapshot Configuration
+# -------------------------
+SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Refresh intervals (seconds) per group of endpoints
+SNAPSHOT_HOME_SECONDS = int(os.getenv("SNAPSHOT_HOME_SECONDS", 60))
+SNAPSHOT_ADMIN_SECONDS = int(os.getenv("SNAPSHOT_ADMIN_SECONDS", 300))
+SNAPSHOT_DASHBOARD_SECONDS = int(os.getenv("SNAPSHOT_DASHBOARD_SECONDS", 600))
+
+
+class Snapshot:
+    def __init__(self, payload: dict, body: bytes, built_at: float):
+        self.payload = payload
+        self.body = body
+        self.built_at = built_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+
+class SnapshotStore:
+    def __init__(self):
+        self._builders: Dict[str, Callable[[Session], dict]] = {}
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._lock = threading.Lock()
+
+    def _file(self, name: str, ensure: bool = False) -> str:
+        return os.path.join(cache_path("snapshots", ensure=ensure), f"{name}.json")
+
+    def register(self, name: str, build: Callable[[Session], dict], interval: int):
+        """Rebuild `name` every `interval` seconds with `build(db)` (returns the response payload)."""
+        if not SNAPSHOTS_ENABLED:
+            return
+        self._builders[name] = build
+
+        def initial_delay() -> float:
+            # A snapshot loaded from disk is served until it would have been refreshed anyway
+            snapshot = self._snapshots.get(name)
+            return interval - snapshot.age if snapshot else 0
+
+        register_periodic_task(f"snapshot:{name}", interval, lambda: self.refresh(name), initial_delay=initial_delay)
+
+    def get(self, name: str) -> Optional[Snapshot]:
+        return self._snapshots.get(name)
+
+    def refresh(self, name: str):
+        db = SessionLocal()
+        try:
+            payload = self._builders[name](db)
+        finally:
+            db.close()
+        body = encode_json(payload)
+        with self._lock:
+            self._snapshots[name] = Snapshot(payload, body, time.time())
+        try:
+            self._write(name, body)
+        except OSError:
+            logger.exception("Could not persist snapshot %s (served from memory only)", name)
+
+    def _write(self, name: str, body: bytes):
+        """Write to a temp file in the same directory, then rename over the old file (atomic)."""
+        path = self._file(name, ensure=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(body)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def load(self):
+        """Load every registered snapshot that has a file on disk (called on startup)."""
+        for name in self._builders:
+            path = self._file(name)
+            try:
+                with open(path, "rb") as f:
+                    body = f.read()
+                snapshot = Snapshot(orjson.loads(body), body, os.path.getmtime(path))
+            except FileNotFoundError:
+                continue
+            except (OSError, orjson.JSONDecodeError):
+                logger.warning("Ignoring unreadable snapshot %s", path)
+                continue
+            with self._lock:
+                self._snapshots[name] = snapshot
+
+
+snapshots = SnapshotStore()
+
+
+def serve_snapshot(name: str, only_if: Optional[Callable[[], bool]] = None):
+    """
+    Decorator: answer unfiltered calls from snapshot `name` when one exists
+    (and `only_if()` is true). Filtered calls fall through to the endpoint.
+    Put it *under* the @router decorator.
+    """
+
+    def decorator(func):
+        def _from_snapshot(kwargs):
+            if build_cache_key(name, kwargs)[1]:
+                return None
+            if only_if is not None and not only_if():
+                return None
+            snapshot = snapshots.get(name)
+            return json_bytes_response(snapshot.body) if snapshot else None
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                response = _from_snapshot(kwargs)
+                return response if response is not None else await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            response = _from_snapshot(kwargs)
+            return response if response is not None else func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
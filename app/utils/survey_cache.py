@@ -0,0 +1,250 @@
+# utils/survey_cache.py
+"""
+In-memory survey data for the public survey endpoints.
+
+`survey_catalogue` keeps the questions and choices (ids and texts) used to
+validate `POST /survey/answers` and to label the admin statistics. It is
+versioned: any committed ORM write to questions, choices, categories or
+question types bumps the version (mapper events below), and so does a periodic job for edits made straight
+in the DB. The next request reloads.
+
+`survey_stats` caches the admin statistics payload per (catalogue version,
+survey data version); `submit_bulk_answers` bumps the data version.
+
+`survey_questionnaire` keeps the public `GET /survey/questions` response
+compiled to JSON bytes (plus an ETag) per catalogue version; its texts go
+through `clean_text` once per build. Question and choice texts are also
+cleaned when they are written, and rows stored before that can optionally
+be cleaned in place with:
+
+    python -m app.utils.survey_cache clean
+"""
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.lookups import SurveyQuestionCategory, SurveyTypeOfQuestion
+from app.models.survey import QuestionChoice, UsersFeedbackQuestion
+from app.utils.background import register_periodic_task
+from app.utils.response_cache import encode_json
+from app.utils.utils import clean_text
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Survey Cache Configuration
+# -------------------------
+SURVEY_CATALOGUE_REFRESH_SECONDS = int(os.getenv("SURVEY_CATALOGUE_REFRESH_SECONDS", 300))
+# Answers submitted through other workers show up after at most this long
+SURVEY_STATS_MAX_AGE_SECONDS = int(os.getenv("SURVEY_STATS_MAX_AGE_SECONDS", 300))
+
+
+class QuestionInfo(NamedTuple):
+    Id: int
+    MainQuestion: Optional[str]
+    MainQuestion_Ar: Optional[str]
+    IsDeleted: Optional[bool]
+
+
+class ChoiceInfo(NamedTuple):
+    Id: int
+    QuestionId: Optional[int]
+    Choice: Optional[str]
+
+
+class SurveyCatalogue:
+    def __init__(self):
+        self._version = 0
+        self._loaded_version: Optional[int] = None
+        self._choices: Dict[int, FrozenSet[int]] = {}
+        self.questions: List[QuestionInfo] = []
+        self.choices_by_question: Dict[int, List[ChoiceInfo]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+
+    def ensure_loaded(self, db: Session):
+        if self._loaded_version == self._version:
+            return
+        with self._lock:
+            version = self._version
+            if self._loaded_version == version:
+                return
+            questions = [
+                QuestionInfo(*row)
+                for row in db.query(
+                    UsersFeedbackQuestion.Id,
+                    UsersFeedbackQuestion.MainQuestion,
+                    UsersFeedbackQuestion.MainQuestion_Ar,
+                    UsersFeedbackQuestion.IsDeleted,
+                ).order_by(UsersFeedbackQuestion.Id)
+            ]
+            choices_by_question: Dict[int, List[ChoiceInfo]] = {}
+            for row in db.query(QuestionChoice.Id, QuestionChoice.QuestionId, QuestionChoice.Choice).order_by(QuestionChoice.Id):
+                choices_by_question.setdefault(row.QuestionId, []).append(ChoiceInfo(*row))
+            # Answers may only target live questions (IsDeleted strictly False)
+            self._choices = {
+                q.Id: frozenset(c.Id for c in choices_by_question.get(q.Id, ()))
+                for q in questions
+                if q.IsDeleted == False
+            }
+            self.questions = questions
+            self.choices_by_question = choices_by_question
+            self._loaded_version = version
+
+    def has_question(self, question_id: int) -> bool:
+        return question_id in self._choices
+
+    def choice_ids(self, question_id: int) -> FrozenSet[int]:
+        return self._choices.get(question_id, frozenset())
+
+
+survey_catalogue = SurveyCatalogue()
+
+class SurveyStatsCache:
+    def __init__(self, max_age: int = SURVEY_STATS_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._data_version = 0
+        self._entry = None  # (key, built_at, payload)
+        self._lock = threading.Lock()
+
+    def bump(self):
+        """Answers were written: the next read rebuilds."""
+        with self._lock:
+            self._data_version += 1
+
+    def get(self, build: Callable[[], dict]) -> dict:
+        key = (survey_catalogue.version, self._data_version)
+        entry = self._entry
+        if entry is not None and entry[0] == key and time.monotonic() - entry[1] < self.max_age:
+            return entry[2]
+        payload = build()
+        self._entry = (key, time.monotonic(), payload)
+        return payload
+
+
+survey_stats = SurveyStatsCache()
+
+
+class SurveyQuestionnaireCache:
+    def __init__(self):
+        self._entry = None  # (catalogue version, body, etag)
+        self._lock = threading.Lock()
+
+    def get(self, build: Callable[[], dict]) -> Tuple[bytes, str]:
+        """(JSON body, ETag) of the payload built by `build()`, compiled once per catalogue version."""
+        entry = self._entry
+        if entry is not None and entry[0] == survey_catalogue.version:
+            return entry[1], entry[2]
+        with self._lock:
+            version = survey_catalogue.version
+            entry = self._entry
+            if entry is not None and entry[0] == version:
+                return entry[1], entry[2]
+            body = encode_json(build())
+            # From the content, so every worker hands out the same ETag
+            etag = f'"survey-questions-{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            self._entry = (version, body, etag)
+            return body, etag
+
+
+survey_questionnaire = SurveyQuestionnaireCache()
+
+register_periodic_task(
+    "survey_catalogue", SURVEY_CATALOGUE_REFRESH_SECONDS, survey_catalogue.invalidate, run_on_start=False
+)
+
+
+# -------------------------
+# Invalidation on ORM writes (applied after commit, so a reload never sees uncommitted rows)
+# -------------------------
+_CHANGED = "survey_catalogue_changed"
+
+
+def _mark_changed(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info[_CHANGED] = True
+
+
+# Categories and types only appear in the questionnaire payload
+for _model in (UsersFeedbackQuestion, QuestionChoice, SurveyQuestionCategory, SurveyTypeOfQuestion):
+    for _event in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event, _mark_changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop(_CHANGED, False):
+        survey_catalogue.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop(_CHANGED, None)
+
+
+# -------------------------
+# Text cleaning on write
+# -------------------------
+CLEANED_FIELDS = {
+    UsersFeedbackQuestion: ("MainQuestion", "MainQuestion_Ar", "Question_Desc", "Question_Desc_Ar"),
+    QuestionChoice: ("Choice", "Choice_Ar"),
+}
+
+
+def _clean_fields(obj) -> int:
+    """Apply `clean_text` to the text fields of `obj`; returns how many changed."""
+    changed = 0
+    for field in CLEANED_FIELDS[type(obj)]:
+        value = getattr(obj, field)
+        cleaned = clean_text(value)
+        if cleaned != value:
+            setattr(obj, field, cleaned)
+            changed += 1
+    return changed
+
+
+def _clean_before_write(mapper, connection, target):
+    _clean_fields(target)
+
+
+for _model in CLEANED_FIELDS:
+    for _event in ("before_insert", "before_update"):
+        event.listen(_model, _event, _clean_before_write)
+
+
+def clean_stored_texts(db: Session) -> int:
+    """Clean the texts of rows written before cleaning moved to write time. Returns the fields changed."""
+    changed = 0
+    for model in CLEANED_FIELDS:
+        for obj in db.query(model):
+            changed += _clean_fields(obj)
+    db.commit()
+    return changed
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["clean"]:
+        sys.exit("usage: python -m app.utils.survey_cache clean")
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        total = clean_stored_texts(session)
+    finally:
+        session.close()
+    logger.info("Survey texts cleaned: %d fields changed", total)
@@ -0,0 +1,245 @@
+# utils/survey_report.py
+"""
+The admin survey report: one row per respondent (user), one column per
+question in catalogue order.
+
+Respondents and their answers come from one joined query ordered by user and
+streamed with yield_per (`iter_respondent_answers`), so the report is written
+row by row as CSV/XLSX (utils/export.py) without holding it in memory.
+
+Very large reports can run as background jobs instead of a request:
+the file is written to `<APP_CACHE_DIR>/exports/<job id>.<ext>` next to a
+small JSON status file, so any worker sharing the cache directory can report
+on it and serve it. Finished files are removed after SURVEY_EXPORT_JOB_SECONDS.
+"""
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from itertools import groupby
+from operator import attrgetter
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import orjson
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.survey import QuestionChoice, UsersFeedbackAnswer, UsersFeedbackQuestion
+from app.models.users import User
+from app.utils.background import register_periodic_task
+from app.utils.export import EXPORT_FETCH_SIZE, ExportColumns, export_media, iter_export
+from app.utils.paths import cache_path
+from app.utils.survey_cache import QuestionInfo, survey_catalogue
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Survey Report Configuration
+# -------------------------
+# How long finished export jobs (and their files) are kept
+SURVEY_EXPORT_JOB_SECONDS = int(os.getenv("SURVEY_EXPORT_JOB_SECONDS", 86400))
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+# -------------------------
+# Respondent query
+# -------------------------
+def iter_respondent_answers(db: Session, email: Optional[str] = None, user_ids: Optional[List[int]] = None):
+    """
+    One joined query over respondents and their answers, ordered by user and
+    streamed with yield_per; yields (user, answers) per respondent.
+    Answers carry the question and choice texts, so nothing is lazy-loaded.
+    """
+    query = (
+        db.query(
+            User.UserID,
+            User.Email,
+            User.FirstName,
+            User.LastName,
+            UsersFeedbackAnswer.QuestionId,
+            UsersFeedbackAnswer.ChoiceId,
+            UsersFeedbackAnswer.please_specify,
+            UsersFeedbackAnswer.CreatedAt,
+            UsersFeedbackQuestion.Id.label("QuestionRowId"),
+            UsersFeedbackQuestion.MainQuestion,
+            QuestionChoice.Choice,
+        )
+        .join(UsersFeedbackAnswer, UsersFeedbackAnswer.CreatedByUserID == User.UserID)
+        .outerjoin(UsersFeedbackQuestion, UsersFeedbackAnswer.QuestionId == UsersFeedbackQuestion.Id)
+        .outerjoin(QuestionChoice, UsersFeedbackAnswer.ChoiceId == QuestionChoice.Id)
+    )
+    if email:
+        query = query.filter(User.Email == email)
+    if user_ids is not None:
+        if not user_ids:
+            return
+        query = query.filter(User.UserID.in_(user_ids))
+
+    rows = query.order_by(User.UserID, UsersFeedbackAnswer.Id).yield_per(EXPORT_FETCH_SIZE)
+    for _, answers in groupby(rows, key=attrgetter("UserID")):
+        answers = list(answers)
+        yield answers[0], answers
+
+
+def answer_text(answer) -> Optional[str]:
+    return answer.please_specify or answer.Choice
+
+
+# -------------------------
+# Report rows
+# -------------------------
+def report_columns(questions: Sequence[QuestionInfo]) -> ExportColumns:
+    return [("Answer time", "datetime"), ("User Email", "str"), ("User Name", "str")] + [
+        (q.MainQuestion or f"Question {q.Id}", "str") for q in questions
+    ]
+
+
+def report_row(user, answers, questions: Sequence[QuestionInfo]) -> Tuple:
+    """(Answer time, email, name, one answer per question) for one respondent."""
+    # Last answer with content per question
+    answer_map = {a.QuestionId: a for a in answers if a.please_specify or a.ChoiceId}
+
+    answer_time = None
+    values = []
+    for q in questions:
+        a = answer_map.get(q.Id)
+        if a is None:
+            values.append(None)
+            continue
+        if answer_time is None:
+            answer_time = a.CreatedAt
+        values.append(answer_text(a))
+    return (answer_time, user.Email, f"{user.FirstName} {user.LastName}", *values)
+
+
+def iter_report_rows(questions: Sequence[QuestionInfo]) -> Iterator[Tuple]:
+    """
+    Report rows read on a dedicated session: the request-scoped one is closed
+    while a streamed response is still being written.
+    """
+    db = SessionLocal()
+    try:
+        for user, answers in iter_respondent_answers(db):
+            yield report_row(user, answers, questions)
+    finally:
+        db.close()
+
+
+def report_filename(extension: str) -> str:
+    return f"survey_report_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{extension}"
+
+
+# -------------------------
+# Background export jobs
+# -------------------------
+def _job_dir(ensure: bool = False) -> str:
+    return cache_path("exports", ensure=ensure)
+
+
+def _status_path(job_id: str) -> str:
+    return os.path.join(_job_dir(), f"{job_id}.json")
+
+
+def _write_status(job_id: str, status: dict):
+    """Write to a temp file, then rename (readers never see half a file)."""
+    path = _status_path(job_id)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{job_id}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(orjson.dumps(status))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    if not _JOB_ID.match(job_id):
+        return None
+    try:
+        with open(_status_path(job_id), "rb") as f:
+            return orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+
+
+def job_file(job: dict) -> str:
+    return os.path.join(_job_dir(), f"{job['job_id']}.{job['extension']}")
+
+
+def create_job(file_format: str, compress: bool) -> dict:
+    media_type, extension = export_media(file_format, compress)
+    _job_dir(ensure=True)
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "status": "running",
+        "format": file_format,
+        "compress": compress,
+        "media_type": media_type,
+        "extension": extension,
+        "filename": report_filename(extension),
+        "created_at": time.time(),
+        "finished_at": None,
+        "rows": None,
+        "error": None,
+    }
+    _write_status(job["job_id"], job)
+    return job
+
+
+def run_job(job: dict):
+    """Write the report file of a job created by `create_job` (runs as a background task)."""
+    path = job_file(job)
+    part_path = path + ".part"
+    rows = 0
+
+    def counted(source):
+        nonlocal rows
+        for row in source:
+            rows += 1
+            yield row
+
+    try:
+        db = SessionLocal()
+        try:
+            survey_catalogue.ensure_loaded(db)
+        finally:
+            db.close()
+        questions = survey_catalogue.questions
+        with open(part_path, "wb") as out:
+            for chunk in iter_export(job["format"], report_columns(questions), counted(iter_report_rows(questions)), compress=job["compress"]):
+                out.write(chunk)
+        os.replace(part_path, path)
+        job.update(status="done", rows=rows)
+    except Exception as exc:
+        logger.exception("Survey export job %s failed", job["job_id"])
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        job.update(status="failed", error=str(exc))
+    job["finished_at"] = time.time()
+    _write_status(job["job_id"], job)
+
+
+def purge_jobs():
+    """Remove jobs (status and file) older than SURVEY_EXPORT_JOB_SECONDS."""
+    directory = _job_dir()
+    if not os.path.isdir(directory):
+        return
+    cutoff = time.time() - SURVEY_EXPORT_JOB_SECONDS
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            logger.warning("Could not remove expired export file %s", path)
+
+
+register_periodic_task("survey_export_jobs", 3600, purge_jobs, run_on_start=False)
@@ -0,0 +1,238 @@
+# utils/tile_layers.py
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import shapely
+from cachetools import LRUCache
+from shapely.geometry import Point, box
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.models.metadata import MetadataInfo
+from app.utils.mvt import DEFAULT_EXTENT, encode_layer, encode_tile
+from app.utils.visitor_grid import (
+    MAX_LATITUDE,
+    lonlat_to_tile_fraction,
+    tile_to_lonlat,
+    visitor_grid,
+)
+
+# -------------------------
+# Tile Configuration
+# -------------------------
+TILE_CACHE_SIZE = int(os.getenv("TILE_CACHE_SIZE", 4096))
+# Clusters per tile side = 2 ** TILE_CLUSTER_BITS
+TILE_CLUSTER_BITS = int(os.getenv("TILE_CLUSTER_BITS", 6))
+# New visits invalidate visitor tiles at most this often
+TILE_VISITOR_REFRESH_SECONDS = int(os.getenv("TILE_VISITOR_REFRESH_SECONDS", 300))
+# Pixels of geometry kept outside the tile edge (avoids seams between tiles)
+TILE_BUFFER = int(os.getenv("TILE_BUFFER", 64))
+MAX_TILE_ZOOM = 22
+
+Features = Iterator[Tuple[Optional[int], object, Dict]]
+
+
+def tile_bounds(z: int, x: int, y: int, buffer_px: int = 0) -> Tuple[float, float, float, float]:
+    """WGS84 (min_lon, min_lat, max_lon, max_lat) of a tile, optionally grown by `buffer_px`."""
+    pad = buffer_px / DEFAULT_EXTENT
+    min_lon, max_lat = tile_to_lonlat(x - pad, y - pad, z)
+    max_lon, min_lat = tile_to_lonlat(x + 1 + pad, y + 1 + pad, z)
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def _to_tile_pixels(geometry, z: int, x: int, y: int):
+    """Project a WGS84 geometry to pixel coordinates of tile (z, x, y)."""
+    n = 1 << z
+
+    def project(coords: np.ndarray) -> np.ndarray:
+        lon = coords[:, 0]
+        lat = np.radians(np.clip(coords[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+        fx = (lon + 180.0) / 360.0 * n
+        fy = (1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * n
+        return np.column_stack(((fx - x) * DEFAULT_EXTENT, (fy - y) * DEFAULT_EXTENT))
+
+    return shapely.transform(geometry, project)
+
+
+class VisitorsLayer:
+    """Visitor points clustered on a 2^TILE_CLUSTER_BITS grid per tile."""
+
+    name = "visitors"
+
+    def __init__(self):
+        self._version = 0
+        self._seen_revision = None
+        self._bumped_at = 0.0
+        self._lock = threading.Lock()
+
+    def version(self) -> int:
+        # Throttle: new visits change the grid constantly, tiles only need to follow it loosely
+        with self._lock:
+            now = time.monotonic()
+            if visitor_grid.revision != self._seen_revision and (
+                self._seen_revision is None or now - self._bumped_at >= TILE_VISITOR_REFRESH_SECONDS
+            ):
+                self._seen_revision = visitor_grid.revision
+                self._bumped_at = now
+                self._version += 1
+            return self._version
+
+    def bump(self):
+        with self._lock:
+            self._seen_revision = None
+
+    def features(self, db: Session, z: int, x: int, y: int) -> Features:
+        visitor_grid.ensure_loaded(db)
+        max_zoom = visitor_grid.max_zoom
+        if z <= max_zoom:
+            shift = max_zoom - z
+            tile_range = (x << shift, y << shift, ((x + 1) << shift) - 1, ((y + 1) << shift) - 1)
+        else:
+            shift = z - max_zoom
+            tile_range = (x >> shift, y >> shift, x >> shift, y >> shift)
+
+        cells = visitor_grid.cells(max_zoom, tile_range)
+        cluster_size = DEFAULT_EXTENT / (1 << TILE_CLUSTER_BITS)
+        clusters = defaultdict(lambda: [0, 0.0, 0.0])
+
+        for (cx, cy), count in cells.items():
+            lon, lat = tile_to_lonlat(cx + 0.5, cy + 0.5, max_zoom)
+            fx, fy = lonlat_to_tile_fraction(lon, lat, z)
+            px, py = (fx - x) * DEFAULT_EXTENT, (fy - y) * DEFAULT_EXTENT
+            if not (0 <= px < DEFAULT_EXTENT and 0 <= py < DEFAULT_EXTENT):
+                continue
+            cluster = clusters[(int(px // cluster_size), int(py // cluster_size))]
+            cluster[0] += count
+            cluster[1] += px * count
+            cluster[2] += py * count
+
+        for feature_id, (count, sum_x, sum_y) in enumerate(clusters.values(), start=1):
+            point = Point(sum_x / count, sum_y / count)
+            lon, lat = tile_to_lonlat(x + point.x / DEFAULT_EXTENT, y + point.y / DEFAULT_EXTENT, z)
+            yield feature_id, point, {
+                "count": int(count),
+                "cluster": count > 1,
+                "lon": round(lon, 6),
+                "lat": round(lat, 6),
+            }
+
+
+class MetadataLayer:
+    """Coverage polygons built from MetadataInfo West/East/North/South bounds."""
+
+    name = "metadata"
+
+    def __init__(self):
+        self._version = 1
+        self._loaded_version = None
+        self._items: List[Tuple[int, object, Dict]] = []
+        self._tree = None
+        self._lock = threading.Lock()
+
+    def version(self) -> int:
+        return self._version
+
+    def bump(self):
+        with self._lock:
+            self._version += 1
+
+    def _ensure_loaded(self, db: Session):
+        if self._loaded_version == self._version:
+            return
+        with self._lock:
+            version = self._version
+            if self._loaded_version == version:
+                return
+            rows = (
+                db.query(
+                    MetadataInfo.MetadataID,
+                    MetadataInfo.DatasetID,
+                    MetadataInfo.Name,
+                    MetadataInfo.NameAr,
+                    MetadataInfo.WestBound,
+                    MetadataInfo.EastBound,
+                    MetadataInfo.SouthBound,
+                    MetadataInfo.NorthBound,
+                )
+                .filter(or_(MetadataInfo.IsDeleted == False, MetadataInfo.IsDeleted == None))
+                .filter(
+                    MetadataInfo.WestBound.isnot(None),
+                    MetadataInfo.EastBound.isnot(None),
+                    MetadataInfo.SouthBound.isnot(None),
+                    MetadataInfo.NorthBound.isnot(None),
+                )
+                .all()
+            )
+            items = []
+            for r in rows:
+                west, east = sorted((r.WestBound, r.EastBound))
+                south, north = sorted((max(r.SouthBound, -MAX_LATITUDE), min(r.NorthBound, MAX_LATITUDE)))
+                if west == east or south == north:
+                    continue
+                items.append((
+                    r.MetadataID,
+                    box(west, south, east, north),
+                    {"MetadataID": r.MetadataID, "DatasetID": r.DatasetID, "Name": r.Name, "NameAr": r.NameAr},
+                ))
+            self._items = items
+            self._tree = shapely.STRtree([geom for _, geom, _ in items]) if items else None
+            self._loaded_version = version
+
+    def features(self, db: Session, z: int, x: int, y: int) -> Features:
+        self._ensure_loaded(db)
+        if self._tree is None:
+            return
+        items = self._items
+        query_box = box(*tile_bounds(z, x, y, TILE_BUFFER))
+        for index in self._tree.query(query_box, predicate="intersects"):
+            feature_id, geometry, properties = items[int(index)]
+            pixels = _to_tile_pixels(geometry, z, x, y)
+            clipped = shapely.clip_by_rect(pixels, -TILE_BUFFER, -TILE_BUFFER, DEFAULT_EXTENT + TILE_BUFFER, DEFAULT_EXTENT + TILE_BUFFER)
+            if clipped.is_empty:
+                continue
+            yield feature_id, clipped, properties
+
+
+LAYERS = {layer.name: layer for layer in (VisitorsLayer(), MetadataLayer())}
+
+
+class TileCache:
+    """LRU of encoded tiles keyed by (layer, layer version, z, x, y)."""
+
+    def __init__(self, maxsize: int = TILE_CACHE_SIZE):
+        self._tiles = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            return self._tiles.get(key)
+
+    def set(self, key, tile: bytes):
+        with self._lock:
+            self._tiles[key] = tile
+
+
+tile_cache = TileCache()
+
+
+def bump_layer(name: str):
+    """Invalidate every cached tile of a layer (call after writes to its source data)."""
+    layer = LAYERS.get(name)
+    if layer:
+        layer.bump()
+
+
+def render_tile(db: Session, layer_name: str, z: int, x: int, y: int) -> Tuple[bytes, int]:
+    """Return (encoded tile, layer version), from the cache when possible."""
+    layer = LAYERS[layer_name]
+    version = layer.version()
+    key = (layer_name, version, z, x, y)
+    tile = tile_cache.get(key)
+    if tile is None:
+        tile = encode_tile({layer_name: encode_layer(layer_name, layer.features(db, z, x, y))})
+        tile_cache.set(key, tile)
+    return tile, version
@@ -0,0 +1,186 @@
+# utils/timeline_store.py
+"""
+Monthly row counts per entity for `/admin/statistics/timeline`.
+
+Closed months are counted once, stored in `Website.StatisticsTimeline` and
+never recomputed (the admin timeline shows what each month looked like when it
+ended). Only the current month is live: write paths call `record(...)` after
+their commit and a periodic job recounts it with a single range query.
+
+Rebuild every closed month from the source tables with:
+
+    python -m app.utils.timeline_store rebuild
+"""
+import logging
+import os
+import sys
+import threading
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.contact_us import ContactUs
+from app.models.dashboard import StatisticsTimeline
+from app.models.requests import Request
+from app.models.survey import UsersFeedbackAnswer, Vote
+from app.models.users import User
+from app.models.visitors import Visitor
+from app.utils.background import register_periodic_task
+from app.utils.date_range import month_bucket, month_key, next_month, parse_month
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Timeline Configuration
+# -------------------------
+TIMELINE_REFRESH_SECONDS = int(os.getenv("TIMELINE_REFRESH_SECONDS", 300))
+
+# entity -> (counted column, date column, extra filters)
+TIMELINE_ENTITIES = {
+    "users": (User.UserID, User.CreatedAt, ()),
+    "visitors": (Visitor.VisitorID, Visitor.VisitAt, ()),
+    "contact": (ContactUs.ContactID, ContactUs.CreatedAt, ()),
+    "requests": (Request.Id, Request.CreatedAt, (Request.IsDeleted != True,)),
+    "survey_answers": (UsersFeedbackAnswer.Id, UsersFeedbackAnswer.CreatedAt, (UsersFeedbackAnswer.IsDeleted != True,)),
+    "votes": (Vote.Id, Vote.CreatedAt, ()),
+}
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def count_by_month(db: Session, entity: str, start: Optional[datetime], end: datetime) -> Dict[date, int]:
+    """Row counts per month for `entity` in `[start, end)` (start=None means from the beginning)."""
+    count_column, date_column, filters = TIMELINE_ENTITIES[entity]
+    bucket = month_bucket(date_column)
+    query = db.query(bucket.label("month"), func.count(count_column).label("total")).filter(*filters, date_column < end)
+    if start is not None:
+        query = query.filter(date_column >= start)
+    counts = {}
+    for row in query.group_by(bucket).all():
+        key = month_key(row.month)
+        if key:
+            counts[parse_month(key).date()] = row.total
+    return counts
+
+
+def count_range(db: Session, entity: str, start: datetime, end: datetime) -> int:
+    count_column, date_column, filters = TIMELINE_ENTITIES[entity]
+    return db.query(func.count(count_column)).filter(*filters, date_column >= start, date_column < end).scalar() or 0
+
+
+class TimelineStore:
+    def __init__(self):
+        self._closed: Dict[str, Dict[date, int]] = {}
+        self._current: Dict[str, int] = {}
+        self._current_month: Optional[datetime] = None
+        # (entity, month) -> increments ever recorded; keeps the ones landing mid-refresh
+        self._increments: Counter = Counter()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._current_month is not None
+
+    def record(self, entity: str, when: Optional[datetime] = None, by: int = 1):
+        """Count rows written for `entity` at `when` (only the current month is tracked live)."""
+        month = month_start(when or datetime.utcnow())
+        with self._lock:
+            self._increments[(entity, month)] += by
+            if month == self._current_month:
+                self._current[entity] = self._current.get(entity, 0) + by
+
+    def ensure_loaded(self):
+        if self._current_month != month_start(datetime.utcnow()):
+            self.refresh()
+
+    def refresh(self):
+        """Close months that ended since the last refresh and recount the current month."""
+        with self._refresh_lock:
+            month = month_start(datetime.utcnow())
+            with self._lock:
+                before = Counter(self._increments)
+            db = SessionLocal()
+            try:
+                closed = _close_months(db, month)
+                current = {entity: count_range(db, entity, month, next_month(month)) for entity in TIMELINE_ENTITIES}
+            finally:
+                db.close()
+            with self._lock:
+                for entity in current:
+                    current[entity] += self._increments[(entity, month)] - before[(entity, month)]
+                self._closed = closed
+                self._current = current
+                self._current_month = month
+
+    def timeline(self, entity: str, year: Optional[int] = None) -> Dict[int, Dict[int, int]]:
+        """Dense `{year: {month: count}}` for the years that have data."""
+        with self._lock:
+            months = dict(self._closed.get(entity, {}))
+            if self._current_month is not None:
+                months[self._current_month.date()] = self._current.get(entity, 0)
+        timeline: Dict[int, Dict[int, int]] = {}
+        for month in sorted(months):
+            total = months[month]
+            if not total or (year is not None and month.year != year):
+                continue
+            if month.year not in timeline:
+                timeline[month.year] = {i: 0 for i in range(1, 13)}
+            timeline[month.year][month.month] = total
+        return timeline
+
+    @property
+    def current_year(self) -> int:
+        return (self._current_month or datetime.utcnow()).year
+
+
+def _close_months(db: Session, current_month: datetime) -> Dict[str, Dict[date, int]]:
+    """Load stored closed months and count (and store) any that are missing before `current_month`."""
+    closed: Dict[str, Dict[date, int]] = defaultdict(dict)
+    for row in db.query(StatisticsTimeline.Entity, StatisticsTimeline.Month, StatisticsTimeline.Total):
+        closed[row.Entity][row.Month] = row.Total
+
+    changed = False
+    for entity in TIMELINE_ENTITIES:
+        stored = closed.get(entity)
+        start = next_month(datetime.combine(max(stored), datetime.min.time())) if stored else None
+        if start is not None and start >= current_month:
+            continue
+        for month, total in count_by_month(db, entity, start, current_month).items():
+            db.merge(StatisticsTimeline(Entity=entity, Month=month, Total=total))
+            closed[entity][month] = total
+            changed = True
+    if changed:
+        db.commit()
+    return dict(closed)
+
+
+def rebuild(db: Session):
+    """Recount every closed month from the source tables."""
+    db.query(StatisticsTimeline).delete()
+    db.flush()
+    _close_months(db, month_start(datetime.utcnow()))
+    db.commit()
+
+
+timeline_store = TimelineStore()
+
+register_periodic_task("timeline_store", TIMELINE_REFRESH_SECONDS, timeline_store.refresh)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m app.utils.timeline_store rebuild")
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        rebuild(session)
+    finally:
+        session.close()
+    logger.info("Statistics timeline rebuilt")
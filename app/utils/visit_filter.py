@@ -0,0 +1,85 @@
+# utils/visit_filter.py
+"""
+Filtering stage in front of `/track/auto`.
+
+Hits are dropped before they reach the DB, the sketches or the rollups when:
+
+- the User-Agent matches the bot pattern (compiled once),
+- the IP belongs to a blocked autonomous system (utils/geoip.py ASN table),
+- the same (IP, SessionID) already pinged in the current minute (rotating
+  Bloom filter, so memory stays bounded). Hits without a SessionID are never
+  treated as repeats: distinct visitors behind one NAT share the IP.
+
+Dropped and accepted hits are counted per reason for `/track/filter-stats`.
+"""
+import os
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.utils.bloom import RotatingBloomFilter
+from app.utils.geoip import asn_lookup
+
+# -------------------------
+# Filter Configuration
+# -------------------------
+TRACK_FILTER_ENABLED = os.getenv("TRACK_FILTER_ENABLED", "true").lower() in ("1", "true", "yes")
+_DEFAULT_BOT_PATTERN = (
+    r"bot|crawl|spider|slurp|scrape|headless|lighthouse|pingdom|uptime|monitor|preview|"
+    r"facebookexternalhit|curl|wget|python-requests|httpclient|okhttp|go-http-client|java/|libwww"
+)
+TRACK_BOT_UA_PATTERN = os.getenv("TRACK_BOT_UA_PATTERN") or _DEFAULT_BOT_PATTERN
+# Comma separated AS numbers, e.g. "16509,14618,15169,8075" (cloud providers)
+TRACK_BLOCKED_ASNS = {
+    int(asn) for asn in re.split(r"[,\s]+", os.getenv("TRACK_BLOCKED_ASNS", "").upper().replace("AS", "")) if asn.isdigit()
+}
+# Distinct (IP, session) pairs expected per minute
+TRACK_DEDUP_CAPACITY = int(os.getenv("TRACK_DEDUP_CAPACITY", 100000))
+
+DROP_EMPTY_UA = "empty_user_agent"
+DROP_BOT_UA = "bot_user_agent"
+DROP_BLOCKED_ASN = "blocked_asn"
+DROP_DUPLICATE = "duplicate"
+ACCEPTED = "accepted"
+
+_bot_ua = re.compile(TRACK_BOT_UA_PATTERN, re.IGNORECASE)
+
+
+class VisitFilter:
+    def __init__(self, capacity: int = TRACK_DEDUP_CAPACITY):
+        self._recent = RotatingBloomFilter(capacity, error_rate=0.001, keep=2)
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def check(self, user_agent: Optional[str], ip: Optional[str], session_id: Optional[str], now: datetime) -> Optional[str]:
+        """The drop reason for this hit, or None if it should be tracked."""
+        reason = self._reason(user_agent, ip, session_id, now)
+        with self._lock:
+            self._counts[reason or ACCEPTED] += 1
+        return reason
+
+    def _reason(self, user_agent, ip, session_id, now) -> Optional[str]:
+        if not TRACK_FILTER_ENABLED:
+            return None
+        if not user_agent:
+            return DROP_EMPTY_UA
+        if _bot_ua.search(user_agent):
+            return DROP_BOT_UA
+        if TRACK_BLOCKED_ASNS and asn_lookup.lookup(ip) in TRACK_BLOCKED_ASNS:
+            return DROP_BLOCKED_ASN
+        # Without a SessionID an IP alone can't tell visitors apart (NAT, proxies)
+        if not session_id:
+            return None
+        minute = int(now.timestamp()) // 60
+        if self._recent.add(minute, f"{ip}|{session_id}"):
+            return DROP_DUPLICATE
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+visit_filter = VisitFilter()
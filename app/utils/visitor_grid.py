@@ -0,0 +1,173 @@
+# utils/visitor_grid.py
+import math
+import os
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.visitors import Visitor
+from app.utils.date_range import month_bucket, month_key
+
+# -------------------------
+# Grid Configuration
+# -------------------------
+# Finest zoom kept in memory; coarser zooms are derived by merging cells
+HEATMAP_MAX_ZOOM = int(os.getenv("HEATMAP_MAX_ZOOM", 14))
+MAX_LATITUDE = 85.05112878
+
+
+def lonlat_to_tile_fraction(lon: float, lat: float, z: int) -> Tuple[float, float]:
+    """Fractional web-mercator tile position of a WGS84 point at zoom `z`."""
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    n = 1 << z
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+    return x, y
+
+
+def lonlat_to_tile(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    """Web-mercator (slippy map) tile of a WGS84 point at zoom `z`."""
+    n = 1 << z
+    x, y = lonlat_to_tile_fraction(lon, lat, z)
+    return min(max(int(x), 0), n - 1), min(max(int(y), 0), n - 1)
+
+
+def tile_to_lonlat(x: float, y: float, z: int) -> Tuple[float, float]:
+    """WGS84 coordinate of the (fractional) tile position `x, y` at zoom `z`."""
+    n = 1 << z
+    lon = x / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lon, lat
+
+
+def quadkey(x: int, y: int, z: int) -> str:
+    digits = []
+    for i in range(z, 0, -1):
+        mask = 1 << (i - 1)
+        digit = (1 if x & mask else 0) + (2 if y & mask else 0)
+        digits.append(str(digit))
+    return "".join(digits)
+
+
+def bbox_to_tile_range(bbox: Tuple[float, float, float, float], z: int) -> Tuple[int, int, int, int]:
+    """(min_lon, min_lat, max_lon, max_lat) -> inclusive (min_x, min_y, max_x, max_y) tile range."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    x0, y0 = lonlat_to_tile(min_lon, max_lat, z)
+    x1, y1 = lonlat_to_tile(max_lon, min_lat, z)
+    return x0, y0, x1, y1
+
+
+class VisitorGrid:
+    """
+    Visitor counts per month per tile at HEATMAP_MAX_ZOOM.
+    Loaded once from the DB (grouped by month and coordinates), then kept
+    current by `add()` on the tracking path. Visits added while the load
+    query runs are buffered and applied after it.
+    """
+
+    def __init__(self, max_zoom: int = HEATMAP_MAX_ZOOM):
+        self.max_zoom = max_zoom
+        self._months: Dict[str, Counter] = defaultdict(Counter)
+        # Increments that arrive during the load (None when no load is running)
+        self._increments: Optional[Dict[str, Counter]] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        # Bumped on every change, lets derived caches (e.g. map tiles) detect staleness
+        self.revision = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def ensure_loaded(self, db: Session):
+        if self._loaded:
+            return
+        # The query runs outside `_lock`, so `add()` and `cells()` aren't blocked by it
+        with self._load_lock:
+            if self._loaded:
+                return
+            with self._lock:
+                self._increments = defaultdict(Counter)
+            months: Dict[str, Counter] = defaultdict(Counter)
+            try:
+                month_expr = month_bucket(Visitor.VisitAt)
+                rows = (
+                    db.query(month_expr.label("month"), Visitor.X, Visitor.Y, func.count(Visitor.VisitorID).label("count"))
+                    .filter(Visitor.X.isnot(None), Visitor.Y.isnot(None))
+                    .group_by(month_expr, Visitor.X, Visitor.Y)
+                    .yield_per(5000)
+                )
+                for row in rows:
+                    key = month_key(row.month)
+                    if key:
+                        months[key][lonlat_to_tile(row.X, row.Y, self.max_zoom)] += row.count
+            except BaseException:
+                with self._lock:
+                    self._increments = None
+                raise
+            with self._lock:
+                for key, counter in self._increments.items():
+                    months[key].update(counter)
+                self._months = months
+                self._increments = None
+                self._loaded = True
+                self.revision += 1
+
+    def add(self, lon: Optional[float], lat: Optional[float], when: Optional[datetime] = None):
+        """Count one new visit. No-op before a load starts (the load will include it)."""
+        if lon is None or lat is None:
+            return
+        key = (when or datetime.utcnow()).strftime("%Y-%m")
+        cell = lonlat_to_tile(lon, lat, self.max_zoom)
+        with self._lock:
+            if self._loaded:
+                self._months[key][cell] += 1
+                self.revision += 1
+            elif self._increments is not None:
+                self._increments[key][cell] += 1
+
+    def cells(
+        self,
+        z: int,
+        tile_range: Optional[Tuple[int, int, int, int]] = None,
+        start_month: Optional[str] = None,
+        end_month: Optional[str] = None,
+    ) -> Dict[Tuple[int, int], int]:
+        """Aggregate counts into tiles of zoom `z`, limited to a tile range and an inclusive month range."""
+        shift = self.max_zoom - z
+        with self._lock:
+            months = [
+                counter for key, counter in self._months.items()
+                if (not start_month or key >= start_month) and (not end_month or key <= end_month)
+            ]
+            totals: Counter = Counter()
+            for counter in months:
+                for (x, y), count in counter.items():
+                    cell = (x >> shift, y >> shift)
+                    if tile_range and not (tile_range[0] <= cell[0] <= tile_range[2] and tile_range[1] <= cell[1] <= tile_range[3]):
+                        continue
+                    totals[cell] += count
+        return totals
+
+
+def serialize_cells(cells: Dict[Tuple[int, int], int], z: int) -> List[dict]:
+    return [
+        {
+            "quadkey": quadkey(x, y, z),
+            "x": x,
+            "y": y,
+            "lon": round(center[0], 6),
+            "lat": round(center[1], 6),
+            "count": count,
+        }
+        for (x, y), count in sorted(cells.items())
+        for center in (tile_to_lonlat(x + 0.5, y + 0.5, z),)
+    ]
+
+
+visitor_grid = VisitorGrid()
@@ -0,0 +1,269 @@
+# utils/visitor_ingest.py
+"""
+Batched writes for `/track/auto`.
+
+Hits are queued in memory and a background flusher applies them every
+TRACK_FLUSH_MS (or as soon as TRACK_BATCH_SIZE hits are waiting):
+
+- hits are coalesced by SessionID (the latest VisitAt wins),
+- known sessions are refreshed with one set-based UPDATE,
+- new sessions are inserted with one multi-row INSERT ... OUTPUT.
+
+Queueing, the WAL and group commit are handled by utils/batch_ingest.py:
+hits of known sessions are acknowledged once they are on disk, new sessions
+wait for the commit that assigns their VisitorID.
+
+Recently seen sessions are kept in a bounded TTL/LRU map (SessionID ->
+VisitorID, last written VisitAt): they skip the SessionID lookup, and pings
+within TRACK_DEBOUNCE_SECONDS of the last write are not written at all.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from cachetools import TTLCache
+from sqlalchemy import text
+
+from app.database import SessionLocal
+from app.models.lookups import Country
+from app.models.visitors import Visitor
+from app.utils.batch_ingest import BatchIngestor
+from app.utils.country_locator import country_locator
+from app.utils.home_counters import home_counters, TOTAL_VISITORS
+from app.utils.timeline_store import timeline_store, month_start
+from app.utils.visitor_grid import visitor_grid
+
+# -------------------------
+# Ingestion Configuration
+# -------------------------
+TRACK_FLUSH_MS = int(os.getenv("TRACK_FLUSH_MS", 50))
+TRACK_BATCH_SIZE = int(os.getenv("TRACK_BATCH_SIZE", 500))
+# Pings of the same session this close to the last write don't rewrite VisitAt
+TRACK_DEBOUNCE_SECONDS = int(os.getenv("TRACK_DEBOUNCE_SECONDS", 30))
+VISITOR_SESSION_CACHE_SIZE = int(os.getenv("VISITOR_SESSION_CACHE_SIZE", 50000))
+VISITOR_SESSION_CACHE_SECONDS = int(os.getenv("VISITOR_SESSION_CACHE_SECONDS", 1800))
+
+# SQL Server allows 2100 parameters per statement and 1000 rows per VALUES list
+_LOOKUP_CHUNK = 1000
+_UPDATE_CHUNK = 1000
+_INSERT_CHUNK = 250
+
+
+@dataclass
+class VisitHit:
+    session_id: str
+    ip_address: Optional[str]
+    country_id: Optional[int]
+    x: Optional[float]
+    y: Optional[float]
+    visit_at: datetime
+
+
+@dataclass
+class _KnownVisit:
+    VisitorID: int
+    VisitAt: Optional[datetime]
+
+
+@dataclass
+class _SessionBatch:
+    first: VisitHit
+    last_visit: datetime
+    hits: List[VisitHit]
+
+
+class SessionCache:
+    """Thread-safe SessionID -> (VisitorID, last written VisitAt), bounded by size and idle time."""
+
+    def __init__(self, maxsize: int = VISITOR_SESSION_CACHE_SIZE, ttl: int = VISITOR_SESSION_CACHE_SECONDS):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl, timer=time.monotonic)
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Tuple[int, datetime]]:
+        with self._lock:
+            return self._entries.get(session_id)
+
+    def put(self, session_id: str, visitor_id: int, visit_at: datetime):
+        with self._lock:
+            self._entries[session_id] = (visitor_id, visit_at)
+
+    def debounced(self, session_id: str, now: datetime) -> Optional[int]:
+        """The cached VisitorID if this session was written less than TRACK_DEBOUNCE_SECONDS ago."""
+        entry = self.get(session_id)
+        if entry is None or entry[1] is None:
+            return None
+        visitor_id, visit_at = entry
+        return visitor_id if (now - visit_at).total_seconds() < TRACK_DEBOUNCE_SECONDS else None
+
+
+session_cache = SessionCache()
+
+
+def _chunks(items: Sequence, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def coalesce(hits: Sequence[VisitHit]) -> Dict[str, _SessionBatch]:
+    """Group hits by session; the first hit describes a new visitor, the latest sets VisitAt."""
+    sessions: Dict[str, _SessionBatch] = {}
+    for hit in hits:
+        batch = sessions.get(hit.session_id)
+        if batch is None:
+            sessions[hit.session_id] = _SessionBatch(first=hit, last_visit=hit.visit_at, hits=[hit])
+        else:
+            batch.hits.append(hit)
+            batch.last_visit = max(batch.last_visit, hit.visit_at)
+    return sessions
+
+
+_country_ids: Optional[set] = None
+
+
+def _known_country_ids(db) -> set:
+    """COUNTRIES_LIST ids, loaded once: a bad client CountryID must not fail (and re-fail on replay) a whole batch."""
+    global _country_ids
+    if _country_ids is None:
+        _country_ids = {row[0] for row in db.query(Country.OBJECTID)}
+    return _country_ids
+
+
+def _locate_countries(hits: Sequence[VisitHit]) -> Dict[str, int]:
+    """SessionID -> country containing the hit's coordinates (more precise than IP or client values)."""
+    with_point = [hit for hit in hits if hit.x is not None and hit.y is not None]
+    if not with_point:
+        return {}
+    country_locator.ensure_loaded()
+    found = country_locator.locate_many([hit.x for hit in with_point], [hit.y for hit in with_point])
+    return {hit.session_id: int(country_id) for hit, country_id in zip(with_point, found) if country_id}
+
+
+def apply_batch(hits: Sequence[VisitHit]) -> Dict[str, int]:
+    """Write one batch of hits in a single transaction. Returns SessionID -> VisitorID."""
+    sessions = coalesce(hits)
+    session_ids = list(sessions)
+    db = SessionLocal()
+    try:
+        # --- Latest row per known session (cached sessions skip the lookup) ---
+        existing = {}
+        unknown = []
+        for session_id in session_ids:
+            entry = session_cache.get(session_id)
+            if entry is None:
+                unknown.append(session_id)
+            else:
+                existing[session_id] = _KnownVisit(*entry)
+        for chunk in _chunks(unknown, _LOOKUP_CHUNK):
+            rows = (
+                db.query(Visitor.VisitorID, Visitor.SessionID, Visitor.VisitAt)
+                .filter(Visitor.SessionID.in_(chunk))
+                .all()
+            )
+            for row in rows:
+                current = existing.get(row.SessionID)
+                if current is None or (row.VisitAt or datetime.min) > (current.VisitAt or datetime.min):
+                    existing[row.SessionID] = _KnownVisit(row.VisitorID, row.VisitAt)
+
+        # --- One set-based UPDATE for returning sessions ---
+        updates = [(existing[s].VisitorID, sessions[s].last_visit) for s in session_ids if s in existing]
+        for chunk in _chunks(updates, _UPDATE_CHUNK):
+            values = ", ".join(f"(:id{i}, :at{i})" for i in range(len(chunk)))
+            params = {}
+            for i, (visitor_id, visit_at) in enumerate(chunk):
+                params[f"id{i}"] = visitor_id
+                params[f"at{i}"] = visit_at
+            db.execute(text(f"""
+                UPDATE v SET VisitAt = x.VisitAt
+                FROM Website.Visitors AS v
+                JOIN (VALUES {values}) AS x (VisitorID, VisitAt) ON v.VisitorID = x.VisitorID
+            """), params)
+
+        # --- One multi-row INSERT for new sessions ---
+        visitor_ids = {s: existing[s].VisitorID for s in existing}
+        new_sessions = [s for s in session_ids if s not in existing]
+        country_ids = _known_country_ids(db) if new_sessions else set()
+        located = _locate_countries([sessions[s].first for s in new_sessions])
+        for chunk in _chunks(new_sessions, _INSERT_CHUNK):
+            rows_sql = []
+            params = {}
+            for i, session_id in enumerate(chunk):
+                hit = sessions[session_id].first
+                has_point = hit.x is not None and hit.y is not None
+                rows_sql.append(f"(:ip{i}, :country{i}, :x{i}, :y{i}, geometry::STGeomFromText(:geom{i}, 4326), :visit{i}, :sess{i})")
+                params.update({
+                    f"ip{i}": hit.ip_address,
+                    f"country{i}": located.get(session_id) or (hit.country_id if hit.country_id in country_ids else None),
+                    f"x{i}": hit.x,
+                    f"y{i}": hit.y,
+                    f"geom{i}": f"POINT({hit.x} {hit.y})" if has_point else None,
+                    f"visit{i}": sessions[session_id].last_visit,
+                    f"sess{i}": session_id,
+                })
+            result = db.execute(text(f"""
+                INSERT INTO Website.Visitors (IPAddress, CountryID, X, Y, Geom, VisitAt, SessionID)
+                OUTPUT inserted.VisitorID, inserted.SessionID
+                VALUES {", ".join(rows_sql)}
+            """), params)
+            for visitor_id, session_id in result.fetchall():
+                visitor_ids[session_id] = visitor_id
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    # --- In-memory aggregates, only after the commit ---
+    for session_id, batch in sessions.items():
+        session_cache.put(session_id, visitor_ids[session_id], batch.last_visit)
+        row = existing.get(session_id)
+        if row is None:
+            visitor_grid.add(batch.first.x, batch.first.y, batch.last_visit)
+            home_counters.increment(TOTAL_VISITORS)
+            timeline_store.record("visitors", batch.last_visit)
+        elif not row.VisitAt or month_start(row.VisitAt) != month_start(batch.last_visit):
+            # The row moves to this month if it was last seen in an earlier one
+            timeline_store.record("visitors", batch.last_visit)
+
+    return visitor_ids
+
+
+def apply_hits(hits: Sequence[VisitHit]) -> List[Optional[int]]:
+    visitor_ids = apply_batch(hits)
+    return [visitor_ids.get(hit.session_id) for hit in hits]
+
+
+def encode_hit(hit: VisitHit) -> dict:
+    return {
+        "session_id": hit.session_id,
+        "ip_address": hit.ip_address,
+        "country_id": hit.country_id,
+        "x": hit.x,
+        "y": hit.y,
+        "visit_at": hit.visit_at.isoformat(),
+    }
+
+
+def decode_hit(record: dict) -> VisitHit:
+    return VisitHit(**{**record, "visit_at": datetime.fromisoformat(record["visit_at"])})
+
+
+def cached_visitor_id(hit: VisitHit) -> Optional[int]:
+    """Known sessions are answered as soon as the hit is on disk."""
+    entry = session_cache.get(hit.session_id)
+    return entry[0] if entry else None
+
+
+visit_ingestor = BatchIngestor(
+    "visitors",
+    apply=apply_hits,
+    encode=encode_hit,
+    decode=decode_hit,
+    flush_ms=TRACK_FLUSH_MS,
+    batch_size=TRACK_BATCH_SIZE,
+    early_result=cached_visitor_id,
+)
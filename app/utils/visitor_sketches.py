@@ -0,0 +1,249 @@
+# utils/visitor_sketches.py
+"""
+Approximate unique visitors per (day, country).
+
+The tracking path adds each visit's key (SessionID or IP) to an in-memory
+HyperLogLog for its day/country. Pending sketches are merged into
+`Website.VisitorSketches` every VISITOR_SKETCH_FLUSH_SECONDS; merging is
+idempotent, so several workers can flush the same bucket safely.
+
+Visits from before the sketches existed are folded in by a startup job
+(`backfill`); until it has finished, `ready` is False and the dashboard
+answers "warming up" instead of scanning the history inside a request.
+
+Queries merge the stored sketches of the requested days/countries (plus
+anything not flushed yet) into a total and one accumulator per month, in a
+single pass.
+"""
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.visitors import Visitor, VisitorSketch
+from app.utils.background import register_periodic_task
+from app.utils.date_range import MONTH_FORMAT
+from app.utils.hll import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Sketch Configuration
+# -------------------------
+# 12 -> 4096 registers, ~1.6% standard error
+HLL_PRECISION = int(os.getenv("HLL_PRECISION", 12))
+VISITOR_SKETCH_FLUSH_SECONDS = int(os.getenv("VISITOR_SKETCH_FLUSH_SECONDS", 60))
+# "session" or "ip"
+VISITOR_UNIQUE_KEY = os.getenv("VISITOR_UNIQUE_KEY", "session").lower()
+
+UNKNOWN_COUNTRY = 0
+
+BucketKey = Tuple[date, int]
+
+
+def unique_key(session_id: Optional[str], ip_address: Optional[str]) -> Optional[str]:
+    if VISITOR_UNIQUE_KEY == "ip":
+        return ip_address or session_id
+    return session_id or ip_address
+
+
+class VisitorSketchStore:
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self._pending: Dict[BucketKey, HyperLogLog] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._backfill_checked = False
+
+    # -------------------------
+    # Ingest
+    # -------------------------
+    def add(self, when: datetime, country_id: Optional[int], key: Optional[str]):
+        if not key:
+            return
+        bucket = (when.date(), country_id or UNKNOWN_COUNTRY)
+        with self._lock:
+            sketch = self._pending.get(bucket)
+            if sketch is None:
+                sketch = self._pending[bucket] = HyperLogLog(self.precision)
+            sketch.add(key)
+
+    def flush_pending(self):
+        """Periodic job: flush on a session of its own (the tracking path no longer has one)."""
+        if not self._pending:
+            return
+        db = SessionLocal()
+        try:
+            self.flush(db)
+        finally:
+            db.close()
+
+    def flush(self, db: Session):
+        """Merge pending sketches into the stored ones. On failure they stay pending."""
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            try:
+                _merge_into_table(db, pending)
+                db.commit()
+            except SQLAlchemyError:
+                db.rollback()
+                logger.exception("Flushing visitor sketches failed, keeping them pending")
+                with self._lock:
+                    for bucket, sketch in pending.items():
+                        current = self._pending.get(bucket)
+                        self._pending[bucket] = sketch if current is None else current.merge(sketch)
+        finally:
+            self._flush_lock.release()
+
+    # -------------------------
+    # Backfill
+    # -------------------------
+    @property
+    def ready(self) -> bool:
+        """True once this process has run the backfill (queries are complete)."""
+        return self._backfill_checked
+
+    def backfill(self):
+        """
+        Startup job: once per process, fold visits older than the first stored sketch day into the table.
+        The first run after deploying converts the whole history; later runs only rescan that one day.
+        Retried on the next interval if it fails.
+        """
+        if self._backfill_checked:
+            return
+        db = SessionLocal()
+        try:
+            with self._flush_lock:
+                first_day = db.query(func.min(VisitorSketch.Day)).scalar()
+                before = datetime.combine(first_day + timedelta(days=1), datetime.min.time()) if first_day else None
+                backfill_from_visitors(db, before, self.precision)
+                self._backfill_checked = True
+        finally:
+            db.close()
+        logger.info("Visitor sketches backfilled")
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def _sketches(
+        self,
+        db: Session,
+        start: Optional[date],
+        end: Optional[date],
+        country_ids: Optional[Iterable[int]],
+    ) -> Iterable[Tuple[date, HyperLogLog]]:
+        countries = set(country_ids) if country_ids else None
+
+        def wanted(day: date, country_id: int) -> bool:
+            return (
+                (start is None or day >= start)
+                and (end is None or day < end)
+                and (countries is None or country_id in countries)
+            )
+
+        query = db.query(VisitorSketch.Day, VisitorSketch.Sketch)
+        if start is not None:
+            query = query.filter(VisitorSketch.Day >= start)
+        if end is not None:
+            query = query.filter(VisitorSketch.Day < end)
+        if countries is not None:
+            query = query.filter(VisitorSketch.CountryID.in_(countries))
+        for row in query.yield_per(500):
+            yield row.Day, HyperLogLog.from_bytes(row.Sketch)
+
+        with self._lock:
+            pending = [(day, sketch.copy()) for (day, country_id), sketch in self._pending.items() if wanted(day, country_id)]
+        yield from pending
+
+    def estimate(
+        self,
+        db: Session,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        country_ids: Optional[Iterable[int]] = None,
+    ) -> Tuple[int, Dict[str, int]]:
+        """
+        Approximate distinct visitors in `[start, end)` for the given countries (all when empty):
+        (total, per `YYYY-MM` month), from one read of the sketches.
+        """
+        total = HyperLogLog(self.precision)
+        months: Dict[str, HyperLogLog] = {}
+        for day, sketch in self._sketches(db, start, end, country_ids):
+            total.merge(sketch)
+            key = day.strftime(MONTH_FORMAT)
+            if key in months:
+                months[key].merge(sketch)
+            else:
+                months[key] = sketch
+        return total.count(), {key: months[key].count() for key in sorted(months)}
+
+
+def _merge_into_table(db: Session, sketches: Dict[BucketKey, HyperLogLog]):
+    for (day, country_id), sketch in sketches.items():
+        row = db.get(VisitorSketch, (day, country_id))
+        if row is None:
+            db.add(VisitorSketch(Day=day, CountryID=country_id, Sketch=sketch.to_bytes()))
+        else:
+            row.Sketch = HyperLogLog.from_bytes(row.Sketch).merge(sketch).to_bytes()
+    db.flush()
+
+
+def backfill_from_visitors(db: Session, before: Optional[datetime] = None, precision: int = HLL_PRECISION):
+    """
+    Stream Website.Visitors in VisitAt order and persist one day of sketches at a time,
+    so memory stays bounded by the number of countries seen in a single day.
+    Rows are read on a separate session so writes on `db` don't interrupt the open cursor.
+    """
+    reader = SessionLocal()
+    try:
+        query = (
+            reader.query(Visitor.VisitAt, Visitor.CountryID, Visitor.SessionID, Visitor.IPAddress)
+            .filter(Visitor.VisitAt.isnot(None))
+        )
+        if before is not None:
+            query = query.filter(Visitor.VisitAt < before)
+        _backfill_rows(db, query.order_by(Visitor.VisitAt).yield_per(5000), precision)
+    finally:
+        reader.close()
+
+
+def _backfill_rows(db: Session, rows, precision: int):
+    current_day = None
+    day_sketches: Dict[BucketKey, HyperLogLog] = defaultdict(lambda: HyperLogLog(precision))
+    for row in rows:
+        key = unique_key(row.SessionID, row.IPAddress)
+        if not key:
+            continue
+        day = row.VisitAt.date()
+        if current_day is not None and day != current_day:
+            _merge_into_table(db, day_sketches)
+            day_sketches.clear()
+        current_day = day
+        day_sketches[(day, row.CountryID or UNKNOWN_COUNTRY)].add(key)
+    if day_sketches:
+        _merge_into_table(db, day_sketches)
+    db.commit()
+
+
+def to_date_range(start: Optional[datetime], end: Optional[datetime]) -> Tuple[Optional[date], Optional[date]]:
+    """Convert a midnight-aligned half-open datetime range (from month_bounds) to dates."""
+    return (start.date() if start else None), (end.date() if end else None)
+
+
+visitor_sketches = VisitorSketchStore()
+
+register_periodic_task("visitor_sketches", VISITOR_SKETCH_FLUSH_SECONDS, visitor_sketches.flush_pending, run_on_start=False)
+# No-op once it has succeeded
+register_periodic_task("visitor_sketches_backfill", VISITOR_SKETCH_FLUSH_SECONDS, visitor_sketches.backfill)
@@ -0,0 +1,171 @@
+# utils/vote_counters.py
+"""
+Vote totals for `GET /survey/vote/stats` without touching the DB.
+
+Counts (total, per Answer, per SubAnswer reason) are loaded with one grouped
+query at startup, added to by the vote batch writer after each commit and
+reconciled every VOTE_COUNTERS_RECONCILE_SECONDS.
+
+With VOTE_COUNTERS_REDIS_URL set, the counters live in a Redis hash shared
+by every worker (needs the `redis` package); otherwise each worker keeps its
+own copy in memory.
+"""
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.survey import Vote
+from app.utils.background import register_periodic_task
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Vote Counter Configuration
+# -------------------------
+VOTE_COUNTERS_RECONCILE_SECONDS = int(os.getenv("VOTE_COUNTERS_RECONCILE_SECONDS", 300))
+VOTE_COUNTERS_REDIS_URL = os.getenv("VOTE_COUNTERS_REDIS_URL")
+VOTE_COUNTERS_REDIS_KEY = os.getenv("VOTE_COUNTERS_REDIS_KEY", "ngd:vote_counters")
+
+TOTAL = "total"
+ANSWER_PREFIX = "answer:"
+REASON_PREFIX = "reason:"
+
+
+def _fields(answer: str, sub_answer: Optional[str]) -> Iterable[str]:
+    yield TOTAL
+    yield ANSWER_PREFIX + answer
+    if sub_answer:
+        yield REASON_PREFIX + sub_answer
+
+
+def _deltas(votes: Iterable[Tuple[str, Optional[str]]]) -> Counter:
+    deltas: Counter = Counter()
+    for answer, sub_answer in votes:
+        deltas.update(_fields(answer, sub_answer))
+    return deltas
+
+
+def count_votes(db: Session) -> Counter:
+    """Exact counts from one grouped query."""
+    counts: Counter = Counter()
+    rows = db.query(Vote.Answer, Vote.SubAnswer, func.count(Vote.Id)).group_by(Vote.Answer, Vote.SubAnswer).all()
+    for answer, sub_answer, total in rows:
+        for field in _fields(answer, sub_answer):
+            counts[field] += total
+    return counts
+
+
+def _load_counts() -> Counter:
+    db = SessionLocal()
+    try:
+        return count_votes(db)
+    finally:
+        db.close()
+
+
+def summarize(counts: Dict[str, int]) -> dict:
+    """The `/vote/stats` payload from raw counter fields."""
+    total = int(counts.get(TOTAL, 0))
+    yes_count = int(counts.get(ANSWER_PREFIX + "Yes", 0))
+    no_count = int(counts.get(ANSWER_PREFIX + "No", 0))
+    return {
+        "total_votes": total,
+        "yes_votes": yes_count,
+        "no_votes": no_count,
+        "yes_percentage": round((yes_count / total) * 100, 2) if total > 0 else 0,
+        "no_percentage": round((no_count / total) * 100, 2) if total > 0 else 0,
+        "no_reasons": {
+            field[len(REASON_PREFIX):]: int(value)
+            for field, value in counts.items()
+            if field.startswith(REASON_PREFIX)
+        },
+    }
+
+
+class VoteCounters:
+    """Per-process counters."""
+
+    def __init__(self):
+        self._values: Optional[Counter] = None
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._values is not None
+
+    def add(self, votes: Iterable[Tuple[str, Optional[str]]]):
+        """Count committed (Answer, SubAnswer) pairs."""
+        deltas = _deltas(votes)
+        with self._lock:
+            if self._values is not None:
+                self._values.update(deltas)
+
+    def reconcile(self):
+        with self._reconcile_lock:
+            counts = _load_counts()
+            # Swapped in as soon as the query returns: a batch is added right after its commit,
+            # so what was added before this point is in `counts` and must not be re-applied.
+            # Only a batch whose commit and add() straddle the query/swap can still be off
+            # (by that one batch, until the next run).
+            with self._lock:
+                self._values = counts
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.reconcile()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._values or {})
+
+
+class RedisVoteCounters:
+    """Counters in one Redis hash, shared by every worker."""
+
+    def __init__(self, url: str, key: str = VOTE_COUNTERS_REDIS_KEY):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("VOTE_COUNTERS_REDIS_URL is set but the `redis` package is not installed") from exc
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self.key = key
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._redis.exists(self.key))
+
+    def add(self, votes: Iterable[Tuple[str, Optional[str]]]):
+        """Count committed (Answer, SubAnswer) pairs (one round trip per batch)."""
+        pipe = self._redis.pipeline()
+        for field, by in _deltas(votes).items():
+            pipe.hincrby(self.key, field, by)
+        pipe.execute()
+
+    def reconcile(self):
+        # Increments landing between the count and the swap are lost until the next run
+        counts = _load_counts()
+        pipe = self._redis.pipeline()
+        pipe.delete(self.key)
+        if counts:
+            pipe.hset(self.key, mapping=dict(counts))
+        pipe.execute()
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.reconcile()
+
+    def snapshot(self) -> Dict[str, int]:
+        return {field: int(value) for field, value in self._redis.hgetall(self.key).items()}
+
+
+vote_counters = RedisVoteCounters(VOTE_COUNTERS_REDIS_URL) if VOTE_COUNTERS_REDIS_URL else VoteCounters()
+
+# Runs on startup, so /vote/stats never has to load the counters itself
+register_periodic_task("vote_counters", VOTE_COUNTERS_RECONCILE_SECONDS, vote_counters.reconcile, run_on_start=True)
@@ -0,0 +1,115 @@
+# utils/vote_ingest.py
+"""
+Write-behind for `POST /survey/vote`.
+
+Votes are acknowledged once they are in the local WAL and inserted in
+batches by utils/batch_ingest.py (one executemany per group commit).
+
+Every vote carries a random `IngestKey`; keys already in the table are
+skipped, so a segment replayed after a crash (committed, but not yet
+deleted) does not count its votes twice.
+"""
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+from sqlalchemy import insert
+
+from app.database import SessionLocal
+from app.models.survey import Vote
+from app.models.users import User
+from app.models.visitors import Visitor
+from app.utils.batch_ingest import BatchIngestor
+from app.utils.timeline_store import timeline_store
+from app.utils.vote_counters import vote_counters
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Vote Ingestion Configuration
+# -------------------------
+VOTE_FLUSH_MS = int(os.getenv("VOTE_FLUSH_MS", 50))
+VOTE_BATCH_SIZE = int(os.getenv("VOTE_BATCH_SIZE", 500))
+
+
+@dataclass
+class VoteHit:
+    user_id: Optional[int]
+    visitor_id: Optional[int]
+    answer: str
+    sub_answer: Optional[str]
+    created_at: datetime
+    key: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    def as_response(self) -> dict:
+        return {
+            "AlreadyVoted": False,
+            "Id": None,  # assigned when the batch is written
+            "Answer": self.answer,
+            "SubAnswer": self.sub_answer,
+            "UserId": self.user_id,
+            "VisitorId": self.visitor_id,
+            "CreatedAt": self.created_at,
+        }
+
+
+def apply_votes(votes: Sequence[VoteHit]) -> List[dict]:
+    db = SessionLocal()
+    try:
+        committed = {row[0] for row in db.query(Vote.IngestKey).filter(Vote.IngestKey.in_({v.key for v in votes}))}
+        new_votes = [v for v in votes if v.key not in committed]
+        # Unknown visitor / user ids (stale header, deleted row) would fail the FK for the whole batch
+        visitor_ids = {v.visitor_id for v in votes if v.visitor_id is not None}
+        if visitor_ids:
+            visitor_ids = {row[0] for row in db.query(Visitor.VisitorID).filter(Visitor.VisitorID.in_(visitor_ids))}
+        user_ids = {v.user_id for v in votes if v.user_id is not None}
+        if user_ids:
+            user_ids = {row[0] for row in db.query(User.UserID).filter(User.UserID.in_(user_ids))}
+        if new_votes:
+            db.execute(insert(Vote), [
+                {
+                    "UserId": v.user_id if v.user_id in user_ids else None,
+                    "VisitorId": v.visitor_id if v.visitor_id in visitor_ids else None,
+                    "Answer": v.answer,
+                    "SubAnswer": v.sub_answer,
+                    "CreatedAt": v.created_at,
+                    "IngestKey": v.key,
+                }
+                for v in new_votes
+            ])
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    for v in new_votes:
+        timeline_store.record("votes", v.created_at)
+    try:
+        vote_counters.add((v.answer, v.sub_answer) for v in new_votes)
+    except Exception:
+        # Already committed: a counter store outage must not fail (and replay) the batch
+        logger.exception("Could not update vote counters, the next reconcile fixes them")
+    return [v.as_response() for v in votes]
+
+
+def encode_vote(vote: VoteHit) -> dict:
+    return {**vote.__dict__, "created_at": vote.created_at.isoformat()}
+
+
+def decode_vote(record: dict) -> VoteHit:
+    return VoteHit(**{**record, "created_at": datetime.fromisoformat(record["created_at"])})
+
+
+vote_ingestor = BatchIngestor(
+    "votes",
+    apply=apply_votes,
+    encode=encode_vote,
+    decode=decode_vote,
+    flush_ms=VOTE_FLUSH_MS,
+    batch_size=VOTE_BATCH_SIZE,
+    early_result=VoteHit.as_response,
+)
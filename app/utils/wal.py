@@ -0,0 +1,247 @@
+# utils/wal.py
+"""
+Local write-ahead log for the write-behind ingestion paths.
+
+Each group commit is written as one segment file (JSON lines) under
+`<APP_CACHE_DIR>/wal/<name>/<worker>/`, fsynced and renamed into place
+before anything is acknowledged. Segments are deleted once their batch is
+committed to the DB; whatever is left (DB error, crash) is replayed later.
+
+Every worker process owns its own directory and holds a `flock` on it, so
+on startup (or periodically) a worker can safely adopt and replay the
+directories of workers that died.
+
+Delivery is at-least-once: a crash between the DB commit and deleting the
+segment replays that batch again.
+
+A segment that keeps failing is rewritten with only the records that failed
+and an attempt count in its name (`<seq>.r<N>.seg`); after `max_attempts`
+it is moved to `<APP_CACHE_DIR>/wal/<name>/failed/` for inspection, so one
+bad record never blocks the segments behind it. An outage of the target
+(`RetryLater`) is not an attempt: the segment is kept as is and the pass stops.
+"""
+import fcntl
+import glob
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+from typing import Callable, Iterable, List, Optional
+
+import orjson
+
+from app.utils.paths import cache_path
+
+logger = logging.getLogger(__name__)
+
+_LOCK_FILE = "lock"
+_SUFFIX = ".seg"
+FAILED_DIR = "failed"
+_SEGMENT_NAME = re.compile(r"^(?P<seq>[^.]+)(?:\.r(?P<attempts>\d+))?\.seg$")
+
+
+def _fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _attempts(path: str) -> int:
+    match = _SEGMENT_NAME.match(os.path.basename(path))
+    return int(match.group("attempts") or 0) if match else 0
+
+
+def _write_records(path: str, records: Iterable[dict]):
+    """Write records to a temp file next to `path`, fsync, rename into place."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            for record in records:
+                tmp.write(orjson.dumps(record))
+                tmp.write(b"\n")
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(directory)
+
+
+class RetryLater(Exception):
+    """Raised by a replay `apply` when the target is unavailable; nothing is counted against the segment."""
+
+
+class SegmentLog:
+    def __init__(self, name: str, max_attempts: int = 5):
+        self.name = name
+        self.max_attempts = max_attempts
+        self._dir: Optional[str] = None
+        self._dir_pid: Optional[int] = None
+        self._dir_lock = None
+        self._seq = 0
+        self._inflight = set()
+        self._lock = threading.Lock()
+
+    def _root(self) -> str:
+        return cache_path("wal", self.name, ensure=True)
+
+    def _own_dir(self) -> str:
+        # Created lazily so each forked worker gets its own directory
+        with self._lock:
+            if self._dir is None or self._dir_pid != os.getpid():
+                worker = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+                path = os.path.join(self._root(), worker)
+                # Lock under a hidden name first so no other worker can adopt it half-created
+                hidden = os.path.join(self._root(), f".{worker}")
+                os.makedirs(hidden)
+                lock = open(os.path.join(hidden, _LOCK_FILE), "w")
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                os.rename(hidden, path)
+                self._dir, self._dir_lock, self._dir_pid = path, lock, os.getpid()
+            return self._dir
+
+    # -------------------------
+    # Write path
+    # -------------------------
+    def write(self, records: Iterable[dict]) -> str:
+        """Durably write one segment and return its path (in flight until `done`/`release`)."""
+        directory = self._own_dir()
+        with self._lock:
+            self._seq += 1
+            path = os.path.join(directory, f"{self._seq:012d}{_SUFFIX}")
+            self._inflight.add(path)
+        try:
+            _write_records(path, records)
+        except BaseException:
+            self.release(path)
+            raise
+        return path
+
+    def done(self, path: str):
+        """The segment's batch is committed: drop it."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        self.release(path)
+
+    def release(self, path: str):
+        """Hand a segment that could not be applied over to replay."""
+        with self._lock:
+            self._inflight.discard(path)
+
+    def _failed_path(self, path: str) -> str:
+        failed_dir = os.path.join(self._root(), FAILED_DIR)
+        os.makedirs(failed_dir, exist_ok=True)
+        seq = _SEGMENT_NAME.match(os.path.basename(path)).group("seq")
+        return os.path.join(failed_dir, f"{os.path.basename(os.path.dirname(path))}-{seq}{_SUFFIX}")
+
+    def retry(self, path: str, records: List[dict]):
+        """
+        Keep only `records` (the ones that failed) of a segment for a later attempt,
+        or move them to the failed/ directory once `max_attempts` is reached.
+        """
+        attempts = _attempts(path) + 1
+        if attempts >= self.max_attempts:
+            target = self._failed_path(path)
+            logger.error(
+                "Giving up on %d %s record(s) after %d attempts, kept in %s", len(records), self.name, attempts, target
+            )
+        else:
+            seq = _SEGMENT_NAME.match(os.path.basename(path)).group("seq")
+            target = os.path.join(os.path.dirname(path), f"{seq}.r{attempts}{_SUFFIX}")
+        _write_records(target, records)
+        if target != path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.release(path)
+
+    # -------------------------
+    # Replay
+    # -------------------------
+    @staticmethod
+    def read(path: str) -> List[dict]:
+        with open(path, "rb") as f:
+            return [orjson.loads(line) for line in f if line.strip()]
+
+    def _adoptable_dirs(self):
+        """Own directory plus directories whose worker is gone (their flock is free)."""
+        own = self._dir if self._dir is not None and self._dir_pid == os.getpid() else None
+        if own:
+            yield own, None
+        for directory in sorted(glob.glob(os.path.join(self._root(), "*"))):
+            if directory == own or os.path.basename(directory) == FAILED_DIR or not os.path.isdir(directory):
+                continue
+            try:
+                lock = open(os.path.join(directory, _LOCK_FILE), "a")
+            except OSError:
+                continue
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()  # owner is alive
+                continue
+            yield directory, lock
+
+    def replay(self, apply: Callable[[List[dict]], List[dict]]) -> int:
+        """
+        Apply every leftover segment in order. `apply(records)` returns the records
+        that could not be written (or raises if none could); those are kept for a
+        later attempt (`retry`). `RetryLater` stops the pass and leaves the
+        segment untouched. Returns the number of segments fully applied.
+        """
+        replayed = 0
+        paused = False
+        for directory, lock in self._adoptable_dirs():
+            if paused:
+                if lock is not None:
+                    lock.close()
+                continue
+            try:
+                for path in sorted(glob.glob(os.path.join(directory, f"*{_SUFFIX}"))):
+                    with self._lock:
+                        if path in self._inflight:
+                            continue
+                    try:
+                        records = self.read(path)
+                    except ValueError:
+                        target = self._failed_path(path)
+                        logger.exception("Unreadable %s WAL segment %s, moved to %s", self.name, path, target)
+                        os.replace(path, target)
+                        continue
+                    except OSError:
+                        logger.exception("Could not read %s WAL segment %s", self.name, path)
+                        continue
+                    try:
+                        failed = apply(records)
+                    except RetryLater as exc:
+                        logger.warning("Replay of %s WAL segments paused: %s", self.name, exc)
+                        paused = True
+                        break
+                    except Exception:
+                        logger.exception("Replaying %s WAL segment %s failed", self.name, path)
+                        failed = records
+                    if failed:
+                        self.retry(path, failed)
+                    else:
+                        os.remove(path)
+                        replayed += 1
+                # A dead worker's directory goes once nothing is left to retry
+                if lock is not None and not paused and not glob.glob(os.path.join(directory, f"*{_SUFFIX}")):
+                    shutil.rmtree(directory, ignore_errors=True)
+            finally:
+                if lock is not None:
+                    lock.close()
+        if replayed:
+            logger.info("Replayed %d %s WAL segment(s)", replayed, self.name)
+        return replayed